@@ -0,0 +1,78 @@
+`timescale 1ns / 1ps
+
+// Regression testbench for min_max_amplitude: loads samples with $readmemh instead of $fscanf.
+// Run with:  vvp sim.vvp +memfile=<samples.memh> +nsamples=<N> [+dump [+dumpfile=<file.vcd>]]
+module tb_min_max_amplitude_mem();
+    parameter MAX_SAMPLES = 441000;   // Memory depth; must be >= nsamples
+
+    reg clk;
+    reg rst;
+    reg signed [15:0] sample_in;
+    reg sample_valid;
+    wire signed [15:0] min_out;
+    wire signed [15:0] max_out;
+
+    min_max_amplitude uut (
+        .clk(clk),
+        .rst(rst),
+        .sample_in(sample_in),
+        .sample_valid(sample_valid),
+        .min_out(min_out),
+        .max_out(max_out)
+    );
+
+    // Clock generation - 10ns period (5ns high, 5ns low)
+    initial clk = 0;
+    always #5 clk = ~clk;
+
+    reg [15:0] samples [0:MAX_SAMPLES-1];
+    reg [1023:0] memfile;
+    reg [1023:0] dumpfile;
+    integer nsamples;
+    integer sample_count;
+
+    initial begin
+        rst = 1;
+        sample_valid = 0;
+        sample_in = 0;
+
+        if (!$value$plusargs("memfile=%s", memfile)) begin
+            $display("ERROR: missing +memfile=<file>");
+            $finish;
+        end
+        if (!$value$plusargs("nsamples=%d", nsamples) || nsamples > MAX_SAMPLES) begin
+            $display("ERROR: +nsamples=<N> missing or larger than MAX_SAMPLES=%0d", MAX_SAMPLES);
+            $finish;
+        end
+        $readmemh(memfile, samples, 0, nsamples - 1);
+
+        if ($test$plusargs("dump")) begin
+            if (!$value$plusargs("dumpfile=%s", dumpfile))
+                dumpfile = "simulation.vcd";
+            $dumpfile(dumpfile);
+            $dumpvars(0, tb_min_max_amplitude_mem);
+        end
+
+        // Reset deassert
+        #20 rst = 0;
+
+        for (sample_count = 0; sample_count < nsamples; sample_count = sample_count + 1) begin
+            @(posedge clk);
+            sample_in = samples[sample_count];
+            sample_valid = 1;
+        end
+
+        @(posedge clk);
+        sample_valid = 0;
+
+        // Display results
+        #50;
+        $display("== Results ==");
+        $display("Samples processed: %0d", sample_count);
+        $display("Minimum Amplitude = %d", min_out);
+        $display("Maximum Amplitude = %d", max_out);
+
+        $finish;
+    end
+
+endmodule
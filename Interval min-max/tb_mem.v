@@ -0,0 +1,66 @@
+`timescale 1ns / 1ps
+
+// Regression testbench for top: loads samples with $readmemh instead of $fscanf per clock.
+// Run with:  vvp sim.vvp +memfile=<samples.memh> +nsamples=<N> [+dump [+dumpfile=<file.vcd>]]
+module tb_mem;
+    parameter MAX_SAMPLES = 441000;   // Memory depth; must be >= nsamples
+    parameter INTERVAL_LEN = 44100;
+    parameter NUM_INTERVALS = 10;
+
+    reg clk = 0;
+    reg rst = 1;
+    reg signed [15:0] audio_sample;
+    reg sample_valid;
+
+    top #(
+        .INTERVAL_LEN(INTERVAL_LEN),
+        .NUM_INTERVALS(NUM_INTERVALS)
+    ) dut (
+        .clk(clk),
+        .rst(rst),
+        .audio_sample(audio_sample),
+        .sample_valid(sample_valid)
+    );
+
+    always #5 clk = ~clk; // 100MHz
+
+    reg [15:0] samples [0:MAX_SAMPLES-1];
+    reg [1023:0] memfile;
+    reg [1023:0] dumpfile;
+    integer nsamples;
+    integer i;
+
+    initial begin
+        if (!$value$plusargs("memfile=%s", memfile)) begin
+            $display("ERROR: missing +memfile=<file>");
+            $finish;
+        end
+        if (!$value$plusargs("nsamples=%d", nsamples) || nsamples > MAX_SAMPLES) begin
+            $display("ERROR: +nsamples=<N> missing or larger than MAX_SAMPLES=%0d", MAX_SAMPLES);
+            $finish;
+        end
+        $readmemh(memfile, samples, 0, nsamples - 1);
+
+        // Waveforms only on request; a full VCD dominates the run time
+        if ($test$plusargs("dump")) begin
+            if (!$value$plusargs("dumpfile=%s", dumpfile))
+                dumpfile = "waveform.vcd";
+            $dumpfile(dumpfile);
+            $dumpvars(0, tb_mem);
+        end
+
+        #20 rst = 0;
+
+        for (i = 0; i < nsamples; i = i + 1) begin
+            @(posedge clk);
+            audio_sample = samples[i];
+            sample_valid = 1;
+        end
+
+        sample_valid = 0;
+        // top finishes by itself after NUM_INTERVALS intervals; stop here if the input was shorter
+        repeat (4) @(posedge clk);
+        $display("--- End of samples ---");
+        $finish;
+    end
+endmodule
@@ -1,40 +1,39 @@
-import wave
-import struct
+import os
+import sys
 import numpy as np
 
+# Decoding and the text writer are shared with the golden measure tools
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "golden measure"))
+from wav_decoder import decode_wav
+from sample_text_io import write_text_samples
+
 WAV_FILE = "input.wav"
 TXT_FILE = "audio_samples.txt"
-
-def wav_to_txt(wav_path, txt_path):
-    with wave.open(wav_path, "rb") as wf:
-        n_channels = wf.getnchannels()
-        sampwidth = wf.getsampwidth()
-        framerate = wf.getframerate()
-        n_frames = wf.getnframes()
-        duration = n_frames / framerate
-
-        assert sampwidth == 2, "Only 16-bit WAV supported"
-        assert n_channels == 1, "Only mono WAV supported"
-        assert framerate == 44100, "Must be 44.1 kHz audio"
-        assert int(duration) == 10, "Must be 10 seconds long"
-
-        print(f"Loaded {wav_path}: {duration}s, {n_frames} frames")
-
-        frames = wf.readframes(n_frames)
-        samples = struct.unpack("<{}h".format(n_frames), frames)
-
-        # Save to txt
-        with open(txt_path, "w") as f:
-            for s in samples:
-                f.write(f"{s}\n")
-
-        print(f"Saved {n_frames} samples to {txt_path}")
-
-        # Optional: print interval stats
-        print("Min/Max per second (optional check):")
-        for i in range(10):
-            chunk = samples[i*44100 : (i+1)*44100]
-            print(f"Interval {i+1}: min={min(chunk)}, max={max(chunk)}")
+TESTBENCH_SAMPLE_RATE = 44100  # Samples per interval assumed by the testbenches
+
+def wav_to_txt(wav_path, txt_path, interval_seconds=1.0):
+    # Any PCM (8/16/24/32-bit), float or WAVE_FORMAT_EXTENSIBLE file, mixed down to mono 16-bit
+    samples, framerate, header = decode_wav(wav_path, dtype=np.int16)
+    n_frames = samples.size
+    duration = n_frames / framerate
+
+    print(f"Loaded {wav_path}: {duration}s, {n_frames} frames "
+          f"({header['sample_format']}, {header['channels']} channel(s), {framerate} Hz)")
+    if framerate != TESTBENCH_SAMPLE_RATE:
+        print(f"Note: the testbenches count {TESTBENCH_SAMPLE_RATE} samples per interval.")
+
+    # Save to txt in bulk (same bytes as writing f"{s}\n" per sample)
+    write_text_samples(txt_path, samples)
+
+    print(f"Saved {n_frames} samples to {txt_path}")
+
+    # Optional: print interval stats
+    print("Min/Max per second (optional check):")
+    samples_per_interval = int(framerate * interval_seconds)
+    num_intervals = n_frames // samples_per_interval
+    intervals = samples[:num_intervals * samples_per_interval].reshape(num_intervals, samples_per_interval)
+    for i, (lo, hi) in enumerate(zip(intervals.min(axis=1), intervals.max(axis=1))):
+        print(f"Interval {i+1}: min={lo}, max={hi}")
 
 if __name__ == "__main__":
     wav_to_txt(WAV_FILE, TXT_FILE)
@@ -0,0 +1,172 @@
+# amplitude_histogram.py
+import time
+import numpy as np
+
+# Per-interval and global amplitude histograms over the 16-bit range, for choosing clipping and
+# limiter thresholds from the amplitude distribution instead of only the extremes.
+#
+# A float sample x is quantized to the 16-bit code int(x * 32768) clipped to [-32768, 32767], the
+# same truncation as the 16-bit scaled interval min/max. With num_bins bins (a power of two up to
+# 65536) bin b holds the codes [b * w - 32768, (b + 1) * w - 32768) where w = 65536 / num_bins,
+# i.e. bin = (code + 32768) >> shift. The histograms are counted in the same pass as the fused
+# min/max statistics: on the CPU with one bincount per chunk of intervals, on the device inside
+# fused_stats_interval_kernel (work-group local bins merged into the global histogram with atomics).
+#
+# Percentiles come from the cumulative counts (rank -> first bin whose cumulative count exceeds it),
+# so nothing is sorted. They are exact with 65536 bins and the lower bin edge otherwise, with the
+# interpolation of outlier_filters.select_percentiles between neighbouring ranks.
+
+DEFAULT_NUM_BINS = 1024
+MAX_NUM_BINS = 65536
+
+
+def histogram_shift(num_bins):
+    """Right shift mapping an offset 16-bit code to its bin; num_bins must be a power of two up to 65536."""
+    num_bins = int(num_bins)
+    if num_bins < 1 or num_bins > MAX_NUM_BINS or num_bins & (num_bins - 1):
+        raise ValueError(f"num_bins must be a power of two between 1 and {MAX_NUM_BINS}, got {num_bins}.")
+    return 16 - (num_bins.bit_length() - 1)
+
+
+def sample_bins(audio_data, num_bins):
+    """Bin index of every float32 sample (same shape as audio_data, int32)."""
+    codes = np.multiply(audio_data, 32768, dtype=np.float32)
+    np.clip(codes, -32768, 32767, out=codes)
+    bins = codes.astype(np.int32)  # Truncates toward zero like int(x * 32768)
+    bins += 32768
+    bins >>= histogram_shift(num_bins)
+    return bins
+
+
+def block_histograms(blocks, num_bins):
+    """Histogram of each row of a 2D float32 block of intervals: (rows, num_bins) int64 counts."""
+    rows = blocks.shape[0]
+    bins = sample_bins(blocks, num_bins)
+    bins += (np.arange(rows, dtype=np.int32) * num_bins)[:, None]
+    return np.bincount(bins.ravel(), minlength=rows * num_bins).reshape(rows, num_bins)
+
+
+def histogram_rows_percentiles(counts, qs, num_bins=None):
+    """
+    Percentiles (as 16-bit codes) of every row of a 2D histogram without sorting.
+
+    Args:
+        counts: (rows, num_bins) array of bin counts.
+        qs: Percentiles in [0, 100].
+        num_bins (int, optional): Defaults to counts.shape[1].
+
+    Returns:
+        numpy.ndarray: (rows, len(qs)) float64; NaN for empty rows.
+    """
+    counts = np.atleast_2d(np.asarray(counts, dtype=np.int64))
+    rows, width = counts.shape
+    width = 1 << histogram_shift(num_bins or width)
+    qs = np.asarray(qs, dtype=np.float64)
+    totals = counts.sum(axis=1)
+    # One cumulative sum over all rows; row r's ranks are offset by the counts of the rows before it
+    cumulative = np.cumsum(counts.ravel())
+    row_offsets = np.concatenate(([0], np.cumsum(totals)[:-1]))
+    positions = qs[None, :] / 100.0 * np.maximum(totals - 1, 0)[:, None]
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, np.maximum(totals - 1, 0)[:, None])
+    row_starts = (np.arange(rows) * counts.shape[1])[:, None]
+
+    def code_at(rank):
+        flat = np.searchsorted(cumulative, rank + row_offsets[:, None], side='right')
+        return (flat - row_starts) * width - 32768.0
+
+    low = code_at(below)
+    high = code_at(above)
+    result = low + (positions - below) * (high - low)
+    result[totals == 0] = np.nan
+    return result
+
+
+class AmplitudeHistograms:
+    """
+    Histograms of one analysis: interval_counts holds a row per complete interval, global_counts
+    covers every sample including a partial last interval.
+    """
+
+    def __init__(self, interval_counts, global_counts, num_bins):
+        self.interval_counts = np.asarray(interval_counts, dtype=np.int64)
+        self.global_counts = np.asarray(global_counts, dtype=np.int64)
+        self.num_bins = num_bins
+        self.bin_width = 1 << histogram_shift(num_bins)
+
+    def bin_edges(self):
+        """The num_bins + 1 bin edges as 16-bit codes."""
+        return np.arange(self.num_bins + 1, dtype=np.int64) * self.bin_width - 32768
+
+    def interval_percentiles(self, qs):
+        """(num_intervals, len(qs)) percentiles of every complete interval, as 16-bit codes."""
+        return histogram_rows_percentiles(self.interval_counts.reshape(-1, self.num_bins), qs, self.num_bins)
+
+    def global_percentiles(self, qs):
+        """Percentiles over all samples, as 16-bit codes."""
+        return histogram_rows_percentiles(self.global_counts, qs, self.num_bins)[0]
+
+
+def compute_amplitude_histograms(audio_data, sample_rate, interval_length_seconds, num_bins=DEFAULT_NUM_BINS,
+                                 processor=None):
+    """
+    Fused interval statistics and amplitude histograms of a float32 array in one pass.
+
+    Args:
+        audio_data: NumPy array of float32 audio samples in [-1.0, 1.0].
+        sample_rate: Samples per second (e.g., 44100 Hz).
+        interval_length_seconds: Length of each interval in seconds (e.g., 1.0).
+        num_bins (int): Power of two up to 65536; 65536 gives exact percentiles.
+        processor (OpenCLProcessor, optional): Count on the device; the CPU path is used otherwise.
+
+    Returns:
+        Tuple (stats, histograms, total_time): stats as returned by
+        sequential_processors.combine_fused_statistics, and an AmplitudeHistograms.
+    """
+    from sequential_processors import combine_fused_statistics, sequential_fused_partials
+
+    histogram_shift(num_bins)
+    samples_per_interval = int(sample_rate * interval_length_seconds)
+    if samples_per_interval == 0:
+        raise ValueError("Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+    start_time = time.time()
+    audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+    num_intervals = audio_data.size // samples_per_interval
+    if audio_data.size == 0:
+        empty = np.zeros((0, num_bins), dtype=np.int64)
+        return None, AmplitudeHistograms(empty, np.zeros(num_bins, dtype=np.int64), num_bins), 0.0
+    if processor is None:
+        partials, _ = sequential_fused_partials(audio_data, samples_per_interval, num_bins=num_bins)
+    else:
+        partials, _ = processor.fused_partials(audio_data, samples_per_interval, num_bins=num_bins)
+    stats = combine_fused_statistics(partials, num_intervals)
+    histograms = AmplitudeHistograms(partials["hist"][:num_intervals], partials["global_hist"], num_bins)
+    return stats, histograms, time.time() - start_time
+
+
+if __name__ == "__main__":
+    import argparse
+    from audio_generator import load_wav_to_float_array
+
+    parser = argparse.ArgumentParser(description="Per-interval amplitude histograms and percentiles of a WAV file.")
+    parser.add_argument("wav", help="WAV file to analyze")
+    parser.add_argument("--interval", type=float, default=1.0, help="Interval length in seconds")
+    parser.add_argument("--bins", type=int, default=DEFAULT_NUM_BINS, help="Number of bins (power of two)")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=[0.1, 50.0, 99.9])
+    parser.add_argument("--opencl", action="store_true", help="Count the histograms on the OpenCL device")
+    args = parser.parse_args()
+
+    audio, sr = load_wav_to_float_array(args.wav)
+    if audio is not None:
+        processor = None
+        if args.opencl:
+            from opencl_processors import OpenCLProcessor
+            processor = OpenCLProcessor()
+        _, hists, elapsed = compute_amplitude_histograms(audio, sr, args.interval, args.bins, processor)
+        per_interval = hists.interval_percentiles(args.percentiles)
+        header = "".join(f"{f'p{q:g}':>10}" for q in args.percentiles)
+        print(f"{'Interval':>8}{header}")
+        for i in range(min(10, per_interval.shape[0])):
+            print(f"{i:>8}" + "".join(f"{v:>10.1f}" for v in per_interval[i]))
+        print(f"{'Global':>8}" + "".join(f"{v:>10.1f}" for v in hists.global_percentiles(args.percentiles)))
+        print(f"{per_interval.shape[0]} intervals, {args.bins} bins in {elapsed:.3f} s")
@@ -0,0 +1,414 @@
+# analysis_service.py
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+
+from live_ingest import LatencyRecorder
+from partial_summary import PartialSummary
+
+# Long-running analysis daemon. Python startup, the SciPy/pyopencl imports, the OpenCL context and
+# the kernel build are paid once; every job then reuses the warm OpenCLProcessor. Jobs arrive as
+# small HTTP/1.1 requests on a Unix socket or a localhost TCP port (addresses as in live_ingest:
+# 'unix:<path>' or 'tcp:<host>:<port>'):
+#
+#   POST /analyze             JSON {"path": ..., "interval_length_s", "backend", "filter_method",
+#                             "filter_params", "sample_rate" (raw/text files)}
+#   POST /analyze?sample_rate=44100&dtype=int16&interval_length_s=1.0&backend=opencl
+#                             application/octet-stream body of little-endian int16 or float32 samples
+#   GET  /metrics             queue depth, job counts and latency percentiles
+#   GET  /health
+#
+# At most max_concurrent jobs run at once and at most max_queue more wait; further jobs are
+# rejected immediately with 503 and Retry-After instead of piling up.
+
+DEFAULT_ADDRESS = "unix:/tmp/spm_service.sock"
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_MAX_QUEUE = 16
+MAX_PAYLOAD_BYTES = 1 << 30
+BACKENDS = ("sequential", "opencl")
+PAYLOAD_DTYPES = {"int16": np.dtype('<i2'), "float32": np.dtype('<f4')}
+RAW_EXTENSIONS = (".raw", ".pcm", ".bin")
+_STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class JobError(Exception):
+    """A job that cannot be processed; reported to the client with the given HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def load_job_samples(path, sample_rate=None):
+    """
+    Loads a job's input file as float32 samples in [-1.0, 1.0].
+
+    WAV files carry their own rate; .raw/.pcm/.bin (int16) and .txt (one float per line) files
+    use sample_rate.
+
+    Returns:
+        Tuple (samples, sample_rate).
+    """
+    if not os.path.exists(path):
+        raise JobError(404, f"File '{path}' not found.")
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".wav":
+        from audio_generator import load_wav_to_float_array
+        samples, sr = load_wav_to_float_array(path)
+        if samples is None:
+            raise JobError(400, f"Could not decode WAV file '{path}'.")
+        return samples, sr
+    if sample_rate is None:
+        raise JobError(400, "sample_rate is required for raw and text inputs.")
+    if ext in RAW_EXTENSIONS:
+        return np.fromfile(path, dtype='<i2').astype(np.float32) / np.float32(32768), sample_rate
+    if ext == ".txt":
+        from sample_text_io import read_text_samples
+        return read_text_samples(path, dtype=np.float32), sample_rate
+    raise JobError(400, f"Unsupported input format '{ext}'.")
+
+
+class AnalysisService:
+    """
+    Runs analysis jobs on warm backends with bounded concurrency.
+
+    Args:
+        max_concurrent (int): Jobs processed at the same time (worker threads).
+        max_queue (int): Jobs allowed to wait for a worker before new ones are rejected.
+        use_opencl (bool): Create the OpenCL backend at startup; without it only "sequential" is served.
+        results_store (results_store.ResultsStore, optional): Appends the results of every file job.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, max_queue=DEFAULT_MAX_QUEUE, use_opencl=True,
+                 results_store=None):
+        self.max_concurrent = max_concurrent
+        self.results_store = results_store
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="spm-job")
+        self.processor = None
+        # One command queue: OpenCL jobs are serialized, CPU jobs run alongside them
+        self.opencl_lock = threading.Lock()
+        if use_opencl:
+            try:
+                from opencl_processors import OpenCLProcessor
+                self.processor = OpenCLProcessor()
+            except Exception as e:
+                print(f"Warning: OpenCL backend unavailable ({e}); serving the sequential backend only.")
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_latency = LatencyRecorder()
+        self.service_latency = LatencyRecorder()
+        self.total_latency = LatencyRecorder()
+        self.started = time.time()
+
+    def warm_up(self):
+        """Runs a tiny job on every backend so the first real job does not pay first-launch costs."""
+        samples = np.zeros(4096, dtype=np.float32)
+        for backend in self.backends():
+            self.analyze(samples, 1024, 1.0, backend)
+
+    def backends(self):
+        return BACKENDS if self.processor is not None else ("sequential",)
+
+    def analyze(self, samples, sample_rate, interval_length_seconds=1.0, backend="opencl",
+                filter_method="sigma", filter_params=None):
+        """Interval analysis of one job (worker thread); results as PartialSummary.finalize."""
+        if backend not in self.backends():
+            raise JobError(400, f"Backend '{backend}' is not available; expected one of {self.backends()}.")
+        samples_per_interval = int(sample_rate * interval_length_seconds)
+        if samples_per_interval == 0:
+            raise JobError(400, "Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+        if backend == "opencl":
+            with self.opencl_lock:
+                summary = PartialSummary.from_samples(samples, 0, samples_per_interval, self.processor)
+        else:
+            summary = PartialSummary.from_samples(samples, 0, samples_per_interval)
+        try:
+            results = summary.finalize(filter_method, filter_params)
+        except (TypeError, ValueError) as e:
+            raise JobError(400, str(e))
+        results["sample_rate"] = sample_rate
+        results["interval_length_s"] = interval_length_seconds
+        results["backend"] = backend
+        return results
+
+    def _run_job(self, job, payload, queued_at):
+        started = time.perf_counter()
+        self.queue_latency.record(started - queued_at)
+        if payload is None:
+            samples, sample_rate = load_job_samples(job["path"], job.get("sample_rate"))
+        else:
+            samples, sample_rate = payload, job["sample_rate"]
+        results = self.analyze(samples, sample_rate, job.get("interval_length_s", 1.0),
+                               job.get("backend", "opencl" if self.processor is not None else "sequential"),
+                               job.get("filter_method", "sigma"), job.get("filter_params"))
+        if self.results_store is not None and payload is None:
+            results["file_id"] = self.results_store.append(job["path"], results, filter_method=job.get("filter_method", "sigma"),
+                                                           filter_params=job.get("filter_params"))
+        finished = time.perf_counter()
+        self.service_latency.record(finished - started)
+        results["queue_s"] = started - queued_at
+        results["service_s"] = finished - started
+        return results
+
+    async def submit(self, job, payload=None):
+        """
+        Admits a job or rejects it with 503 when max_concurrent + max_queue jobs are in flight,
+        then waits for its result.
+        """
+        if self.waiting + self.running >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise JobError(503, "Service is at capacity; retry later.")
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        loop = asyncio.get_running_loop()
+
+        def run():
+            # Executes on a worker thread; counters are updated on the event loop
+            loop.call_soon_threadsafe(self._mark_started)
+            return self._run_job(job, payload, queued_at)
+
+        try:
+            results = await loop.run_in_executor(self.executor, run)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+        self.completed += 1
+        self.total_latency.record(time.perf_counter() - queued_at)
+        return results
+
+    def _mark_started(self):
+        self.waiting -= 1
+        self.running += 1
+
+    def metrics(self):
+        def ms(recorder):
+            return {f"p{q}": v * 1e3 for q, v in recorder.percentiles().items()}
+
+        return {
+            "uptime_s": time.time() - self.started,
+            "backends": list(self.backends()),
+            "queue_depth": self.waiting,
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_latency_ms": ms(self.queue_latency),
+            "service_latency_ms": ms(self.service_latency),
+            "total_latency_ms": ms(self.total_latency),
+        }
+
+
+# --- minimal HTTP/1.1 front end ---
+
+async def _read_request(reader):
+    """(method, target, headers, body) of one request, or None at end of stream."""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_PAYLOAD_BYTES:
+        raise JobError(413, f"Payload exceeds {MAX_PAYLOAD_BYTES} bytes.")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def _response(status, document, keep_alive):
+    body = json.dumps(document).encode()
+    headers = [f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}", "Content-Type: application/json",
+               f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if status == 503:
+        headers.append("Retry-After: 1")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+def _parse_job(target, headers, body):
+    """(job dict, payload samples or None) of a POST /analyze request."""
+    query = {k: v[-1] for k, v in parse_qs(urlsplit(target).query).items()}
+    if headers.get("content-type", "").startswith("application/json"):
+        job = json.loads(body or b"{}")
+        if "path" not in job:
+            raise JobError(400, "JSON jobs need a 'path'.")
+        return job, None
+    # Raw sample payload described by the query string
+    dtype = PAYLOAD_DTYPES.get(query.get("dtype", "int16"))
+    if dtype is None:
+        raise JobError(400, f"dtype must be one of {list(PAYLOAD_DTYPES)}.")
+    if "sample_rate" not in query:
+        raise JobError(400, "sample_rate is required for sample payloads.")
+    if len(body) % dtype.itemsize:
+        raise JobError(400, "Payload length is not a whole number of samples.")
+    samples = np.frombuffer(body, dtype=dtype)
+    samples = samples.astype(np.float32) / np.float32(32768) if dtype.kind == "i" else samples.astype(np.float32)
+    job = {"sample_rate": int(query["sample_rate"]),
+           "interval_length_s": float(query.get("interval_length_s", 1.0))}
+    for key in ("backend", "filter_method"):
+        if key in query:
+            job[key] = query[key]
+    if "filter_params" in query:
+        job["filter_params"] = json.loads(query["filter_params"])
+    return job, samples
+
+
+async def _handle_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except JobError as e:
+                writer.write(_response(e.status, {"error": str(e)}, False))
+                break
+            except (asyncio.IncompleteReadError, ValueError):
+                break
+            if request is None:
+                break
+            method, target, headers, body = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+            path = urlsplit(target).path
+            try:
+                if method == "GET" and path == "/health":
+                    status, document = 200, {"status": "ok"}
+                elif method == "GET" and path == "/metrics":
+                    status, document = 200, service.metrics()
+                elif method == "POST" and path == "/analyze":
+                    job, payload = _parse_job(target, headers, body)
+                    status, document = 200, await service.submit(job, payload)
+                else:
+                    status, document = 404, {"error": f"No route for {method} {path}."}
+            except JobError as e:
+                status, document = e.status, {"error": str(e)}
+            except (ValueError, KeyError, TypeError) as e:
+                status, document = 400, {"error": str(e)}
+            except Exception as e:
+                status, document = 500, {"error": f"{type(e).__name__}: {e}"}
+            writer.write(_response(status, document, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(address=DEFAULT_ADDRESS, service=None, ready=None):
+    """
+    Serves jobs on 'unix:<path>' or 'tcp:<host>:<port>' until cancelled.
+
+    Args:
+        service (AnalysisService, optional): Defaults to a new, warmed-up service.
+        ready (asyncio.Event, optional): Set once the server is listening.
+    """
+    if service is None:
+        service = AnalysisService()
+        service.warm_up()
+
+    async def handle(reader, writer):
+        await _handle_connection(service, reader, writer)
+
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(handle, path=path, limit=1 << 20)
+    elif address.startswith("tcp:"):
+        host, port = address[len("tcp:"):].rsplit(":", 1)
+        server = await asyncio.start_server(handle, host=host, port=int(port), limit=1 << 20)
+    else:
+        raise ValueError(f"Unknown service address '{address}'.")
+
+    print(f"Analysis service listening on {address} (backends: {', '.join(service.backends())}, "
+          f"max {service.max_concurrent} concurrent, {service.max_queue} queued).")
+    async with server:
+        if ready is not None:
+            ready.set()
+        await server.serve_forever()
+
+
+# --- client ---
+
+def request(address, method, target, body=b"", content_type="application/json", timeout=None):
+    """
+    Sends one HTTP request to the service and returns (status, document).
+    """
+    if address.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address[len("unix:"):])
+    else:
+        host, port = address[len("tcp:"):].rsplit(":", 1)
+        sock = socket.create_connection((host, int(port)), timeout=timeout)
+    with sock:
+        head = (f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        sock.sendall(head.encode() + bytes(body))
+        chunks = []
+        while True:
+            chunk = sock.recv(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    response = b"".join(chunks)
+    header, _, payload = response.partition(b"\r\n\r\n")
+    status = int(header.split(b" ", 2)[1])
+    return status, json.loads(payload)
+
+
+def analyze_file(address, path, **params):
+    """Submits a file job; params are interval_length_s, backend, filter_method, filter_params, sample_rate."""
+    return request(address, "POST", "/analyze", json.dumps({"path": os.path.abspath(path), **params}).encode())
+
+
+def analyze_samples(address, samples, sample_rate, interval_length_s=1.0, **params):
+    """Submits int16 or float32 samples as the request body."""
+    samples = np.asarray(samples)
+    dtype = "int16" if samples.dtype == np.int16 else "float32"
+    query = {"sample_rate": sample_rate, "dtype": dtype, "interval_length_s": interval_length_s, **params}
+    if "filter_params" in query:
+        query["filter_params"] = json.dumps(query["filter_params"])
+    target = "/analyze?" + "&".join(f"{k}={v}" for k, v in query.items())
+    body = samples.astype(PAYLOAD_DTYPES[dtype], copy=False).tobytes()
+    return request(address, "POST", target, body, "application/octet-stream")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Warm analysis daemon with a local job API.")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="unix:<path> or tcp:<host>:<port>")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT)
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE)
+    parser.add_argument("--no-opencl", action="store_true", help="Serve the sequential backend only")
+    parser.add_argument("--results-store", help="Append the results of file jobs to this results store directory")
+    args = parser.parse_args()
+
+    store = None
+    if args.results_store:
+        from results_store import ResultsStore
+        store = ResultsStore(args.results_store)
+    service = AnalysisService(args.max_concurrent, args.max_queue, use_opencl=not args.no_opencl, results_store=store)
+    service.warm_up()
+    try:
+        asyncio.run(serve(args.address, service))
+    except KeyboardInterrupt:
+        print("\nAnalysis service stopped.")
@@ -1,76 +1,213 @@
 
 #include <stdio.h>
 #include <stdlib.h>
+#include <stdint.h>
+#include <string.h>
 #include <math.h>
 
-#define TOTAL_SAMPLES 441000
-#define INTERVAL_LEN 44100
-#define NUM_INTERVALS (TOTAL_SAMPLES / INTERVAL_LEN)
+/*
+ * C reference for the interval min/max measure.
+ *
+ * Built as an executable it reads a text (one sample per line) or raw int16 file of any
+ * length and prints the same report as before:
+ *     gcc -O3 -o audio_filter_reference audio_filter_reference.c -lm
+ *     ./audio_filter_reference [audio_samples.txt|samples.raw] [interval_len]
+ *
+ * Built as a shared library (native_processors.py does this on demand) it exposes the
+ * reductions over caller-provided int16 buffers:
+ *     gcc -O3 -shared -fPIC -DSPM_LIBRARY -o libaudio_filter_reference.so audio_filter_reference.c -lm
+ */
 
-short audio_data[TOTAL_SAMPLES];
-short min_vals[NUM_INTERVALS];
-short max_vals[NUM_INTERVALS];
+#define DEFAULT_INTERVAL_LEN 44100
 
-void load_audio_data(const char *filename) {
-    FILE *file = fopen(filename, "r");
-    if (!file) {
-        perror("Failed to open input file");
-        exit(1);
-    }
-    for (int i = 0; i < TOTAL_SAMPLES; i++) {
-        fscanf(file, "%hd", &audio_data[i]);
+/* Streaming interval state: intervals may span any number of spm_interval_feed calls. */
+typedef struct {
+    uint64_t interval_len;
+    uint64_t fill;      /* Samples of the current interval seen so far */
+    int16_t cur_min;
+    int16_t cur_max;
+} spm_interval_state;
+
+/* Min/max of a block; written so the compiler vectorizes it (pminsw/pmaxsw). */
+static void block_min_max(const int16_t *restrict samples, uint64_t n, int16_t *min_out, int16_t *max_out) {
+    int16_t min = *min_out;
+    int16_t max = *max_out;
+    for (uint64_t i = 0; i < n; i++) {
+        int16_t s = samples[i];
+        min = s < min ? s : min;
+        max = s > max ? s : max;
     }
-    fclose(file);
+    *min_out = min;
+    *max_out = max;
+}
+
+int spm_global_min_max(const int16_t *samples, uint64_t n, int16_t *min_out, int16_t *max_out) {
+    if (n == 0) return 0;
+    *min_out = 32767;
+    *max_out = -32768;
+    block_min_max(samples, n, min_out, max_out);
+    return 1;
 }
 
-void compute_intervals() {
-    for (int i = 0; i < NUM_INTERVALS; i++) {
-        short min = 32767;
-        short max = -32768;
-        for (int j = 0; j < INTERVAL_LEN; j++) {
-            short sample = audio_data[i * INTERVAL_LEN + j];
-            if (sample < min) min = sample;
-            if (sample > max) max = sample;
+void spm_interval_init(spm_interval_state *state, uint64_t interval_len) {
+    state->interval_len = interval_len;
+    state->fill = 0;
+    state->cur_min = 32767;
+    state->cur_max = -32768;
+}
+
+/*
+ * Feeds n samples; writes the min/max of every interval completed by them (at most max_out)
+ * and returns how many were written. Samples that would complete an interval beyond max_out
+ * are left unconsumed and their count is stored in *remaining so the caller can feed them again.
+ */
+uint64_t spm_interval_feed(spm_interval_state *state, const int16_t *samples, uint64_t n,
+                           int16_t *mins, int16_t *maxs, uint64_t max_out, uint64_t *remaining) {
+    uint64_t done = 0;
+    uint64_t pos = 0;
+    if (state->interval_len == 0) {
+        if (remaining) *remaining = n;
+        return 0;
+    }
+    while (pos < n) {
+        uint64_t take = state->interval_len - state->fill;
+        if (take > n - pos) take = n - pos;
+        if (state->fill + take == state->interval_len && done == max_out) break;
+        block_min_max(samples + pos, take, &state->cur_min, &state->cur_max);
+        pos += take;
+        state->fill += take;
+        if (state->fill == state->interval_len) {
+            mins[done] = state->cur_min;
+            maxs[done] = state->cur_max;
+            done++;
+            state->fill = 0;
+            state->cur_min = 32767;
+            state->cur_max = -32768;
         }
-        min_vals[i] = min;
-        max_vals[i] = max;
-        printf("Interval %d: Min = %d, Max = %d\n", i, min, max);
     }
+    if (remaining) *remaining = n - pos;
+    return done;
+}
+
+/* Min/max of the pending partial interval; returns its sample count (0 if empty). */
+uint64_t spm_interval_partial(const spm_interval_state *state, int16_t *min_out, int16_t *max_out) {
+    *min_out = state->cur_min;
+    *max_out = state->cur_max;
+    return state->fill;
 }
 
-void filter_and_print() {
-    double min_sum = 0, max_sum = 0;
-    for (int i = 0; i < NUM_INTERVALS; i++) {
-        min_sum += min_vals[i];
-        max_sum += max_vals[i];
+/* Min/max of the n / interval_len complete intervals of a buffer; returns the interval count. */
+uint64_t spm_interval_min_max(const int16_t *samples, uint64_t n, uint64_t interval_len,
+                              int16_t *mins, int16_t *maxs) {
+    if (interval_len == 0) return 0;
+    uint64_t num_intervals = n / interval_len;
+    for (uint64_t i = 0; i < num_intervals; i++) {
+        mins[i] = 32767;
+        maxs[i] = -32768;
+        block_min_max(samples + i * interval_len, interval_len, &mins[i], &maxs[i]);
     }
-    double min_mean = min_sum / NUM_INTERVALS;
-    double max_mean = max_sum / NUM_INTERVALS;
+    return num_intervals;
+}
 
-    double min_std_sum = 0, max_std_sum = 0;
-    for (int i = 0; i < NUM_INTERVALS; i++) {
-        min_std_sum += pow(min_vals[i] - min_mean, 2);
-        max_std_sum += pow(max_vals[i] - max_mean, 2);
+/*
+ * Writes the indices of the values within mean +/- sigma * std (population std) and returns
+ * how many were kept. A single value is always kept, as in the Python processors.
+ */
+uint64_t spm_filter_within_sigma(const int16_t *values, uint64_t n, double sigma, int64_t *indices) {
+    if (n == 0) return 0;
+    if (n == 1) {
+        indices[0] = 0;
+        return 1;
+    }
+    double sum = 0;
+    for (uint64_t i = 0; i < n; i++) sum += values[i];
+    double mean = sum / n;
+    double sq_sum = 0;
+    for (uint64_t i = 0; i < n; i++) sq_sum += (values[i] - mean) * (values[i] - mean);
+    double band = sigma * sqrt(sq_sum / n);
+    uint64_t kept = 0;
+    for (uint64_t i = 0; i < n; i++) {
+        if (values[i] >= mean - band && values[i] <= mean + band) indices[kept++] = (int64_t)i;
     }
-    double min_std = sqrt(min_std_sum / NUM_INTERVALS);
-    double max_std = sqrt(max_std_sum / NUM_INTERVALS);
+    return kept;
+}
+
+#ifndef SPM_LIBRARY
 
-    printf("\n--- Filtered Min Values ---\n");
-    for (int i = 0; i < NUM_INTERVALS; i++) {
-        if (min_vals[i] >= min_mean - min_std && min_vals[i] <= min_mean + min_std)
-            printf("Filtered Min[%d] = %d\n", i, min_vals[i]);
+/* Reads a raw little-endian int16 file, or a text file with one integer sample per line. */
+static int16_t *load_audio_data(const char *filename, uint64_t *n_out) {
+    FILE *file = fopen(filename, "rb");
+    if (!file) {
+        perror("Failed to open input file");
+        exit(1);
+    }
+    fseek(file, 0, SEEK_END);
+    long size = ftell(file);
+    fseek(file, 0, SEEK_SET);
+    char *buf = malloc(size + 1);
+    if (!buf || fread(buf, 1, size, file) != (size_t)size) {
+        perror("Failed to read input file");
+        exit(1);
+    }
+    fclose(file);
+    buf[size] = '\0';
+
+    const char *ext = strrchr(filename, '.');
+    if (ext && (strcmp(ext, ".raw") == 0 || strcmp(ext, ".pcm") == 0 || strcmp(ext, ".bin") == 0)) {
+        *n_out = size / sizeof(int16_t);
+        return (int16_t *)buf;
     }
 
-    printf("\n--- Filtered Max Values ---\n");
-    for (int i = 0; i < NUM_INTERVALS; i++) {
-        if (max_vals[i] >= max_mean - max_std && max_vals[i] <= max_mean + max_std)
-            printf("Filtered Max[%d] = %d\n", i, max_vals[i]);
+    /* Text never holds more samples than half its bytes ("0\n" is the shortest line) */
+    int16_t *samples = malloc((size / 2 + 1) * sizeof(int16_t));
+    uint64_t n = 0;
+    char *p = buf;
+    char *end;
+    for (;;) {
+        long v = strtol(p, &end, 10);
+        if (end == p) break;
+        samples[n++] = (int16_t)v;
+        p = end;
     }
+    free(buf);
+    *n_out = n;
+    return samples;
 }
 
-int main() {
-    load_audio_data("audio_samples.txt");
-    compute_intervals();
-    filter_and_print();
+static void filter_and_print(const char *label, const int16_t *values, uint64_t n) {
+    int64_t *kept = malloc((n + 1) * sizeof(int64_t));
+    uint64_t num_kept = spm_filter_within_sigma(values, n, 1.0, kept);
+    printf("\n--- Filtered %s Values ---\n", label);
+    for (uint64_t i = 0; i < num_kept; i++)
+        printf("Filtered %s[%lld] = %d\n", label, (long long)kept[i], values[kept[i]]);
+    free(kept);
+}
+
+int main(int argc, char **argv) {
+    const char *filename = argc > 1 ? argv[1] : "audio_samples.txt";
+    uint64_t interval_len = argc > 2 ? strtoull(argv[2], NULL, 10) : DEFAULT_INTERVAL_LEN;
+    if (interval_len == 0) {
+        fprintf(stderr, "Interval length must be positive\n");
+        return 1;
+    }
+
+    uint64_t n;
+    int16_t *audio_data = load_audio_data(filename, &n);
+    uint64_t num_intervals = n / interval_len;
+    int16_t *min_vals = malloc((num_intervals + 1) * sizeof(int16_t));
+    int16_t *max_vals = malloc((num_intervals + 1) * sizeof(int16_t));
+
+    spm_interval_min_max(audio_data, n, interval_len, min_vals, max_vals);
+    for (uint64_t i = 0; i < num_intervals; i++)
+        printf("Interval %llu: Min = %d, Max = %d\n", (unsigned long long)i, min_vals[i], max_vals[i]);
+
+    filter_and_print("Min", min_vals, num_intervals);
+    filter_and_print("Max", max_vals, num_intervals);
+
+    free(audio_data);
+    free(min_vals);
+    free(max_vals);
     return 0;
 }
+
+#endif
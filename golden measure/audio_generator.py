@@ -1,7 +1,14 @@
 import numpy as np
 import os
-from scipy.io import wavfile # For reading WAV files
-from scipy.signal import resample # For resampling if needed
+import math
+from numpy.lib.stride_tricks import sliding_window_view
+from sample_text_io import write_text_samples
+from wav_decoder import decode_wav, read_wav_header
+
+DEFAULT_RESAMPLE_BLOCK = 65536  # Input samples per block for streaming resampling
+MAX_POLYPHASE_FACTOR = 4096  # Larger up/down factors fall back to FFT resampling
+# scipy is imported where it is used (filter design, FFT resampling): importing scipy.signal costs
+# about a second, which a load without resampling should not pay.
 
 def generate_audio_text_file(filename="audio_samples.txt", duration_seconds=10, sample_rate=44100):
     """
@@ -19,12 +26,124 @@ def generate_audio_text_file(filename="audio_samples.txt", duration_seconds=10,
     
     os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
 
-    with open(filename, 'w') as f:
-        for sample in audio_data:
-            f.write(f"{sample}\n")
+    write_text_samples(filename, audio_data)
     print(f"Generated '{filename}' with {num_samples} samples.")
 
-def load_wav_to_float_array(filepath, target_sample_rate=None):
+class StreamingResampler:
+    """
+    Block-by-block polyphase resampler for a rational rate ratio up/down (e.g. 48000 -> 44100 is 147/160).
+
+    Uses the same Kaiser-windowed FIR and delay compensation as scipy.signal.resample_poly, so the
+    concatenated output of process() + flush() equals resample_poly on the whole signal. Signal edges
+    are zero-padded rather than wrapped around like the FFT resampler, and only the last few filter
+    taps of input are carried between blocks, so memory stays bounded by the block size.
+    """
+
+    def __init__(self, up, down):
+        g = math.gcd(up, down)
+        self.up = up // g
+        self.down = down // g
+        max_rate = max(self.up, self.down)
+        self.half_len = 10 * max_rate
+        from scipy.signal import firwin
+        h = firwin(2 * self.half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0)) * self.up
+        # Polyphase decomposition: phase p uses taps h[p], h[p + up], h[p + 2*up], ...
+        self.taps_per_phase = -(-h.size // self.up)
+        h = np.concatenate((h, np.zeros(self.taps_per_phase * self.up - h.size)))
+        phases = h.reshape(self.taps_per_phase, self.up).T
+        # Reversed so a sliding window over the input (oldest first) lines up with the taps
+        self.phases = np.ascontiguousarray(phases[:, ::-1], dtype=np.float32)
+        self.reset()
+
+    @classmethod
+    def for_rates(cls, source_rate, target_rate):
+        """Builds a resampler for integer rates, or returns None if the ratio is too fine for polyphase."""
+        if int(source_rate) != source_rate or int(target_rate) != target_rate:
+            return None
+        g = math.gcd(int(source_rate), int(target_rate))
+        if max(source_rate, target_rate) // g > MAX_POLYPHASE_FACTOR:
+            return None
+        return cls(int(target_rate), int(source_rate))
+
+    def reset(self):
+        """Clears the carried filter state so the resampler can start a new signal."""
+        # History starts with taps_per_phase - 1 zeros: the signal is zero before its first sample
+        self._buf = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._buf_start = -(self.taps_per_phase - 1)  # Input index of _buf[0]
+        self._received = 0
+        self._next_out = 0
+
+    def output_length(self, n_input):
+        """Number of output samples for n_input input samples (same as resample_poly)."""
+        return -(-n_input * self.up // self.down)
+
+    def process(self, block):
+        """Consumes a block of input samples and returns every output sample that is now complete."""
+        block = np.asarray(block, dtype=np.float32)
+        self._buf = np.concatenate((self._buf, block))
+        self._received += block.size
+        return self._emit(self._received, None)
+
+    def flush(self):
+        """Returns the remaining output samples, treating the signal as zero after its last sample."""
+        limit = self.output_length(self._received)
+        pad = self.half_len // self.up + self.taps_per_phase + 1
+        self._buf = np.concatenate((self._buf, np.zeros(pad, dtype=np.float32)))
+        return self._emit(self._received + pad, limit)
+
+    def _emit(self, available, limit):
+        # Output m sits at upsampled position t = m*down + half_len and needs input index t // up
+        m_end = max(self._next_out, (available * self.up - self.half_len + self.down - 1) // self.down)
+        if limit is not None:
+            m_end = min(m_end, limit)
+        if m_end <= self._next_out:
+            return np.empty(0, dtype=np.float32)
+        t = np.arange(self._next_out, m_end, dtype=np.int64) * self.down + self.half_len
+        newest = t // self.up
+        windows = sliding_window_view(self._buf, self.taps_per_phase)
+        rows = newest - (self.taps_per_phase - 1) - self._buf_start
+        out = np.einsum('ij,ij->i', windows[rows], self.phases[t % self.up])
+        self._next_out = m_end
+        # Drop input that no future output can reach
+        next_newest = (m_end * self.down + self.half_len) // self.up
+        keep_from = min(next_newest - (self.taps_per_phase - 1), self._received) - self._buf_start
+        if keep_from > 0:
+            self._buf = self._buf[keep_from:]
+            self._buf_start += keep_from
+        return out.astype(np.float32, copy=False)
+
+    def resample(self, data, block_size=DEFAULT_RESAMPLE_BLOCK):
+        """Resamples a whole array block by block into a preallocated output array."""
+        self.reset()
+        out = np.empty(self.output_length(len(data)), dtype=np.float32)
+        pos = 0
+        for start in range(0, len(data), block_size):
+            y = self.process(data[start:start + block_size])
+            out[pos:pos + y.size] = y
+            pos += y.size
+        y = self.flush()
+        out[pos:pos + y.size] = y
+        return out
+
+
+def resample_blocks(blocks, source_rate, target_rate):
+    """
+    Generator that resamples an iterable of float32 blocks with carried filter state,
+    so resampling can be fused into streaming analysis without holding the whole signal.
+    """
+    resampler = StreamingResampler.for_rates(source_rate, target_rate)
+    if resampler is None:
+        raise ValueError(f"No polyphase ratio for {source_rate} Hz -> {target_rate} Hz.")
+    for block in blocks:
+        y = resampler.process(block)
+        if y.size:
+            yield y
+    y = resampler.flush()
+    if y.size:
+        yield y
+
+
+def load_wav_to_float_array(filepath, target_sample_rate=None, resample_method="polyphase", max_memory=None):
     """
     Loads a WAV file, converts it to mono, normalizes to float32 between -1.0 and 1.0.
     Optionally resamples the audio to a target sample rate.
@@ -32,58 +151,59 @@ def load_wav_to_float_array(filepath, target_sample_rate=None):
     Args:
         filepath (str): Path to the WAV file.
         target_sample_rate (int, optional): If provided, resamples the audio to this rate.
+        resample_method (str): "polyphase" (default) resamples block by block with a polyphase FIR;
+                               "fft" uses scipy.signal.resample over the whole signal. Polyphase falls
+                               back to FFT when the rate ratio is not a manageable integer fraction.
+        max_memory (int or str, optional): Refuse to load when the decoded (and resampled) arrays would
+                                           exceed this budget; use memory_budget.analyze_budgeted instead.
 
     Returns:
         tuple: (numpy.ndarray, int) - The audio data as a float32 NumPy array, and the sample rate.
                Returns (None, None) if loading fails.
     """
     try:
-        sample_rate, data = wavfile.read(filepath)
-        print(f"Original WAV file: Sample rate = {sample_rate} Hz, Data type = {data.dtype}, Shape = {data.shape}")
-
-        # Convert to mono if stereo
-        if data.ndim > 1:
-            if data.shape[1] == 2: # Common stereo case
-                print("Converting stereo to mono by averaging channels.")
-                data = data.mean(axis=1)
-            else: # More than 2 channels, just take the first one
-                print(f"Multi-channel audio ({data.shape[1]} channels), taking the first channel.")
-                data = data[:, 0]
-
-        # Convert to float32 and normalize
-        if data.dtype == np.int16:
-            data = data.astype(np.float32) / 32768.0
-        elif data.dtype == np.int32:
-            data = data.astype(np.float32) / 2147483648.0
-        elif data.dtype == np.uint8: # 8-bit WAV
-            data = (data.astype(np.float32) - 128.0) / 128.0
-        elif data.dtype != np.float32:
-            # If it's already float but not float32, convert it.
-            # If it's some other int type, this basic normalization might not be ideal.
-            print(f"Warning: Unhandled WAV data type {data.dtype}. Attempting direct conversion to float32. Normalization might be incorrect.")
-            data = data.astype(np.float32)
-        
-        # Ensure data is between -1.0 and 1.0 if it was already float (e.g. float64)
-        if np.issubdtype(data.dtype, np.floating):
-             max_val = np.max(np.abs(data))
-             if max_val > 1.0: # Normalize if it's float but outside [-1,1]
-                 print(f"Floating point data is outside [-1,1] (max abs: {max_val}). Normalizing.")
-                 data = data / max_val
-             elif max_val == 0: # Avoid division by zero for silent audio
-                 print("Audio data is silent (all zeros).")
-
+        if max_memory is not None:
+            from memory_budget import parse_memory_size
+            with open(filepath, "rb") as f:
+                header = read_wav_header(f)
+            needed = header["num_frames"] * 4
+            if target_sample_rate is not None and target_sample_rate != header["sample_rate"]:
+                needed += int(header["num_frames"] * float(target_sample_rate) / header["sample_rate"]) * 4
+            if needed > parse_memory_size(max_memory):
+                print(f"Error: Loading '{filepath}' needs about {needed / 2**20:.1f} MiB, over the memory budget of "
+                      f"{max_memory}. Use memory_budget.analyze_budgeted to stream it instead.")
+                return None, None
+        data, sample_rate, header = decode_wav(filepath)
+        print(f"Original WAV file: Sample rate = {sample_rate} Hz, Data type = {header['sample_format']}, "
+              f"Channels = {header['channels']}, Frames = {header['num_frames']}")
+        if header["channels"] == 2:
+            print("Converting stereo to mono by averaging channels.")
+        elif header["channels"] > 2:
+            print(f"Multi-channel audio ({header['channels']} channels), taking the first channel.")
+        if data.size and header["min"] == 0 and header["max"] == 0:
+            print("Audio data is silent (all zeros).")
+        data_min, data_max = header["min"], header["max"]
 
         # Resample if a target sample rate is provided and different from the original
         if target_sample_rate is not None and target_sample_rate != sample_rate:
-            print(f"Resampling from {sample_rate} Hz to {target_sample_rate} Hz.")
-            num_samples_resampled = int(len(data) * float(target_sample_rate) / sample_rate)
-            data = resample(data, num_samples_resampled).astype(np.float32)
+            resampler = None
+            if resample_method == "polyphase":
+                resampler = StreamingResampler.for_rates(sample_rate, target_sample_rate)
+            if resampler is not None:
+                print(f"Resampling from {sample_rate} Hz to {target_sample_rate} Hz (polyphase {resampler.up}/{resampler.down}).")
+                data = resampler.resample(data)
+            else:
+                print(f"Resampling from {sample_rate} Hz to {target_sample_rate} Hz (FFT).")
+                from scipy.signal import resample
+                num_samples_resampled = int(len(data) * float(target_sample_rate) / sample_rate)
+                data = resample(data, num_samples_resampled).astype(np.float32)
+            data_min, data_max = (np.min(data), np.max(data)) if data.size else (0.0, 0.0)
             current_sample_rate = target_sample_rate
         else:
             current_sample_rate = sample_rate
             
-        print(f"Processed audio: Sample rate = {current_sample_rate} Hz, Data type = {data.dtype}, Shape = {data.shape}, Min = {np.min(data):.2f}, Max = {np.max(data):.2f}")
-        return data.astype(np.float32), current_sample_rate
+        print(f"Processed audio: Sample rate = {current_sample_rate} Hz, Data type = {data.dtype}, Shape = {data.shape}, Min = {data_min or 0.0:.2f}, Max = {data_max or 0.0:.2f}")
+        return data.astype(np.float32, copy=False), current_sample_rate
 
     except FileNotFoundError:
         print(f"Error: WAV file not found at '{filepath}'")
@@ -93,6 +213,8 @@ def load_wav_to_float_array(filepath, target_sample_rate=None):
         return None, None
 
 if __name__ == "__main__":
+    from scipy.io import wavfile
+
     # Example of generating a text file (original functionality)
     # generate_audio_text_file("dummy_audio.txt", duration_seconds=2, sample_rate=8000)
 
@@ -56,7 +56,8 @@ __kernel void min_max_global_kernel(
 
 /*
 Kernel for Interval-Based Min/Max Amplitude.
-Each work-item processes one interval.
+Each work-item processes one interval. The host launches complete intervals only (a partial
+last interval is dropped, as in the sequential and C backends), so every read is in bounds.
 */
 __kernel void min_max_interval_kernel(
     __global const float *audio_data,   // Input audio samples
@@ -72,11 +73,6 @@ __kernel void min_max_interval_kernel(
         float current_max = -FLT_MAX;
 
         unsigned int start_sample_idx = interval_idx * samples_per_interval;
-        // unsigned int end_sample_idx = start_sample_idx + samples_per_interval;
-        // Ensure we don't read past the end of audio_data if the last interval is partial
-        // However, the host code should prepare audio_data to be a multiple of samples_per_interval
-        // or handle the last partial interval separately if strictness is required.
-        // For simplicity, this kernel assumes full intervals.
 
         for (unsigned int i = 0; i < samples_per_interval; ++i) {
             float sample = audio_data[start_sample_idx + i];
@@ -87,3 +83,398 @@ __kernel void min_max_interval_kernel(
         interval_maxs[interval_idx] = current_max;
     }
 }
+
+
+/*
+Kernel for the fused statistics pass.
+One work-group per interval (the last group may cover a partial interval). Every sample is read
+once and feeds min/max with their indices, the sum, the sum of squares and the clip count; the
+work-group then reduces all of them together in local memory. The host combines the group
+results into per-interval and global statistics.
+With num_bins > 0 the same pass also counts the amplitude histogram of each group: the 16-bit
+code int(x * 32768) of each sample selects bin (code + 32768) >> hist_shift. Runs of one bin
+within a work-item are counted together (silence would otherwise serialize on a single bin);
+the counts go to work-group local bins (or straight to the group's row when they do not fit in local memory),
+are stored as the group's row and merged into the global histogram with atomics.
+*/
+#define CLIP_HIGH (32767.0f / 32768.0f)
+#define CLIP_LOW (-1.0f)
+
+__kernel void fused_stats_interval_kernel(
+    __global const float *audio_data,     // Input audio samples
+    __global float *interval_mins,        // Per-group min
+    __global float *interval_maxs,        // Per-group max
+    __global uint *interval_argmins,      // Per-group sample index of the min (first occurrence)
+    __global uint *interval_argmaxs,      // Per-group sample index of the max (first occurrence)
+    __global float *interval_sums,        // Per-group sum of samples
+    __global float *interval_sumsqs,      // Per-group sum of squared samples
+    __global uint *interval_clips,        // Per-group count of full-scale samples
+    __local float *local_mins,
+    __local float *local_maxs,
+    __local uint *local_argmins,
+    __local uint *local_argmaxs,
+    __local float *local_sums,
+    __local float *local_sumsqs,
+    __local uint *local_clips,
+    const unsigned int samples_per_interval, // Number of samples in each interval
+    const unsigned int n_samples,            // Total number of samples
+    __global uint *interval_hists,        // Per-group histogram rows of num_bins counts
+    __global uint *global_hist,           // Histogram of all samples (zeroed by the host)
+    __local uint *local_hist,             // num_bins work-group bins when use_local_bins is set
+    const unsigned int num_bins,          // 0 disables the histograms
+    const unsigned int hist_shift,        // 16 - log2(num_bins)
+    const unsigned int use_local_bins
+) {
+    unsigned int local_id = get_local_id(0);
+    unsigned int group_id = get_group_id(0);
+    unsigned int local_size = get_local_size(0);
+
+    unsigned int start = group_id * samples_per_interval;
+    unsigned int end = min(start + samples_per_interval, n_samples);
+
+    __global uint *hist_row = interval_hists + (size_t)group_id * num_bins;
+    __local uint *local_row = local_hist;
+    if (num_bins) {
+        for (unsigned int b = local_id; b < num_bins; b += local_size) {
+            if (use_local_bins) local_row[b] = 0; else hist_row[b] = 0;
+        }
+        barrier(CLK_LOCAL_MEM_FENCE | CLK_GLOBAL_MEM_FENCE);
+    }
+
+    float current_min = FLT_MAX;
+    float current_max = -FLT_MAX;
+    uint current_argmin = UINT_MAX;
+    uint current_argmax = UINT_MAX;
+    float sum = 0.0f;
+    float sumsq = 0.0f;
+    uint clips = 0;
+    // Consecutive samples of a work-item landing in the same bin are counted with one atomic
+    uint run_bin = 0;
+    uint run_length = 0;
+
+    // Strided traversal: indices rise per work-item, so strict compares keep the first occurrence
+    for (unsigned int i = start + local_id; i < end; i += local_size) {
+        float sample = audio_data[i];
+        if (sample < current_min) { current_min = sample; current_argmin = i; }
+        if (sample > current_max) { current_max = sample; current_argmax = i; }
+        sum += sample;
+        sumsq += sample * sample;
+        clips += (sample >= CLIP_HIGH) || (sample <= CLIP_LOW);
+        if (num_bins) {
+            int code = clamp(convert_int_sat_rtz(sample * 32768.0f), -32768, 32767);
+            uint bin = (uint)(code + 32768) >> hist_shift;
+            if (bin == run_bin) {
+                run_length++;
+            } else {
+                if (run_length) {
+                    if (use_local_bins) atomic_add(&local_row[run_bin], run_length);
+                    else atomic_add(&hist_row[run_bin], run_length);
+                }
+                run_bin = bin;
+                run_length = 1;
+            }
+        }
+    }
+
+    if (num_bins) {
+        if (run_length) {
+            if (use_local_bins) atomic_add(&local_row[run_bin], run_length);
+            else atomic_add(&hist_row[run_bin], run_length);
+        }
+        barrier(CLK_LOCAL_MEM_FENCE | CLK_GLOBAL_MEM_FENCE);
+        for (unsigned int b = local_id; b < num_bins; b += local_size) {
+            uint count = use_local_bins ? local_row[b] : hist_row[b];
+            if (use_local_bins) hist_row[b] = count;
+            if (count) atomic_add(&global_hist[b], count);
+        }
+    }
+
+    local_mins[local_id] = current_min;
+    local_maxs[local_id] = current_max;
+    local_argmins[local_id] = current_argmin;
+    local_argmaxs[local_id] = current_argmax;
+    local_sums[local_id] = sum;
+    local_sumsqs[local_id] = sumsq;
+    local_clips[local_id] = clips;
+    barrier(CLK_LOCAL_MEM_FENCE);
+
+    for (unsigned int s = local_size / 2; s > 0; s >>= 1) {
+        if (local_id < s) {
+            unsigned int other = local_id + s;
+            if (local_mins[other] < local_mins[local_id] ||
+                (local_mins[other] == local_mins[local_id] && local_argmins[other] < local_argmins[local_id])) {
+                local_mins[local_id] = local_mins[other];
+                local_argmins[local_id] = local_argmins[other];
+            }
+            if (local_maxs[other] > local_maxs[local_id] ||
+                (local_maxs[other] == local_maxs[local_id] && local_argmaxs[other] < local_argmaxs[local_id])) {
+                local_maxs[local_id] = local_maxs[other];
+                local_argmaxs[local_id] = local_argmaxs[other];
+            }
+            local_sums[local_id] += local_sums[other];
+            local_sumsqs[local_id] += local_sumsqs[other];
+            local_clips[local_id] += local_clips[other];
+        }
+        barrier(CLK_LOCAL_MEM_FENCE);
+    }
+
+    if (local_id == 0) {
+        interval_mins[group_id] = local_mins[0];
+        interval_maxs[group_id] = local_maxs[0];
+        interval_argmins[group_id] = local_argmins[0];
+        interval_argmaxs[group_id] = local_argmaxs[0];
+        interval_sums[group_id] = local_sums[0];
+        interval_sumsqs[group_id] = local_sumsqs[0];
+        interval_clips[group_id] = local_clips[0];
+    }
+}
+
+
+/*
+Kernels for the outlier filters over integer interval values in [-32768, 32768].
+filter_moments_kernel: per-work-group exact integer sum and sum of squares (sigma band).
+filter_histogram_kernel: counts values (mode 0, bin = v + 32768) or doubled absolute deviations
+from a center given as 2 * center (mode 1, bin = |2v - center2|) for histogram selection of
+medians and percentiles without sorting.
+band_mask_kernel: writes 1 for values inside the integer band [lower, upper], else 0.
+*/
+__kernel void filter_moments_kernel(
+    __global const int *values,
+    __global long *group_sums,
+    __global long *group_sumsqs,
+    __local long *local_sums,
+    __local long *local_sumsqs,
+    const unsigned int n_values
+) {
+    unsigned int local_id = get_local_id(0);
+    unsigned int local_size = get_local_size(0);
+
+    long sum = 0;
+    long sumsq = 0;
+    for (unsigned int i = get_global_id(0); i < n_values; i += get_global_size(0)) {
+        long v = values[i];
+        sum += v;
+        sumsq += v * v;
+    }
+    local_sums[local_id] = sum;
+    local_sumsqs[local_id] = sumsq;
+    barrier(CLK_LOCAL_MEM_FENCE);
+
+    for (unsigned int s = local_size / 2; s > 0; s >>= 1) {
+        if (local_id < s) {
+            local_sums[local_id] += local_sums[local_id + s];
+            local_sumsqs[local_id] += local_sumsqs[local_id + s];
+        }
+        barrier(CLK_LOCAL_MEM_FENCE);
+    }
+
+    if (local_id == 0) {
+        group_sums[get_group_id(0)] = local_sums[0];
+        group_sumsqs[get_group_id(0)] = local_sumsqs[0];
+    }
+}
+
+__kernel void filter_histogram_kernel(
+    __global const int *values,
+    __global uint *bins,
+    const int center2,
+    const unsigned int deviation_mode,
+    const unsigned int n_values
+) {
+    unsigned int i = get_global_id(0);
+    if (i < n_values) {
+        int v = values[i];
+        int bin = deviation_mode ? abs(2 * v - center2) : v + 32768;
+        atomic_inc(&bins[bin]);
+    }
+}
+
+__kernel void band_mask_kernel(
+    __global const int *values,
+    __global uchar *mask,
+    const int lower,
+    const int upper,
+    const unsigned int n_values
+) {
+    unsigned int i = get_global_id(0);
+    if (i < n_values) {
+        int v = values[i];
+        mask[i] = (v >= lower) && (v <= upper);
+    }
+}
+
+
+/*
+Kernels for the look-ahead peak limiter (peak_limiter.py). Samples are split into segments of
+seg_len = look-ahead samples. A window of seg_len samples spans at most two segments, so the
+sliding minimum of the required gain and the moving sum of that hold curve come from
+per-segment prefix and suffix scans with O(1) work per sample. The release recursion
+env = max(1 - attack, env * decay) runs sequentially per release segment from env = 0;
+the host propagates the carry between segments and limiter_apply_kernel folds it in.
+*/
+__kernel void limiter_hold_scan_kernel(
+    __global const float *x,        // Carried history followed by the block
+    __global float *prefix_min,     // Min of the required gain from the segment start to i
+    __global float *suffix_min,     // Min of the required gain from i to the segment end
+    const float threshold,
+    const unsigned int seg_len,
+    const unsigned int n
+) {
+    unsigned int start = get_global_id(0) * seg_len;
+    unsigned int end = min(start + seg_len, n);
+    float run = 1.0f;
+    for (unsigned int i = start; i < end; ++i) {
+        run = fmin(run, threshold / fmax(fabs(x[i]), threshold));
+        prefix_min[i] = run;
+    }
+    run = 1.0f;
+    for (unsigned int i = end; i > start; --i) {
+        run = fmin(run, threshold / fmax(fabs(x[i - 1]), threshold));
+        suffix_min[i - 1] = run;
+    }
+}
+
+__kernel void limiter_attack_scan_kernel(
+    __global const float *prefix_min,
+    __global const float *suffix_min,
+    __global float *prefix_sum,     // Sum of the hold curve from the segment start to i
+    __global float *suffix_sum,     // Sum of the hold curve from i to the segment end
+    const unsigned int seg_len,
+    const unsigned int n
+) {
+    unsigned int start = get_global_id(0) * seg_len;
+    unsigned int end = min(start + seg_len, n);
+    // hold[i] = min over [i, i + seg_len - 1]: the suffix of this segment and the prefix of the next
+    float run = 0.0f;
+    for (unsigned int i = start; i < end; ++i) {
+        run += fmin(suffix_min[i], prefix_min[min(i + seg_len - 1, n - 1)]);
+        prefix_sum[i] = run;
+    }
+    run = 0.0f;
+    for (unsigned int i = end; i > start; --i) {
+        run += fmin(suffix_min[i - 1], prefix_min[min(i + seg_len - 2, n - 1)]);
+        suffix_sum[i - 1] = run;
+    }
+}
+
+__kernel void limiter_release_kernel(
+    __global const float *prefix_sum,
+    __global const float *suffix_sum,
+    __global float *env_local,      // Release envelope of the segment, started from 0
+    __global float *seg_end_env,    // Envelope at the last sample of each release segment
+    const unsigned int seg_len,
+    const unsigned int release_seg_len,
+    const float decay,
+    const unsigned int n_out
+) {
+    unsigned int seg = get_global_id(0);
+    unsigned int start = seg * release_seg_len;
+    unsigned int end = min(start + release_seg_len, n_out);
+    float env = 0.0f;
+    for (unsigned int i = start; i < end; ++i) {
+        // Attack: mean of the hold curve over [i, i + seg_len - 1]
+        float sum = (i % seg_len == 0) ? suffix_sum[i] : suffix_sum[i] + prefix_sum[i + seg_len - 1];
+        env = fmax(1.0f - sum / seg_len, env * decay);
+        env_local[i] = env;
+    }
+    seg_end_env[seg] = env;
+}
+
+__kernel void limiter_apply_kernel(
+    __global const float *x,
+    __global const float *env_local,
+    __global const float *carry_in,  // Envelope entering each release segment (from the host)
+    __global float *out,
+    __global float *gains,
+    const float threshold,
+    const unsigned int seg_len,
+    const unsigned int release_seg_len,
+    const float decay,
+    const unsigned int n_out
+) {
+    unsigned int i = get_global_id(0);
+    if (i < n_out) {
+        unsigned int seg = i / release_seg_len;
+        float carried = carry_in[seg] * pown(decay, (int)(i - seg * release_seg_len + 1));
+        float gain = 1.0f - fmax(env_local[i], carried);
+        float sample = x[i + seg_len - 1];
+        gain = fmin(gain, threshold / fmax(fabs(sample), threshold));
+        out[i] = sample * gain;
+        gains[i] = gain;
+    }
+}
+
+
+/*
+Kernels for click detection (click_repair.py). click_envelope_kernel computes the erosion (min)
+and dilation (max) of the samples over a window of 2 * half_width + 1 samples, clamped at the segment
+edges; click_residual_kernel forms the opening (max of the erosion) and closing (min of the
+dilation) and writes the residual max(x - opening, closing - x), which is large only on impulses
+narrower than the window. click_guard_kernel writes, for the n samples starting at offset, the
+largest residual within guard samples outside their own window.
+*/
+__kernel void click_envelope_kernel(
+    __global const float *x,
+    __global float *erosion,
+    __global float *dilation,
+    const unsigned int half_width,
+    const unsigned int n
+) {
+    unsigned int i = get_global_id(0);
+    if (i < n) {
+        unsigned int lo = (i > half_width) ? i - half_width : 0;
+        unsigned int hi = min(i + half_width, n - 1);
+        float mn = x[lo];
+        float mx = x[lo];
+        for (unsigned int j = lo + 1; j <= hi; ++j) {
+            mn = fmin(mn, x[j]);
+            mx = fmax(mx, x[j]);
+        }
+        erosion[i] = mn;
+        dilation[i] = mx;
+    }
+}
+
+__kernel void click_residual_kernel(
+    __global const float *x,
+    __global const float *erosion,
+    __global const float *dilation,
+    __global float *residual,
+    const unsigned int half_width,
+    const unsigned int n
+) {
+    unsigned int i = get_global_id(0);
+    if (i < n) {
+        unsigned int lo = (i > half_width) ? i - half_width : 0;
+        unsigned int hi = min(i + half_width, n - 1);
+        float opening = erosion[lo];
+        float closing = dilation[lo];
+        for (unsigned int j = lo + 1; j <= hi; ++j) {
+            opening = fmax(opening, erosion[j]);
+            closing = fmin(closing, dilation[j]);
+        }
+        residual[i] = fmax(x[i] - opening, closing - x[i]);
+    }
+}
+
+__kernel void click_guard_kernel(
+    __global const float *residual,
+    __global float *guard_max,
+    const unsigned int half_width,
+    const unsigned int guard,
+    const unsigned int offset,
+    const unsigned int n
+) {
+    unsigned int i = get_global_id(0);
+    if (i < n) {
+        unsigned int p = offset + i;  // offset >= guard + 2 * half_width, so p - guard is a valid residual
+        float mx = 0.0f;
+        for (unsigned int j = p - guard; j < p - half_width; ++j) {
+            mx = fmax(mx, residual[j]);
+        }
+        for (unsigned int j = p + half_width + 1; j <= p + guard; ++j) {
+            mx = fmax(mx, residual[j]);
+        }
+        guard_max[i] = mx;
+    }
+}
@@ -0,0 +1,379 @@
+# backend_conformance.py
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+from hardware_model import TB_MEM_TRAILING_EDGES, simulate_top
+from native_processors import to_int16_samples
+from sequential_processors import sequential_interval_min_max_amplitude
+from verilog_regression import DEFAULT_BUILD_DIR, diff_results
+
+# Cross-backend conformance and performance matrix. Every available implementation of the interval
+# min/max algorithm runs the same seeded randomized corpus:
+#
+#   sequential  sequential_processors (the golden measure and the reference of every diff)
+#   opencl      OpenCLProcessor
+#   native      audio_filter_reference.c through native_processors
+#   verilog     the Interval min-max `top` under iverilog (tb_mem.v), when iverilog/vvp are installed
+#
+# Interval extremes and the index sets kept by the 1-sigma filter are diffed exactly against the
+# reference. Corpus cases are 16-bit codes (exact as float32 x / 32768) of several signal kinds plus
+# float cases with full-scale and off-grid values, with lengths on and around interval boundaries.
+# Cases run in parallel threads; calls into the OpenCL backend are serialized (one queue, shared
+# kernels). Timings are measured afterwards, one backend at a time on workload audio of increasing
+# size, so the parallel load does not distort them. The Verilog top has documented hardware
+# behaviour (see hardware_model.py): it is diffed against the bit-accurate model instead, and its
+# differences from the reference are reported separately as known deviations, not failures.
+
+BACKENDS = ("sequential", "opencl", "native", "verilog")
+REFERENCE_BACKEND = "sequential"
+CORPUS_KINDS = ("noise", "tone", "silence", "constant", "full_scale", "ties", "float", "workload")
+INTERVAL_LENGTHS = (2, 7, 64, 441, 1000)  # top requires INTERVAL_LEN >= 2
+MAX_CASE_INTERVALS = 40
+MANY_INTERVALS = 70000  # One case large enough for the OpenCL device filter (DEVICE_FILTER_MIN_VALUES)
+DEFAULT_NUM_CASES = 64
+DEFAULT_TIMING_SIZES = (441_000, 4_410_000, 26_460_000)  # 10 s, 100 s and 10 min at 44.1 kHz
+DEFAULT_TIMING_REPEATS = 3
+VERILOG_MAX_SAMPLES = 1 << 16  # Simulation runs at roughly a million samples a minute
+
+_FILTERED_RE = re.compile(r"^Filtered (Min|Max)\[(\d+)\] =\s*(-?\d+)", re.M)
+
+
+# --- corpus ---
+
+def _case_samples(rng, kind, n, spi):
+    """float32 samples of one corpus case."""
+    if kind == "float":
+        audio = rng.uniform(-1.0, 1.0, n)
+        # Exact full scale (+1.0 saturates to 32767) and values that truncate toward zero
+        for value in (1.0, -1.0, 1e-6, -1e-6, -0.5 / 32768):
+            audio[rng.integers(0, n, size=max(1, n // 50))] = value
+        return audio.astype(np.float32)
+    if kind == "noise":
+        codes = rng.integers(-32768, 32768, n)
+    elif kind == "tone":
+        t = np.arange(n)
+        codes = (rng.uniform(0.1, 1.0) * 32767 * np.sin(2 * np.pi * rng.uniform(0.001, 0.5) * t)).astype(np.int64)
+    elif kind == "silence":
+        codes = np.zeros(n, dtype=np.int64)
+    elif kind == "constant":
+        codes = np.full(n, rng.integers(-32768, 32768), dtype=np.int64)
+    elif kind == "full_scale":
+        codes = rng.choice(np.array([-32768, -32767, 0, 32766, 32767]), n)
+    elif kind == "ties":
+        codes = rng.choice(np.array([-5, 0, 5]), n)
+    else:
+        from workload_generator import generate_workload_blocks
+        blocks = generate_workload_blocks(n, sample_rate=spi, seed=int(rng.integers(1 << 31)))
+        codes = np.concatenate([b for b, _ in blocks] or [np.zeros(0, dtype=np.int16)])
+    return (np.asarray(codes, dtype=np.float32) / np.float32(32768)).astype(np.float32)
+
+
+def make_corpus(seed=0, num_cases=DEFAULT_NUM_CASES):
+    """
+    Seeded randomized corpus: list of {"name", "kind", "audio" (float32), "samples_per_interval"}.
+    Lengths are whole intervals plus no remainder, one sample, one short of another interval or a
+    random remainder, and include inputs shorter than one interval.
+    """
+    cases = []
+    for i in range(num_cases):
+        rng = np.random.default_rng([seed, i])
+        kind = CORPUS_KINDS[i % len(CORPUS_KINDS)]
+        spi = int(rng.choice(INTERVAL_LENGTHS))
+        intervals = int(rng.integers(0, MAX_CASE_INTERVALS + 1))
+        remainder = int(rng.choice([0, 1, spi - 1, int(rng.integers(0, spi))]))
+        n = max(intervals * spi + remainder, 1)
+        cases.append({"name": f"{kind}_{i:03d}", "kind": kind, "audio": _case_samples(rng, kind, n, spi),
+                      "samples_per_interval": spi})
+    rng = np.random.default_rng([seed, num_cases])
+    cases.append({"name": "many_intervals", "kind": "noise",
+                  "audio": _case_samples(rng, "noise", MANY_INTERVALS * 2 + 1, 2), "samples_per_interval": 2})
+    return cases
+
+
+# --- running the backends ---
+
+class _ThreadOutput(io.TextIOBase):
+    """sys.stdout stand-in that keeps the prints of backends running in parallel threads apart."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            buffer.write(text)
+        return len(text)
+
+    @contextmanager
+    def capture(self):
+        self._local.buffer = io.StringIO()
+        try:
+            yield self._local.buffer
+        finally:
+            self._local.buffer = None
+
+
+def hardware_expected(audio, spi):
+    """The Verilog top's result for one case per hardware_model.simulate_top, in run_backend's form."""
+    samples = to_int16_samples(audio)
+    model = simulate_top(samples, spi, samples.size // spi, TB_MEM_TRAILING_EDGES)
+    return {"intervals": model["intervals"],
+            "filtered_mins": [i for i, _ in model["filtered_mins"]],
+            "filtered_maxs": [i for i, _ in model["filtered_maxs"]]}
+
+
+def _parse_filtered(text):
+    """Filtered index lists from the 'Filtered Min[i] = v' lines every backend prints."""
+    indices = {"Min": [], "Max": []}
+    for kind, index, _ in _FILTERED_RE.findall(text):
+        indices[kind].append(int(index))
+    return indices["Min"], indices["Max"]
+
+
+class ConformanceHarness:
+    """
+    Runs the available backends on a corpus in parallel and diffs them against the reference.
+
+    Args:
+        backends: Backends to run (default: all of BACKENDS that are available).
+        jobs (int): Parallel cases (default: CPU count).
+        build_dir (str): Build directory for the Verilog testbench images.
+    """
+
+    def __init__(self, backends=None, jobs=None, build_dir=DEFAULT_BUILD_DIR):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.unavailable = {}
+        self._opencl = self._native = self._verilog = None
+        self._opencl_lock = threading.Lock()
+        requested = list(backends or BACKENDS)
+        if REFERENCE_BACKEND not in requested:
+            requested.insert(0, REFERENCE_BACKEND)
+        self.backends = []
+        for name in requested:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown backend '{name}'; expected one of {BACKENDS}.")
+            try:
+                self._setup(name, build_dir)
+                self.backends.append(name)
+            except Exception as e:
+                self.unavailable[name] = str(e) or type(e).__name__
+
+    def _setup(self, name, build_dir):
+        if name == "opencl":
+            from opencl_processors import OpenCLProcessor
+            self._opencl = OpenCLProcessor()
+        elif name == "native":
+            from native_processors import NativeProcessor
+            self._native = NativeProcessor()
+        elif name == "verilog":
+            from verilog_regression import VerilogRegression
+            regression = VerilogRegression(build_dir, jobs=1)
+            if not regression.available():
+                raise RuntimeError("iverilog/vvp not found on PATH")
+            self._verilog = regression
+
+    def skips(self, backend, audio, spi):
+        """Reason a backend cannot run a case, or None."""
+        if backend == "verilog":
+            if audio.size < spi:
+                return "no complete interval for top to store"
+            if audio.size > VERILOG_MAX_SAMPLES:
+                return f"over {VERILOG_MAX_SAMPLES} samples"
+        return None
+
+    def run_backend(self, backend, audio, spi, name="case"):
+        """
+        One backend on one input through its public interval API.
+
+        Returns:
+            Tuple (result, seconds): result holds "intervals" [(index, min, max)] and the
+            "filtered_mins" / "filtered_maxs" index lists.
+        """
+        start = time.perf_counter()
+        if backend == "verilog":
+            samples = to_int16_samples(audio)
+            record = self._verilog.run_one("interval", samples, name, spi, samples.size // spi)
+            elapsed = time.perf_counter() - start
+            actual = record["actual"]
+            return {"intervals": actual["intervals"],
+                    "filtered_mins": [i for i, _ in actual["filtered_mins"]],
+                    "filtered_maxs": [i for i, _ in actual["filtered_maxs"]]}, elapsed
+        with sys.stdout.capture() if isinstance(sys.stdout, _ThreadOutput) else _discard() as out:
+            if backend == "sequential":
+                mins, maxs = sequential_interval_min_max_amplitude(audio, spi, 1.0)[:2]
+            elif backend == "opencl":
+                with self._opencl_lock:
+                    mins, maxs = self._opencl.get_interval_min_max(audio, spi, 1.0)[:2]
+            else:
+                mins, maxs = self._native.get_interval_min_max(audio, spi, 1.0)[:2]
+        elapsed = time.perf_counter() - start
+        filtered_mins, filtered_maxs = _parse_filtered(out.getvalue())
+        return {"intervals": [(i, int(mn), int(mx)) for i, (mn, mx) in enumerate(zip(mins, maxs))],
+                "filtered_mins": filtered_mins, "filtered_maxs": filtered_maxs}, elapsed
+
+    def check(self, corpus):
+        """
+        Runs every backend on every case in parallel and diffs each against the reference; the
+        Verilog top is diffed against the hardware model, with the model's differences from the
+        reference recorded as its known deviations.
+
+        Returns:
+            list: One record per (case, backend) with passed / skipped, diffs, deviations and time.
+        """
+        tasks = [(case, backend) for case in corpus for backend in self.backends]
+        if self._verilog is not None:
+            # Compile serially first so parallel simulations never race on the same build
+            for case in corpus:
+                spi, n = case["samples_per_interval"], case["audio"].size
+                if self.skips("verilog", case["audio"], spi) is None:
+                    self._verilog.compile("interval", 1 << max(int(n - 1).bit_length(), 10), spi, n // spi)
+
+        def run(task):
+            case, backend = task
+            reason = self.skips(backend, case["audio"], case["samples_per_interval"])
+            if reason:
+                return None, 0.0, reason
+            try:
+                result, elapsed = self.run_backend(backend, case["audio"], case["samples_per_interval"], case["name"])
+                return result, elapsed, None
+            except Exception as e:
+                return {"error": f"{type(e).__name__}: {e}"}, 0.0, None
+
+        stdout = sys.stdout
+        sys.stdout = _ThreadOutput()
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                outcomes = list(pool.map(run, tasks))
+        finally:
+            sys.stdout = stdout
+
+        references = {case["name"]: result for (case, backend), (result, _, _) in zip(tasks, outcomes)
+                      if backend == REFERENCE_BACKEND}
+        records = []
+        for (case, backend), (result, elapsed, reason) in zip(tasks, outcomes):
+            record = {"case": case["name"], "kind": case["kind"], "samples": int(case["audio"].size),
+                      "samples_per_interval": case["samples_per_interval"], "backend": backend,
+                      "time": elapsed, "skipped": reason, "passed": reason is None, "diffs": [], "deviations": []}
+            if reason is None:
+                expected = references[case["name"]]
+                if backend == "verilog":
+                    expected = hardware_expected(case["audio"], case["samples_per_interval"])
+                    record["deviations"] = diff_results(references[case["name"]], expected)
+                record["diffs"] = diff_results(expected, result)
+                record["passed"] = not record["diffs"]
+            records.append(record)
+        return records
+
+    def time_matrix(self, sizes=DEFAULT_TIMING_SIZES, repeats=DEFAULT_TIMING_REPEATS, seed=0):
+        """
+        Best-of-repeats wall time of every backend per input size, measured serially on workload
+        audio at 44.1 kHz with 1 s intervals (Verilog up to VERILOG_MAX_SAMPLES).
+
+        Returns:
+            dict: {backend: {size: seconds or None}}.
+        """
+        from workload_generator import generate_workload_blocks
+
+        sample_rate = 44100
+        blocks = generate_workload_blocks(max(sizes), sample_rate, seed=seed)
+        audio = np.concatenate([b for b, _ in blocks]).astype(np.float32) / np.float32(32768)
+        timings = {backend: {} for backend in self.backends}
+        stdout = sys.stdout
+        sys.stdout = _ThreadOutput()  # Discards the backends' prints on this thread
+        try:
+            for backend in self.backends:
+                self.run_backend(backend, audio[:2 * sample_rate], sample_rate)  # Warm-up (kernel build, caches)
+                for size in sizes:
+                    if self.skips(backend, audio[:size], sample_rate):
+                        timings[backend][size] = None
+                        continue
+                    timings[backend][size] = min(self.run_backend(backend, audio[:size], sample_rate)[1]
+                                                 for _ in range(repeats))
+        finally:
+            sys.stdout = stdout
+        return timings
+
+
+@contextmanager
+def _discard():
+    """Captures prints when the harness is not redirecting stdout (direct run_backend calls)."""
+    buffer = io.StringIO()
+    stdout = sys.stdout
+    sys.stdout = buffer
+    try:
+        yield buffer
+    finally:
+        sys.stdout = stdout
+
+
+def print_report(records, timings=None, unavailable=None):
+    """Prints failures, the per-backend conformance summary and the timing matrix as one report."""
+    print(f"\n--- Conformance (reference: {REFERENCE_BACKEND}; verilog: hardware_model.py) ---")
+    for r in records:
+        if not r["passed"] and not r["skipped"]:
+            print(f"[FAIL] {r['backend']:<10s} {r['case']} ({r['samples']} samples, {r['samples_per_interval']}/interval)")
+            for d in r["diffs"][:10]:
+                print(f"    {d}")
+    deviating = [r for r in records if r.get("deviations")]
+    if deviating:
+        print(f"\n--- Known hardware deviations from {REFERENCE_BACKEND} (not failures) ---")
+        for r in deviating:
+            print(f"[KNOWN] {r['backend']:<10s} {r['case']}: {len(r['deviations'])} differences, "
+                  f"e.g. {r['deviations'][0]}")
+    backends = list(dict.fromkeys(r["backend"] for r in records))
+    print(f"\n{'Backend':<12}{'Cases':>8}{'Passed':>8}{'Failed':>8}{'Skipped':>9}{'Deviating':>11}")
+    for backend in backends:
+        rows = [r for r in records if r["backend"] == backend]
+        skipped = sum(bool(r["skipped"]) for r in rows)
+        passed = sum(r["passed"] for r in rows)
+        deviations = sum(bool(r.get("deviations")) for r in rows)
+        print(f"{backend:<12}{len(rows):>8}{passed:>8}{len(rows) - passed - skipped:>8}{skipped:>9}{deviations:>11}")
+    for backend, reason in (unavailable or {}).items():
+        print(f"{backend:<12}  unavailable: {reason}")
+
+    if timings:
+        sizes = sorted({size for row in timings.values() for size in row})
+        print("\n--- Performance (wall time, best of runs; Msamples/s) ---")
+        print(f"{'Samples':>12}" + "".join(f"{backend:>22}" for backend in timings))
+        for size in sizes:
+            cells = []
+            for backend in timings:
+                seconds = timings[backend].get(size)
+                cells.append(f"{'-':>22}" if seconds is None else f"{seconds:>10.4f} s {size / seconds / 1e6:>8.1f}")
+            print(f"{size:>12}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cross-backend conformance and performance matrix.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cases", type=int, default=DEFAULT_NUM_CASES, help="Randomized corpus cases")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel cases (default: CPU count)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_TIMING_SIZES),
+                        help="Input sizes of the timing matrix (samples)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_TIMING_REPEATS)
+    parser.add_argument("--no-timing", action="store_true", help="Skip the timing matrix")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    parser.add_argument("--build-dir", default=DEFAULT_BUILD_DIR)
+    args = parser.parse_args()
+
+    harness = ConformanceHarness(args.backends, args.jobs, args.build_dir)
+    records = harness.check(make_corpus(args.seed, args.cases))
+    timings = None if args.no_timing else harness.time_matrix(args.sizes, args.repeats, args.seed)
+    print_report(records, timings, harness.unavailable)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"seed": args.seed, "unavailable": harness.unavailable, "records": records,
+                       "timings": {b: {str(s): t for s, t in row.items()} for b, row in (timings or {}).items()}},
+                      f, indent=2)
+    raise SystemExit(0 if all(r["passed"] or r["skipped"] for r in records) else 1)
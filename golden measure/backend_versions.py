@@ -0,0 +1,12 @@
+# backend_versions.py
+
+# Result format versions of the analysis backends, kept apart from the backends themselves so the
+# result cache key can be built without importing pyopencl or loading the native library.
+# Bump a backend's version when its algorithm, kernels or output format change; cached results of
+# the old version are then recomputed.
+
+BACKEND_VERSIONS = {
+    "sequential": "1.2",  # sequential_processors
+    "opencl": "1.2",      # opencl_processors (kernels)
+    "native": "1.0",      # native_processors / audio_filter_reference.c
+}
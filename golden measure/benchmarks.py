@@ -0,0 +1,198 @@
+# benchmarks.py
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from outlier_filters import FILTER_METHODS, filter_mask
+from sample_text_io import read_text_samples, write_text_samples
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_text_io(n_samples=10_000_000, include_legacy=False):
+    """
+    Times bulk text sample I/O for 16-bit integer and float32 files of n_samples.
+    With include_legacy, also times the line-by-line readers and writers on the same data.
+
+    Returns:
+        dict: {case: seconds}
+    """
+    rng = np.random.default_rng(0)
+    ints = rng.integers(-32768, 32768, n_samples).astype(np.int16)
+    floats = rng.uniform(-1.0, 1.0, n_samples).astype(np.float32)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, data in (("int16", ints), ("float32", floats)):
+            path = os.path.join(tmp, f"{name}.txt")
+            _, results[f"write {name}"] = _timed(write_text_samples, path, data)
+            loaded, results[f"read {name}"] = _timed(read_text_samples, path, data.dtype)
+            assert np.array_equal(loaded, data), f"{name} round trip mismatch"
+            if include_legacy:
+                legacy_path = os.path.join(tmp, f"{name}_legacy.txt")
+
+                def legacy_write():
+                    with open(legacy_path, 'w') as f:
+                        for sample in data:
+                            f.write(f"{sample}\n")
+
+                def legacy_read():
+                    with open(legacy_path, 'r') as f:
+                        return np.array([float(line.strip()) for line in f], dtype=data.dtype)
+
+                _, results[f"legacy write {name}"] = _timed(legacy_write)
+                _, results[f"legacy read {name}"] = _timed(legacy_read)
+                with open(path, 'rb') as a, open(legacy_path, 'rb') as b:
+                    assert a.read() == b.read(), f"{name} output differs from the line-by-line writer"
+    return results
+
+
+def bench_outlier_filters(n_values=1_000_000, opencl_processor=None):
+    """
+    Times every outlier filter method on n_values integer interval values on the host and,
+    if an OpenCLProcessor is given, on the device.
+
+    Returns:
+        dict: {case: seconds}
+    """
+    rng = np.random.default_rng(0)
+    values = np.clip(rng.normal(-20000, 3000, n_values), -32768, 32768).astype(np.int32)
+    results = {}
+    for method in FILTER_METHODS:
+        _, results[f"host {method}"] = _timed(filter_mask, values, method)
+        if opencl_processor is not None:
+            opencl_processor.filter_mask(values, method)  # Warm-up: first launch compiles/uploads
+            _, results[f"opencl {method}"] = _timed(opencl_processor.filter_mask, values, method)
+    return results
+
+
+def bench_peak_limiter(duration_s=600, sample_rate=44100, opencl_processor=None):
+    """
+    Times the streaming peak limiter on duration_s of synthetic audio with clicks and clipping,
+    on the host and, if an OpenCLProcessor is given, on the device.
+
+    Returns:
+        dict: {case: seconds}; real time is duration_s.
+    """
+    from peak_limiter import limit_array
+    from workload_generator import generate_workload_blocks
+
+    blocks = generate_workload_blocks(int(duration_s * sample_rate), sample_rate, seed=0, click_probability=0.2)
+    audio = np.concatenate([b for b, _ in blocks]).astype(np.float32) / np.float32(32768)
+    results = {}
+    _, results["host limiter"] = _timed(limit_array, audio, sample_rate)
+    if opencl_processor is not None:
+        limit_array(audio[:sample_rate], sample_rate, opencl_processor)  # Warm-up
+        _, results["opencl limiter"] = _timed(limit_array, audio, sample_rate, opencl_processor)
+    return results
+
+
+def bench_click_repair(duration_s=600, sample_rate=44100, opencl_processor=None):
+    """
+    Times click detection and repair on duration_s of synthetic audio with clicks, on the host
+    and, if an OpenCLProcessor is given, with the residuals on the device.
+
+    Returns:
+        dict: {case: seconds}; real time is duration_s.
+    """
+    from click_repair import repair_array
+    from workload_generator import generate_workload_blocks
+
+    blocks = generate_workload_blocks(int(duration_s * sample_rate), sample_rate, seed=0, click_probability=0.2)
+    audio = np.concatenate([b for b, _ in blocks]).astype(np.float32) / np.float32(32768)
+    results = {}
+    _, results["host click repair"] = _timed(repair_array, audio, sample_rate)
+    if opencl_processor is not None:
+        repair_array(audio[:sample_rate], sample_rate, opencl_processor)  # Warm-up
+        _, results["opencl click repair"] = _timed(repair_array, audio, sample_rate, opencl_processor)
+    return results
+
+
+def bench_amplitude_histograms(duration_s=600, sample_rate=44100, num_bins=1024, opencl_processor=None):
+    """
+    Times per-interval amplitude histograms of duration_s of synthetic audio: np.histogram per
+    1 s slice, the vectorized host pass and, if an OpenCLProcessor is given, the device pass.
+    The fused passes also compute the interval min/max statistics.
+
+    Returns:
+        dict: {case: seconds}.
+    """
+    from amplitude_histogram import compute_amplitude_histograms, sample_bins
+    from workload_generator import generate_workload_blocks
+
+    blocks = generate_workload_blocks(int(duration_s * sample_rate), sample_rate, seed=0)
+    audio = np.concatenate([b for b, _ in blocks]).astype(np.float32) / np.float32(32768)
+
+    def per_slice():
+        bins = sample_bins(audio, num_bins)
+        return [np.histogram(bins[i:i + sample_rate], bins=num_bins, range=(0, num_bins))[0]
+                for i in range(0, bins.size - sample_rate + 1, sample_rate)]
+
+    results = {}
+    _, results["np.histogram per interval"] = _timed(per_slice)
+    _, results["fused host histograms"] = _timed(compute_amplitude_histograms, audio, sample_rate, 1.0, num_bins)
+    if opencl_processor is not None:
+        compute_amplitude_histograms(audio[:sample_rate], sample_rate, 1.0, num_bins, opencl_processor)  # Warm-up
+        _, results["fused opencl histograms"] = _timed(compute_amplitude_histograms, audio, sample_rate, 1.0,
+                                                       num_bins, opencl_processor)
+    return results
+
+
+def bench_startup(duration_s=5, sample_rate=22050, repeats=3):
+    """
+    Times fresh interpreters (best of repeats): importing main_runner, importing each backend module,
+    a complete sequential main_runner run on a small generated WAV file (time to first result) and
+    a main_runner run answered from the result cache.
+
+    Returns:
+        dict: {case: seconds}
+    """
+    from workload_generator import generate_workload
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (here, os.environ.get("PYTHONPATH")))))
+
+    def best_of(args):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *args], env=env, cwd=here, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    results = {"python startup": best_of(["-c", "pass"])}
+    for module in ("main_runner", "sequential_processors", "opencl_processors", "native_processors", "audio_generator"):
+        results[f"import {module}"] = best_of(["-c", f"import {module}"])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "small.wav")
+        generate_workload(path, duration_seconds=duration_s, sample_rate=sample_rate, seed=0)
+        results["sequential run (first result)"] = best_of(["main_runner.py", path, "--backends", "sequential",
+                                                            "--no-cache"])
+        # A cache hit for the default backends must not import them either
+        cache_dir = os.path.join(tmp, "cache")
+        subprocess.run([sys.executable, "main_runner.py", path, "--cache-dir", cache_dir], env=env, cwd=here,
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        results["cached run (all backends)"] = best_of(["main_runner.py", path, "--cache-dir", cache_dir])
+    return results
+
+
+def print_results(title, results):
+    print(f"\n--- {title} ---")
+    for case, seconds in results.items():
+        print(f"{case:<32s} {seconds:10.4f} s")
+
+
+if __name__ == "__main__":
+    print_results("Text sample I/O (10M samples)", bench_text_io())
+    print_results("Outlier filters (1M intervals)", bench_outlier_filters())
+    print_results("Peak limiter (600 s of audio)", bench_peak_limiter())
+    print_results("Click repair (600 s of audio)", bench_click_repair())
+    print_results("Amplitude histograms (600 s of audio, 1024 bins)", bench_amplitude_histograms())
+    print_results("Startup (fresh interpreter, 5 s WAV)", bench_startup())
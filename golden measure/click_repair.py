@@ -0,0 +1,364 @@
+# click_repair.py
+import json
+import os
+import time
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+from native_processors import to_int16_samples
+from wav_decoder import DEFAULT_BLOCK_FRAMES, read_wav_blocks
+from workload_generator import wav_header
+
+# Impulsive click detection and repair with min/max morphology. With a flat window of W samples,
+#
+#   opening = dilate(erode(x))   removes positive peaks narrower than W
+#   closing = erode(dilate(x))   removes negative peaks narrower than W
+#   residual = max(x - opening, closing - x)
+#
+# is large only on short peaks. A sample is flagged when its residual exceeds both
+#
+#   - k times the RMS residual of its interval (and at least min_level), so noise, tones and
+#     silence each get a threshold that matches their own texture, and
+#   - ratio times the largest residual in the surrounding guard region (excluding its own window),
+#     so the recurring peaks of high-frequency tones are not mistaken for clicks.
+#
+# Flagged runs of up to W - 1 samples are replaced by a linear interpolation between their
+# unflagged neighbours; longer runs are not impulsive and are kept.
+#
+# Streaming: the residual needs W - 1 samples of context and the guard test another guard samples
+# on each side, and a threshold needs its whole interval, so output trails the input by about one
+# interval. Results do not depend on the block size.
+
+DEFAULT_K = 5.0
+DEFAULT_RATIO = 2.0
+DEFAULT_WINDOW_S = 0.0001  # Widest click removed (~4 samples at 44.1 kHz)
+DEFAULT_GUARD_S = 0.001    # Neighbourhood of the guard test; covers a period of tones above 1 kHz
+DEFAULT_MIN_LEVEL = 0.02   # Residual floor, so dither in silence is never flagged
+
+
+class ClickRepairer:
+    """
+    Streaming click detector and repairer over float32 blocks.
+
+    Args:
+        sample_rate (int): Samples per second.
+        interval_length_seconds (float): Interval of the residual statistics.
+        k (float): Threshold in interval RMS residuals.
+        ratio (float): Threshold relative to the largest residual in the guard region.
+        window_seconds (float): Morphology window; clicks must be narrower than this.
+        guard_seconds (float): Half width of the guard region.
+        min_level (float): Smallest residual that can be flagged.
+    """
+
+    def __init__(self, sample_rate, interval_length_seconds=1.0, k=DEFAULT_K, ratio=DEFAULT_RATIO,
+                 window_seconds=DEFAULT_WINDOW_S, guard_seconds=DEFAULT_GUARD_S, min_level=DEFAULT_MIN_LEVEL):
+        self.samples_per_interval = int(sample_rate * interval_length_seconds)
+        if self.samples_per_interval == 0:
+            raise ValueError("Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+        self.sample_rate = sample_rate
+        self.k = k
+        self.ratio = ratio
+        self.min_level = min_level
+        self.half = max(1, int(round(window_seconds * sample_rate)) // 2)
+        self.window = 2 * self.half + 1
+        self.reach = 2 * self.half  # Context of a residual on each side
+        self.guard = max(self.half + 1, int(round(guard_seconds * sample_rate)))
+        self.context = self.reach + self.guard  # Context of a detection on each side
+        self.max_click = self.window - 1
+        self.reset()
+
+    def reset(self):
+        self._x = np.empty(0, dtype=np.float32)  # Input from global index _x_start on
+        self._x_start = 0
+        self._received = 0
+        self._r = np.empty(0, dtype=np.float32)  # Residuals of [_flagged, _r_done)
+        self._g = np.empty(0, dtype=np.float32)  # Largest residual of their guard regions
+        self._r_done = 0
+        self._flags = np.empty(0, dtype=bool)    # Flags of [_emitted, _flagged)
+        self._flagged = 0
+        self._emitted = 0
+        self._last_value = None  # Last emitted sample (unflagged), the left neighbour of the next run
+        self.regions_repaired = 0
+        self.samples_repaired = 0
+        self.long_runs_kept = 0
+
+    # --- detection ---
+
+    def _residual(self, segment, n_center):
+        """
+        Residuals of segment[context:context + n_center] and the largest residual of each one's
+        guard region, [-guard, -half) and (half, guard] around it.
+        """
+        w, guard, half = self.window, self.guard, self.half
+        opening = maximum_filter1d(minimum_filter1d(segment, w, mode='nearest'), w, mode='nearest')
+        closing = minimum_filter1d(maximum_filter1d(segment, w, mode='nearest'), w, mode='nearest')
+        valid = slice(self.reach, self.reach + n_center + 2 * guard)
+        residual = np.subtract(segment[valid], opening[valid])
+        np.maximum(residual, closing[valid] - segment[valid], out=residual)
+        # Sliding maximum over guard - half residuals, centred at c: covers [c - side // 2, ...]
+        side = guard - half
+        sliding = maximum_filter1d(residual, side, mode='nearest')
+        left = sliding[side // 2:side // 2 + n_center]
+        right_start = guard + half + 1 + side // 2
+        guard_max = np.maximum(left, sliding[right_start:right_start + n_center])
+        return residual[guard:guard + n_center], guard_max
+
+    def _advance_residuals(self, final):
+        r_end = self._received if final else self._received - self.context
+        if r_end <= self._r_done:
+            return
+        lo, hi = self._r_done - self.context, r_end + self.context
+        segment = self._x[max(lo, 0) - self._x_start:min(hi, self._received) - self._x_start]
+        # Edges of the recording are extended with their first/last sample, as mode='nearest'
+        if lo < 0 or hi > self._received:
+            segment = np.pad(segment, (max(0, -lo), max(0, hi - self._received)), mode='edge')
+        residual, guard_max = self._residual(segment, r_end - self._r_done)
+        self._r = np.concatenate((self._r, residual))
+        self._g = np.concatenate((self._g, guard_max))
+        self._r_done = r_end
+
+    def _advance_flags(self, final):
+        spi = self.samples_per_interval
+        # Intervals are aligned to sample 0; flag every interval whose residuals are complete
+        stop = (self._r_done // spi) * spi
+        if final:
+            stop = self._r_done
+        if stop <= self._flagged:
+            return
+        n = stop - self._flagged
+        r = self._r[:n]
+        first_interval = self._flagged // spi
+        bounds = np.arange(first_interval, first_interval + n // spi + 2) * spi - self._flagged
+        bounds = np.unique(np.clip(bounds, 0, n))
+        sumsq = np.add.reduceat(np.square(r, dtype=np.float64), bounds[:-1])
+        thresholds = np.maximum(self.k * np.sqrt(sumsq / np.diff(bounds)), self.min_level)
+        flags = r > np.repeat(thresholds, np.diff(bounds)).astype(np.float32)
+        flags &= r > self.ratio * self._g[:n]
+        self._flags = np.concatenate((self._flags, flags))
+        self._r = self._r[n:]
+        self._g = self._g[n:]
+        self._flagged = stop
+
+    # --- repair ---
+
+    def _emit(self, final):
+        flags = self._flags
+        if final:
+            n = flags.size
+        else:
+            unflagged = np.flatnonzero(~flags)
+            if unflagged.size == 0:
+                return np.empty(0, dtype=np.float32), []
+            n = int(unflagged[-1]) + 1  # Every run before the last unflagged sample is closed
+        out = self._x[self._emitted - self._x_start:self._emitted - self._x_start + n].copy()
+        f = flags[:n]
+        # Runs of flagged samples: [starts, stops) relative to the emitted segment
+        edges = np.diff(np.concatenate(([0], f.view(np.int8), [0])))
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        lengths = stops - starts
+        keep = lengths <= self.max_click
+        self.long_runs_kept += int(np.count_nonzero(~keep))
+        starts, stops, lengths = starts[keep], stops[keep], lengths[keep]
+
+        if starts.size:
+            # Neighbours: the sample before the run (or the last emitted one) and the one after it
+            left = np.where(starts > 0, out[np.maximum(starts - 1, 0)],
+                            self._last_value if self._last_value is not None else np.nan)
+            right = np.where(stops < n, out[np.minimum(stops, n - 1)], np.nan)
+            left = np.where(np.isnan(left), right, left)
+            right = np.where(np.isnan(right), left, right)
+            left = np.nan_to_num(left)
+            right = np.nan_to_num(right)
+            # Linear ramp over each run: position t + 1 of lengths + 1 steps
+            run_index = np.repeat(np.arange(starts.size), lengths)
+            positions = np.arange(run_index.size) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+            frac = positions / (lengths[run_index] + 1.0)
+            idx = np.repeat(starts, lengths) + positions - 1
+            out[idx] = (left[run_index] + (right[run_index] - left[run_index]) * frac).astype(np.float32)
+
+        regions = [(self._emitted + int(a), self._emitted + int(b)) for a, b in zip(starts, stops)]
+        self.regions_repaired += len(regions)
+        self.samples_repaired += int(lengths.sum())
+        if n:
+            self._last_value = float(out[-1])
+        self._flags = self._flags[n:]
+        self._emitted += n
+        return out, regions
+
+    def _trim(self):
+        keep_from = max(0, min(self._emitted, self._r_done - self.context))
+        if keep_from > self._x_start:
+            self._x = self._x[keep_from - self._x_start:]
+            self._x_start = keep_from
+
+    def process(self, block, final=False):
+        """
+        Consumes a block; returns (cleaned samples, regions) for the samples that are now final.
+        Regions are (start, stop) global sample indices of the repaired runs.
+        """
+        block = np.asarray(block, dtype=np.float32)
+        if block.size:
+            self._x = np.concatenate((self._x, block))
+            self._received += block.size
+        self._advance_residuals(final)
+        self._advance_flags(final)
+        out, regions = self._emit(final)
+        self._trim()
+        return out, regions
+
+    def flush(self):
+        """Returns the remaining samples, treating the recording as ending at the last sample."""
+        return self.process(np.empty(0, dtype=np.float32), final=True)
+
+    def stats(self):
+        return {
+            "samples": self._emitted,
+            "regions_repaired": self.regions_repaired,
+            "samples_repaired": self.samples_repaired,
+            "long_runs_kept": self.long_runs_kept,
+        }
+
+
+class OpenCLClickRepairer(ClickRepairer):
+    """
+    ClickRepairer with the residuals and guard maxima computed on an OpenCL device
+    (click_envelope_kernel, click_residual_kernel, click_guard_kernel). Thresholds and repair stay
+    on the host; they touch only the interval sums and the few flagged samples.
+
+    Args:
+        processor (OpenCLProcessor): Provides the context, queue and compiled program.
+    """
+
+    def __init__(self, processor, sample_rate, **kwargs):
+        self.processor = processor
+        self.kernel_time = 0.0
+        self._capacity = 0
+        super().__init__(sample_rate, **kwargs)
+
+    def _ensure_capacity(self, n):
+        if n <= self._capacity:
+            return
+        import pyopencl as cl
+        mf = cl.mem_flags
+        self._capacity = max(n, 2 * self._capacity)
+        self._dev = {name: cl.Buffer(self.processor.ctx, mf.READ_WRITE, self._capacity * 4)
+                     for name in ("x", "erosion", "dilation", "residual", "guard_max")}
+
+    def _residual(self, segment, n_center):
+        import pyopencl as cl
+        queue, kernel = self.processor.queue, self.processor._kernel
+        segment = np.ascontiguousarray(segment, dtype=np.float32)
+        n = segment.size
+        self._ensure_capacity(n)
+        d = self._dev
+        half = np.uint32(self.half)
+        cl.enqueue_copy(queue, d["x"], segment)
+        events = [
+            kernel("click_envelope_kernel")(queue, (n,), None, d["x"], d["erosion"], d["dilation"], half, np.uint32(n)),
+        ]
+        events.append(kernel("click_residual_kernel")(queue, (n,), None, d["x"], d["erosion"], d["dilation"],
+                                                      d["residual"], half, np.uint32(n)))
+        events.append(kernel("click_guard_kernel")(queue, (n_center,), None, d["residual"], d["guard_max"], half,
+                                                   np.uint32(self.guard), np.uint32(self.context), np.uint32(n_center)))
+        residual = np.empty(n_center, dtype=np.float32)
+        guard_max = np.empty(n_center, dtype=np.float32)
+        cl.enqueue_copy(queue, residual, d["residual"], src_offset=self.context * 4)
+        cl.enqueue_copy(queue, guard_max, d["guard_max"])
+        queue.finish()
+        self.kernel_time += sum((e.profile.end - e.profile.start) * 1e-9 for e in events)
+        return residual, guard_max
+
+
+def _make_repairer(sample_rate, processor, **kwargs):
+    if processor is not None:
+        return OpenCLClickRepairer(processor, sample_rate, **kwargs)
+    return ClickRepairer(sample_rate, **kwargs)
+
+
+def repair_array(audio_data, sample_rate, processor=None, block_size=DEFAULT_BLOCK_FRAMES, **repairer_kwargs):
+    """
+    Detects and repairs clicks in a whole array block by block.
+
+    Returns:
+        Tuple (cleaned, regions, stats): cleaned float32 samples (same length), list of repaired
+        (start, stop) sample ranges and ClickRepairer.stats().
+    """
+    audio_data = np.asarray(audio_data, dtype=np.float32)
+    repairer = _make_repairer(sample_rate, processor, **repairer_kwargs)
+    cleaned = np.empty(audio_data.size, dtype=np.float32)
+    regions = []
+    pos = 0
+    for start in range(0, audio_data.size + 1, block_size):
+        final = start + block_size > audio_data.size
+        out, found = repairer.process(audio_data[start:start + block_size], final=final)
+        cleaned[pos:pos + out.size] = out
+        pos += out.size
+        regions.extend(found)
+    return cleaned, regions, repairer.stats()
+
+
+def repair_file(input_path, output_path, regions_path=None, processor=None, block_frames=DEFAULT_BLOCK_FRAMES,
+                **repairer_kwargs):
+    """
+    Streams a WAV file through the click repairer, writes the cleaned audio as 16-bit WAV or raw
+    int16 (.raw/.pcm/.bin) and the repaired regions as JSON.
+
+    Args:
+        regions_path (str, optional): Defaults to output_path + ".regions.json".
+        processor (OpenCLProcessor, optional): Compute the residuals on the OpenCL device.
+        **repairer_kwargs: interval_length_seconds, k, window_seconds, min_level.
+
+    Returns:
+        dict: ClickRepairer.stats() plus processing time and the real-time factor.
+    """
+    start_time = time.time()
+    header, blocks = read_wav_blocks(input_path, block_frames)
+    sample_rate = header["sample_rate"]
+    repairer = _make_repairer(sample_rate, processor, **repairer_kwargs)
+    regions = []
+    raw_output = os.path.splitext(output_path)[1].lower() in (".raw", ".pcm", ".bin")
+    with open(output_path, "wb") as f:
+        if not raw_output:
+            f.write(wav_header(header["num_frames"], sample_rate))
+        for block in blocks:
+            out, found = repairer.process(block)
+            f.write(to_int16_samples(out).astype("<i2", copy=False).tobytes())
+            regions.extend(found)
+        out, found = repairer.flush()
+        f.write(to_int16_samples(out).astype("<i2", copy=False).tobytes())
+        regions.extend(found)
+
+    regions_path = regions_path or output_path + ".regions.json"
+    with open(regions_path, "w") as f:
+        json.dump({"file": os.path.basename(output_path), "sample_rate": sample_rate,
+                   "regions": [list(region) for region in regions]}, f)
+
+    stats = repairer.stats()
+    stats["time"] = time.time() - start_time
+    stats["realtime_factor"] = header["num_frames"] / sample_rate / max(stats["time"], 1e-9)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Impulsive click detection and repair for WAV files.")
+    parser.add_argument("input", help="Input WAV file")
+    parser.add_argument("output", help="Output file (.wav or raw int16 .raw/.pcm/.bin)")
+    parser.add_argument("--regions", default=None, help="Regions index (default: <output>.regions.json)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Interval length in seconds")
+    parser.add_argument("--k", type=float, default=DEFAULT_K, help="Threshold in interval RMS residuals")
+    parser.add_argument("--ratio", type=float, default=DEFAULT_RATIO, help="Threshold relative to the surrounding residuals")
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_S * 1e3, help="Widest click in milliseconds")
+    parser.add_argument("--opencl", action="store_true", help="Compute the residuals on the OpenCL device")
+    args = parser.parse_args()
+
+    processor = None
+    if args.opencl:
+        from opencl_processors import OpenCLProcessor
+        processor = OpenCLProcessor()
+    stats = repair_file(args.input, args.output, args.regions, processor, interval_length_seconds=args.interval,
+                        k=args.k, ratio=args.ratio, window_seconds=args.window_ms / 1e3)
+    print(f"Processed {stats['samples']} samples in {stats['time']:.3f} seconds ({stats['realtime_factor']:.0f}x real time)")
+    print(f"Repaired {stats['regions_repaired']} regions ({stats['samples_repaired']} samples); "
+          f"{stats['long_runs_kept']} longer runs kept")
@@ -0,0 +1,185 @@
+# hardware_model.py
+import numpy as np
+
+# Bit-accurate NumPy model of the Verilog designs as driven by their testbenches.
+#
+# Cycle behaviour reproduced from min_max.v / top.v (Interval min-max) and tb.v / tb_mem.v:
+#   * The testbench drives sample i and sample_valid=1 with blocking assignments right after a
+#     posedge and deasserts sample_valid in the same time step as the last sample, so the
+#     last sample of the input is never seen with valid=1. The DUT therefore processes
+#     samples 0 .. N-2 on consecutive edges, whichever of the racing processes runs first.
+#   * interval_done is (sample_count == INTERVAL_LEN-1); on that edge min/max include the
+#     sample and ready goes high. On the next edge ready is seen by top, which stores and
+#     displays the interval, while min_max's `else if (ready)` reset overrides the update
+#     for that edge's sample: the first sample of every interval after the first is dropped.
+#   * After the stream ends the clock keeps running with sample_valid=0. If sample_count was
+#     left at INTERVAL_LEN-1, interval_done stays high, ready stays high and top stores the same
+#     partial interval on every edge until NUM_INTERVALS intervals are stored.
+#   * Once NUM_INTERVALS intervals are stored, the next edge computes mean/std in double
+#     precision (sequential sums, population std), prints the filtered results and $finish-es.
+#
+# min_max_amplitude.v with tb_min_max_amplitude(_mem).v sees every sample (valid is dropped one
+# edge after the last sample), so its result is the plain global min/max.
+
+RESET_MIN = 32767    # 16'sh7FFF
+RESET_MAX = -32768   # -16'sh8000
+TB_MEM_TRAILING_EDGES = 4  # Edges tb_mem.v lets the design run after the last sample is driven
+
+
+def _processed_samples(samples):
+    """Samples the interval design actually sees with valid=1 (all but the last)."""
+    samples = np.asarray(samples, dtype=np.int16)
+    return samples[:max(samples.size - 1, 0)]
+
+
+def _segment_min_max(data, start, stop):
+    if stop <= start:
+        return RESET_MIN, RESET_MAX
+    seg = data[start:stop]
+    return int(seg.min()), int(seg.max())
+
+
+def _interval_events(data, length, num_intervals, trailing_edges):
+    """
+    Returns the (min, max) values top stores, in order, for the processed samples in data.
+    trailing_edges is the number of clock edges after the last processed one (None = unbounded).
+    """
+    m = data.size
+    last_edge = None if trailing_edges is None else m + trailing_edges - 1  # Edge indices: sample j at edge j
+
+    # Complete intervals: interval 0 is samples [0, L); interval k>0 is [kL+1, (k+1)L)
+    k_done = m // length
+    events = []
+    if k_done:
+        blocks = data[:k_done * length].reshape(k_done, length)
+        mins = np.empty(k_done, dtype=np.int64)
+        maxs = np.empty(k_done, dtype=np.int64)
+        mins[0], maxs[0] = blocks[0].min(), blocks[0].max()
+        if k_done > 1:
+            mins[1:] = blocks[1:, 1:].min(axis=1)
+            maxs[1:] = blocks[1:, 1:].max(axis=1)
+        display_edges = (np.arange(k_done) + 1) * length
+        if last_edge is not None:
+            keep = display_edges <= last_edge
+            mins, maxs = mins[keep], maxs[keep]
+        events = list(zip(mins.tolist(), maxs.tolist()))
+
+    if m % length == length - 1 and len(events) == k_done:
+        # Stream stopped with sample_count at INTERVAL_LEN-1: the partial interval is stored on
+        # every edge from m+1 on (ready is set at edge m)
+        start = k_done * length + (1 if k_done else 0)
+        partial = _segment_min_max(data, start, m)
+        repeats = num_intervals - len(events) if last_edge is None else max(last_edge - m, 0)
+        events.extend([partial] * max(min(repeats, num_intervals - len(events)), 0))
+    return events[:num_intervals]
+
+
+def _filter_band(values):
+    """top.v filtering: sequential double sums, mean +/- population std, inclusive bounds."""
+    vals = np.asarray(values, dtype=np.float64)
+    n = vals.size
+    mean = np.cumsum(vals)[-1] / n
+    std = np.sqrt(np.cumsum((vals - mean) * (vals - mean))[-1] / n)
+    return (vals >= mean - std) & (vals <= mean + std)
+
+
+def simulate_top(samples, interval_len=44100, num_intervals=10, trailing_edges=None):
+    """
+    Models top.v/min_max.v driven by tb.v (trailing_edges=None, clock runs until $finish)
+    or tb_mem.v (trailing_edges=TB_MEM_TRAILING_EDGES).
+
+    Args:
+        samples: 16-bit signed samples as written to the testbench input file.
+        interval_len (int): INTERVAL_LEN parameter of top.
+        num_intervals (int): NUM_INTERVALS parameter of top.
+        trailing_edges (int, optional): Clock edges after the last processed sample.
+
+    Raises:
+        ValueError: If interval_len is below 2.
+
+    Returns:
+        dict: intervals [(index, min, max)], filtered_mins / filtered_maxs [(index, value)],
+              finished (bool, whether top reached $finish) and lines (the $display output).
+    """
+    if interval_len < 2:
+        # With INTERVAL_LEN=1 interval_done is stuck high, which also overrides the reset of ready
+        raise ValueError("The hardware model requires interval_len >= 2.")
+    data = _processed_samples(samples)
+    events = _interval_events(data, interval_len, num_intervals, trailing_edges)
+    intervals = [(i, mn, mx) for i, (mn, mx) in enumerate(events)]
+    lines = [f"Interval {i}: Min = {mn}, Max = {mx}" for i, mn, mx in intervals]
+
+    finished = len(events) == num_intervals
+    if finished and trailing_edges is not None:
+        # The statistics run one edge after the last interval is stored
+        store_edges = _store_edges(data.size, interval_len, num_intervals)
+        finished = store_edges is not None and store_edges + 1 <= data.size + trailing_edges - 1
+
+    filtered_mins, filtered_maxs = [], []
+    if finished:
+        mins = np.array([e[0] for e in events])
+        maxs = np.array([e[1] for e in events])
+        keep_min = _filter_band(mins)
+        keep_max = _filter_band(maxs)
+        lines += ["", "--- Filtered Results ---"]
+        for i in range(num_intervals):
+            if keep_min[i]:
+                filtered_mins.append((i, int(mins[i])))
+                lines.append(f"Filtered Min[{i}] = {mins[i]}")
+            if keep_max[i]:
+                filtered_maxs.append((i, int(maxs[i])))
+                lines.append(f"Filtered Max[{i}] = {maxs[i]}")
+    elif trailing_edges is not None:
+        lines.append("--- End of samples ---")
+    return {"intervals": intervals, "filtered_mins": filtered_mins, "filtered_maxs": filtered_maxs,
+            "finished": finished, "lines": lines}
+
+
+def _store_edges(m, length, num_intervals):
+    """Edge at which the num_intervals-th interval is stored with unbounded trailing edges."""
+    k_done = m // length
+    if k_done >= num_intervals:
+        return num_intervals * length
+    if m % length == length - 1:
+        return m + (num_intervals - k_done)
+    return None
+
+
+def simulate_min_max_amplitude(samples):
+    """
+    Models min_max_amplitude.v driven by tb_min_max_amplitude(_mem).v.
+
+    Returns:
+        dict: min, max, samples and lines (the $display output of tb_min_max_amplitude_mem.v).
+    """
+    data = np.asarray(samples, dtype=np.int16)
+    mn, mx = _segment_min_max(data, 0, data.size)
+    return {"min": mn, "max": mx, "samples": int(data.size),
+            "lines": ["== Results ==", f"Samples processed: {data.size}",
+                      f"Minimum Amplitude = {mn:6d}", f"Maximum Amplitude = {mx:6d}"]}
+
+
+if __name__ == "__main__":
+    import argparse
+    from verilog_regression import load_int16_samples, golden_interval_results, diff_results
+
+    parser = argparse.ArgumentParser(description="Check recordings against the bit-accurate hardware model.")
+    parser.add_argument("inputs", nargs="+", help="WAV, text, .npy or raw int16 inputs")
+    parser.add_argument("--interval-len", type=int, default=44100)
+    parser.add_argument("--num-intervals", type=int, default=10)
+    parser.add_argument("--print", dest="print_lines", action="store_true", help="Print the modeled $display output")
+    args = parser.parse_args()
+
+    mismatches = 0
+    for path in args.inputs:
+        samples = load_int16_samples(path)
+        hw = simulate_top(samples, args.interval_len, args.num_intervals)
+        if args.print_lines:
+            print("\n".join(hw["lines"]))
+        diffs = diff_results(golden_interval_results(samples, args.interval_len, args.num_intervals),
+                             {k: hw[k] for k in ("intervals", "filtered_mins", "filtered_maxs")})
+        mismatches += bool(diffs)
+        print(f"[{'MATCH' if not diffs else 'DIFF'}] {path}")
+        for d in diffs[:20]:
+            print(f"    {d}")
+    print(f"\n{len(args.inputs) - mismatches}/{len(args.inputs)} inputs: hardware model matches the golden measure.")
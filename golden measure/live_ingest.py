@@ -0,0 +1,359 @@
+# live_ingest.py
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+
+# Live PCM is raw 16-bit signed little-endian mono, the same format the testbenches consume.
+PCM_DTYPE = np.dtype('<i2')
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_INTERVAL_LENGTH_S = 1.0
+DEFAULT_READ_SIZE = 4096  # bytes per read from the source; bounds the detection latency
+DEFAULT_HISTORY_INTERVALS = 3600  # Completed intervals kept for inspection (an hour of 1 s intervals)
+
+
+class SampleRingBuffer:
+    """
+    Fixed-capacity ring buffer of int16 samples.
+    The storage is allocated once; writes wrap around and overwrite the oldest samples.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self.data = np.zeros(self.capacity, dtype=np.int16)
+        self.total_written = 0  # Absolute index of the next sample to be written
+
+    def write(self, samples):
+        """Appends samples, wrapping around the end of the buffer."""
+        n = samples.size
+        if n > self.capacity:
+            # Only the newest `capacity` samples can be kept
+            self.total_written += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        pos = self.total_written % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = samples[:first]
+        if first < n:
+            self.data[:n - first] = samples[first:]
+        self.total_written += n
+
+    def segments(self, start, stop):
+        """
+        Returns the samples with absolute indices [start, stop) as at most two views,
+        so callers can reduce them without copying.
+        """
+        if stop - start > self.capacity or start < self.total_written - self.capacity:
+            raise ValueError("Requested samples have already been overwritten.")
+        pos = start % self.capacity
+        n = stop - start
+        first = min(n, self.capacity - pos)
+        if first == n:
+            return (self.data[pos:pos + n],)
+        return (self.data[pos:], self.data[:n - first])
+
+
+class LatencyRecorder:
+    """Keeps the most recent latency samples in a preallocated array for percentile queries."""
+
+    def __init__(self, capacity=100000):
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.count = 0
+
+    def record(self, seconds):
+        self.values[self.count % self.values.size] = seconds
+        self.count += 1
+
+    def percentiles(self, qs=(50, 90, 99, 100)):
+        """Returns {q: latency_seconds} over the recorded window, or {} if nothing was recorded."""
+        n = min(self.count, self.values.size)
+        if n == 0:
+            return {}
+        return dict(zip(qs, np.percentile(self.values[:n], qs)))
+
+
+class IntervalHistory:
+    """Keeps the min/max of the most recent completed intervals in preallocated int16 arrays."""
+
+    def __init__(self, capacity=DEFAULT_HISTORY_INTERVALS):
+        self.mins = np.zeros(capacity, dtype=np.int16)
+        self.maxs = np.zeros(capacity, dtype=np.int16)
+        self.count = 0
+
+    def record(self, interval_min, interval_max):
+        if self.mins.size:
+            self.mins[self.count % self.mins.size] = interval_min
+            self.maxs[self.count % self.maxs.size] = interval_max
+        self.count += 1
+
+    def recent(self):
+        """(first_index, mins, maxs) of the retained intervals, oldest first."""
+        n = min(self.count, self.mins.size)
+        order = (np.arange(self.count - n, self.count) % self.mins.size) if n else np.zeros(0, dtype=np.int64)
+        return self.count - n, self.mins[order], self.maxs[order]
+
+
+class LiveIntervalAnalyzer:
+    """
+    Computes interval min/max on a live int16 stream as each interval completes.
+
+    Incoming samples are staged in a preallocated ring buffer. Every chunk is reduced as soon
+    as it arrives, so a threshold crossing is reported within one read of the offending sample
+    rather than at the end of the interval.
+
+    Memory stays bounded however long the stream runs: only the last history_intervals interval
+    results are kept (interval_mins / interval_maxs); on_interval sees every one of them.
+
+    Callbacks:
+        on_interval(result): called with a dict {index, min, max, latency} when an interval completes.
+        on_threshold(event): called with a dict {interval, sample_index, kind, value, latency}
+                             the first time an interval crosses the low or high threshold.
+    """
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, interval_length_seconds=DEFAULT_INTERVAL_LENGTH_S,
+                 high_threshold=None, low_threshold=None, on_interval=None, on_threshold=None,
+                 ring_intervals=2, history_intervals=DEFAULT_HISTORY_INTERVALS):
+        self.samples_per_interval = int(sample_rate * interval_length_seconds)
+        if self.samples_per_interval == 0:
+            raise ValueError("Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+        self.sample_rate = sample_rate
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.on_interval = on_interval
+        self.on_threshold = on_threshold
+        self.ring = SampleRingBuffer(self.samples_per_interval * ring_intervals)
+        self.interval_latency = LatencyRecorder()
+        self.threshold_latency = LatencyRecorder()
+        self.history = IntervalHistory(history_intervals)
+        self._carry = b''  # Odd trailing byte of a read that split a sample
+        self._analyzed = 0  # Absolute index of the next sample to analyze
+        self._reset_interval()
+
+    @property
+    def interval_mins(self):
+        """Mins of the retained (most recent) intervals, oldest first."""
+        return self.history.recent()[1].tolist()
+
+    @property
+    def interval_maxs(self):
+        """Maxs of the retained (most recent) intervals, oldest first."""
+        return self.history.recent()[2].tolist()
+
+    def _reset_interval(self):
+        self._cur_min = 32767
+        self._cur_max = -32768
+        self._high_fired = False
+        self._low_fired = False
+
+    def feed_bytes(self, payload, arrival_time=None):
+        """Feeds raw little-endian int16 PCM bytes, tolerating reads that split a sample."""
+        if arrival_time is None:
+            arrival_time = time.perf_counter()
+        if self._carry:
+            payload = self._carry + payload
+        usable = len(payload) - (len(payload) % PCM_DTYPE.itemsize)
+        self._carry = payload[usable:]
+        if usable:
+            self.feed(np.frombuffer(payload, dtype=PCM_DTYPE, count=usable // PCM_DTYPE.itemsize), arrival_time)
+
+    def feed(self, samples, arrival_time=None):
+        """Feeds an array of int16 samples and processes every interval it completes."""
+        if arrival_time is None:
+            arrival_time = time.perf_counter()
+        # Chunks larger than the ring are processed in ring-sized pieces so nothing is overwritten unread
+        step = self.ring.capacity
+        for offset in range(0, samples.size, step):
+            self.ring.write(samples[offset:offset + step])
+            self._process(arrival_time)
+
+    def _process(self, arrival_time):
+        end = self.ring.total_written
+        while self._analyzed < end:
+            interval_idx = self._analyzed // self.samples_per_interval
+            interval_end = (interval_idx + 1) * self.samples_per_interval
+            stop = min(end, interval_end)
+            for seg in self.ring.segments(self._analyzed, stop):
+                seg_min = int(seg.min())
+                seg_max = int(seg.max())
+                if seg_min < self._cur_min:
+                    self._cur_min = seg_min
+                if seg_max > self._cur_max:
+                    self._cur_max = seg_max
+                self._check_thresholds(interval_idx, seg, seg_min, seg_max, stop, arrival_time)
+            self._analyzed = stop
+            if stop == interval_end:
+                self._complete_interval(interval_idx, arrival_time)
+
+    def _check_thresholds(self, interval_idx, seg, seg_min, seg_max, stop, arrival_time):
+        if self.high_threshold is not None and not self._high_fired and seg_max >= self.high_threshold:
+            self._high_fired = True
+            offset = int(np.argmax(seg >= self.high_threshold))
+            self._fire_threshold(interval_idx, stop - seg.size + offset, 'high', int(seg[offset]), arrival_time)
+        if self.low_threshold is not None and not self._low_fired and seg_min <= self.low_threshold:
+            self._low_fired = True
+            offset = int(np.argmax(seg <= self.low_threshold))
+            self._fire_threshold(interval_idx, stop - seg.size + offset, 'low', int(seg[offset]), arrival_time)
+
+    def _fire_threshold(self, interval_idx, sample_index, kind, value, arrival_time):
+        latency = time.perf_counter() - arrival_time
+        self.threshold_latency.record(latency)
+        if self.on_threshold is not None:
+            self.on_threshold({'interval': interval_idx, 'sample_index': sample_index,
+                               'kind': kind, 'value': value, 'latency': latency})
+
+    def _complete_interval(self, interval_idx, arrival_time):
+        self.history.record(self._cur_min, self._cur_max)
+        latency = time.perf_counter() - arrival_time
+        self.interval_latency.record(latency)
+        if self.on_interval is not None:
+            self.on_interval({'index': interval_idx, 'min': self._cur_min,
+                              'max': self._cur_max, 'latency': latency})
+        self._reset_interval()
+
+    def latency_report(self):
+        """Returns per-interval and threshold-callback latency percentiles in seconds."""
+        return {'interval': self.interval_latency.percentiles(),
+                'threshold': self.threshold_latency.percentiles()}
+
+
+async def _read_stream(reader, analyzer, read_size):
+    while True:
+        payload = await reader.read(read_size)
+        if not payload:
+            break
+        analyzer.feed_bytes(payload)
+
+
+async def _open_pipe(file_obj):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), file_obj)
+    return reader
+
+
+async def run_live_ingest(source, analyzer, read_size=DEFAULT_READ_SIZE, ready=None):
+    """
+    Ingests live PCM from a source until it reaches end of stream.
+
+    Args:
+        source (str): One of 'stdin', 'fifo:<path>', 'unix:<path>' or 'tcp:<host>:<port>'.
+                      Socket sources listen locally and ingest the first connection.
+        analyzer (LiveIntervalAnalyzer): Receives the samples.
+        read_size (int): Maximum bytes per read; smaller reads lower the detection latency.
+        ready (asyncio.Event, optional): Set once a socket source is listening.
+    """
+    if source == 'stdin':
+        await _read_stream(await _open_pipe(sys.stdin.buffer), analyzer, read_size)
+        return
+    if source.startswith('fifo:'):
+        path = source[len('fifo:'):]
+        if not os.path.exists(path):
+            os.mkfifo(path)
+        # Opening a FIFO for reading blocks until a writer appears, so do it off the loop
+        fifo = await asyncio.to_thread(open, path, 'rb', 0)
+        try:
+            await _read_stream(await _open_pipe(fifo), analyzer, read_size)
+        finally:
+            fifo.close()
+        return
+
+    done = asyncio.Event()
+
+    async def handle(reader, writer):
+        try:
+            await _read_stream(reader, analyzer, read_size)
+        finally:
+            writer.close()
+            done.set()
+
+    if source.startswith('unix:'):
+        path = source[len('unix:'):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(handle, path=path)
+    elif source.startswith('tcp:'):
+        host, port = source[len('tcp:'):].rsplit(':', 1)
+        server = await asyncio.start_server(handle, host=host, port=int(port))
+    else:
+        raise ValueError(f"Unknown live source '{source}'.")
+
+    async with server:
+        if ready is not None:
+            ready.set()
+        await done.wait()
+
+
+async def generate_to_socket(source, samples, sample_rate=DEFAULT_SAMPLE_RATE, chunk_samples=1024, realtime=True):
+    """
+    Local test generator: streams int16 samples to a 'unix:' or 'tcp:' source,
+    paced at the sample rate when realtime is True.
+    """
+    if source.startswith('unix:'):
+        _, writer = await asyncio.open_unix_connection(source[len('unix:'):])
+    else:
+        host, port = source[len('tcp:'):].rsplit(':', 1)
+        _, writer = await asyncio.open_connection(host, int(port))
+    samples = np.ascontiguousarray(samples, dtype=PCM_DTYPE)
+    start = time.perf_counter()
+    for offset in range(0, samples.size, chunk_samples):
+        writer.write(samples[offset:offset + chunk_samples].tobytes())
+        await writer.drain()
+        if realtime:
+            due = start + (offset + chunk_samples) / sample_rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_local_demo(samples, sample_rate=DEFAULT_SAMPLE_RATE, interval_length_seconds=DEFAULT_INTERVAL_LENGTH_S,
+                         source='unix:/tmp/spm_live.sock', realtime=False, **analyzer_kwargs):
+    """Feeds `samples` through a local socket into a live analyzer and returns the analyzer."""
+    analyzer = LiveIntervalAnalyzer(sample_rate, interval_length_seconds, **analyzer_kwargs)
+    ready = asyncio.Event()
+    ingest = asyncio.create_task(run_live_ingest(source, analyzer, ready=ready))
+    await ready.wait()
+    await generate_to_socket(source, samples, sample_rate, realtime=realtime)
+    await ingest
+    return analyzer
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Live interval min/max on raw int16 PCM.")
+    parser.add_argument("--source", default="stdin", help="stdin, fifo:<path>, unix:<path> or tcp:<host>:<port>")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_LENGTH_S, help="Interval length in seconds")
+    parser.add_argument("--high", type=int, default=None, help="High threshold (16-bit)")
+    parser.add_argument("--low", type=int, default=None, help="Low threshold (16-bit)")
+    parser.add_argument("--demo", action="store_true", help="Feed a generated tone with clicks through a local socket")
+    args = parser.parse_args()
+
+    def print_interval(result):
+        print(f"Interval {result['index']}: Min = {result['min']:>6d}, Max = {result['max']:>6d} "
+              f"(latency {result['latency'] * 1e3:.3f} ms)")
+
+    def print_threshold(event):
+        print(f"Threshold {event['kind']} crossed in interval {event['interval']} at sample {event['sample_index']}: "
+              f"{event['value']} (latency {event['latency'] * 1e3:.3f} ms)")
+
+    callbacks = dict(high_threshold=args.high, low_threshold=args.low,
+                     on_interval=print_interval, on_threshold=print_threshold)
+    if args.demo:
+        n = args.sample_rate * 5
+        t = np.arange(n) / args.sample_rate
+        demo = (np.sin(2 * np.pi * 440 * t) * 16000).astype(np.int16)
+        demo[n // 2] = 32767
+        if args.high is None:
+            callbacks['high_threshold'] = 30000
+        live = asyncio.run(run_local_demo(demo, args.sample_rate, args.interval, realtime=True, **callbacks))
+    else:
+        live = LiveIntervalAnalyzer(args.sample_rate, args.interval, **callbacks)
+        asyncio.run(run_live_ingest(args.source, live))
+
+    for name, pct in live.latency_report().items():
+        if pct:
+            print(f"{name} latency: " + ", ".join(f"p{q}={v * 1e3:.3f} ms" for q, v in pct.items()))
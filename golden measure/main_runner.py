@@ -1,35 +1,189 @@
 # main_runner.py
-import numpy as np
-import time
+import argparse
+import json
 import os
+import time
+import traceback
+from contextlib import contextmanager
+import numpy as np
 
+# Only what every run needs is imported here. The OpenCL and native backends, memory_budget and
+# scipy (behind resampling) are imported by the sections that use them, so a sequential run of a
+# small file does not pay for pyopencl, a device context or the native library build check.
 try:
     from audio_generator import generate_audio_text_file, load_wav_to_float_array
-    from sequential_processors import load_audio_from_text, sequential_min_max_amplitude, sequential_interval_min_max_amplitude
-    from opencl_processors import OpenCLProcessor
+    from sequential_processors import load_audio_from_text, sequential_min_max_amplitude, sequential_interval_min_max_amplitude, \
+        sequential_fused_statistics, print_fused_statistics
+    from backend_versions import BACKEND_VERSIONS
+    from outlier_filters import FILTER_METHODS
+    from result_cache import ResultCache, SampleHasher, hash_samples, make_cache_key
+    from sample_text_io import read_text_samples
+    from wav_decoder import read_wav_header
+    import sequential_processors
 except ImportError as e:
-    print(f"Import Error: {e}. Make sure all Python files (audio_generator.py, sequential_processors.py, opencl_processors.py) are in the same directory or your PYTHONPATH is configured.")
+    print(f"Import Error: {e}. Make sure all Python files (audio_generator.py, sequential_processors.py, opencl_processors.py, native_processors.py) are in the same directory or your PYTHONPATH is configured.")
     exit()
 
 # --- Configuration ---
-YOUR_WAV_FILE_PATH = "test2.wav"  # << CHANGE THIS to your WAV file or set to None
+# Defaults for the command line below; every option can also be set with an SPM_* environment variable.
+YOUR_WAV_FILE_PATH = "test2.wav"  # WAV file to analyze, or None for generated audio [wav / SPM_WAV]
 GENERATED_AUDIO_FILENAME = "audio_samples_10s_44100hz.txt"
 DEFAULT_DURATION_S = 10
 DEFAULT_SAMPLE_RATE = 44100  # Hz
 ACTUAL_SAMPLE_RATE = DEFAULT_SAMPLE_RATE 
-INTERVAL_LENGTH_S = 1.0  # seconds
+INTERVAL_LENGTH_S = 1.0  # seconds [--interval / SPM_INTERVAL]
+FILTER_SIGMA = 1.0  # Outlier band used by the processors: mean +/- FILTER_SIGMA * std [--sigma / SPM_SIGMA]
+FILTER_METHOD = "sigma"  # Outlier filter: "sigma", "mad" or "percentile" (see outlier_filters.py); the native backend is sigma-only [--filter / SPM_FILTER]
+FILTER_PARAMS = {}  # Overrides outlier_filters.DEFAULT_FILTER_PARAMS, e.g. {"k": 3.0} for mad or {"lower": 1, "upper": 99} [--filter-params / SPM_FILTER_PARAMS]
+USE_RESULT_CACHE = True  # Reuse results for unchanged WAV files across runs [--no-cache / SPM_NO_CACHE]
+RESULT_CACHE_DIR = ".spm_cache"  # [--cache-dir / SPM_CACHE_DIR]
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+BACKENDS = ("sequential", "opencl", "native")  # Backends to run, in order [--backends / SPM_BACKENDS]
+USE_NATIVE_BACKEND = True  # Also run the C reference library (built with gcc on first use)
+MAX_MEMORY = None  # e.g. "512M": stream the WAV file in chunks sized to stay under this budget (see memory_budget.py) [--max-memory / SPM_MAX_MEMORY]
+
+def selected_backends():
+    """The configured backends that will run; native only with USE_NATIVE_BACKEND."""
+    return [b for b in BACKENDS if b != "native" or USE_NATIVE_BACKEND]
+
+def backend_finished(backend, result):
+    """Whether a backend's result dict holds every section it runs (the native backend has no fused statistics)."""
+    required = ("global_min", "interval_mins") if backend == "native" else ("global_min", "interval_mins", "fused")
+    return all(key in result for key in required)
+
+def filter_params():
+    """Parameters of the configured outlier filter; FILTER_SIGMA is the k of the sigma band."""
+    if FILTER_METHOD == "sigma":
+        return {"k": FILTER_SIGMA, **FILTER_PARAMS}
+    return dict(FILTER_PARAMS)
+
+def analysis_params():
+    """Parameters that, together with the sample content and rate, determine the analysis result."""
+    return {
+        "target_sample_rate": None,
+        "interval_length_s": INTERVAL_LENGTH_S,
+        "filter_sigma": FILTER_SIGMA,
+        "filter_method": FILTER_METHOD,
+        "filter_params": filter_params(),
+        # A budgeted run streams min/max and filtering only; its results have no fused statistics
+        "mode": "budgeted" if MAX_MEMORY else "full",
+        # Only the backends that ran are in the result, so only their versions key it
+        "backend_versions": {backend: BACKEND_VERSIONS[backend] for backend in selected_backends()},
+    }
+
+def print_cached_results(results):
+    """Prints a result dict produced by run_analysis without recomputing anything."""
+    print(f"\nCached analysis: {results['num_samples']} samples at {results['sample_rate']} Hz, "
+          f"interval length {results['interval_length_s']}s")
+    for backend, label in (("sequential", "Sequential"), ("opencl", "OpenCL"), ("native", "Native C")):
+        res = results.get(backend)
+        if not res:
+            continue
+        print(f"\n--- {label} (cached) ---")
+        if res.get("global_min") is not None:
+            print(f"Global Min: {res['global_min']:>6d}, Max: {res['global_max']:>6d}")
+        for i in range(min(10, len(res.get("interval_mins", [])))):
+            print(f"Interval {i}: Min = {res['interval_mins'][i]:>6d}, Max = {res['interval_maxs'][i]:>6d}")
+        print(f"Num Intervals: {len(res.get('interval_mins', []))}, "
+              f"Filtered Mins: {res.get('filtered_mins')}, Filtered Maxs: {res.get('filtered_maxs')}")
+        if res.get("fused"):
+            print_fused_statistics(res["fused"])
+
+def run_budgeted_analysis(cache=None):
+    """
+    Streams YOUR_WAV_FILE_PATH through every backend in chunks sized for MAX_MEMORY instead of
+    loading it whole; prints the results and the measured peak memory of each backend.
+    """
+    global ACTUAL_SAMPLE_RATE
+    from memory_budget import analyze_budgeted, print_memory_report
+
+    with open(YOUR_WAV_FILE_PATH, "rb") as f:
+        header = read_wav_header(f)
+    ACTUAL_SAMPLE_RATE = header["sample_rate"]
+    print(f"\nProcessing {YOUR_WAV_FILE_PATH} ({header['num_frames']} samples at {ACTUAL_SAMPLE_RATE} Hz) "
+          f"within a memory budget of {MAX_MEMORY}.")
+    print(f"Interval length for analysis: {INTERVAL_LENGTH_S}s")
+
+    results = {
+        "num_samples": header["num_frames"],
+        "sample_rate": ACTUAL_SAMPLE_RATE,
+        "interval_length_s": INTERVAL_LENGTH_S,
+        "sequential": {},
+        "opencl": {},
+        "native": {},
+    }
+    # The sequential pass also hashes the decoded samples for the result cache
+    hasher = SampleHasher(header["num_frames"]) if cache is not None else None
+    labels = {"sequential": "Sequential", "opencl": "OpenCL", "native": "Native C"}
+    for backend in selected_backends():
+        label = labels[backend]
+        print(f"\n--- {label} Budgeted Interval Min/Max & Filtering ---")
+        # The native backend is sigma-only, as in run_analysis
+        method, params = ("sigma", {"k": FILTER_SIGMA}) if backend == "native" else (FILTER_METHOD, filter_params())
+        try:
+            res, report = analyze_budgeted(YOUR_WAV_FILE_PATH, MAX_MEMORY, INTERVAL_LENGTH_S, backend,
+                                           filter_method=method, filter_params=params,
+                                           hasher=hasher if backend == "sequential" else None)
+        except Exception as e:
+            print(f"Error: {label} budgeted analysis failed: {e}")
+            continue
+        print(f"Global Min: {res['global_min']}, Max: {res['global_max']}")
+        for i in range(min(10, len(res["interval_mins"]))):
+            print(f"Interval {i}: Min = {res['interval_mins'][i]:>6d}, Max = {res['interval_maxs'][i]:>6d}")
+        print(f"Num Intervals: {len(res['interval_mins'])}, "
+              f"Filtered Mins: {res['filtered_mins']}, Filtered Maxs: {res['filtered_maxs']}")
+        print_memory_report(report)
+        results[backend] = {key: res[key] for key in ("global_min", "global_max", "interval_mins", "interval_maxs",
+                                                      "filtered_mins", "filtered_maxs")}
+
+    if cache is not None and results["sequential"]:
+        content_hash = f"{hasher.hexdigest()}@{ACTUAL_SAMPLE_RATE}"
+        cache.remember_file(YOUR_WAV_FILE_PATH, content_hash)
+        # A backend that failed is retried next time rather than remembered as empty
+        missing = [backend for backend in selected_backends() if not results[backend]]
+        if missing:
+            print(f"\nNot caching: {', '.join(missing)} did not finish.")
+        else:
+            cache.put(make_cache_key(content_hash, analysis_params()), results)
+            print(f"\nStored results in cache '{RESULT_CACHE_DIR}'.")
 
 def run_analysis():
     global ACTUAL_SAMPLE_RATE
 
     audio_data_np = None
 
+    cache = None
+    cache_key = None
+
     if YOUR_WAV_FILE_PATH and os.path.exists(YOUR_WAV_FILE_PATH):
+        if USE_RESULT_CACHE:
+            cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
+            # Stat-based pre-check: an unchanged file is answered without decoding it
+            _, cached = cache.lookup_file(YOUR_WAV_FILE_PATH, analysis_params())
+            if cached is not None:
+                print(f"Result cache hit for unchanged file: {YOUR_WAV_FILE_PATH}")
+                print_cached_results(cached)
+                return
+
+        if MAX_MEMORY:
+            run_budgeted_analysis(cache)
+            return
+
         print(f"Loading WAV file: {YOUR_WAV_FILE_PATH}...")
         audio_data_np, sr_from_wav = load_wav_to_float_array(YOUR_WAV_FILE_PATH, target_sample_rate=None)
         if audio_data_np is not None:
             ACTUAL_SAMPLE_RATE = sr_from_wav
             print(f"Successfully loaded WAV. Sample rate: {ACTUAL_SAMPLE_RATE} Hz, Samples: {len(audio_data_np)}")
+            if cache is not None:
+                # The sample rate is part of the content: the same samples at another rate give other intervals
+                content_hash = f"{hash_samples(audio_data_np)}@{ACTUAL_SAMPLE_RATE}"
+                cache.remember_file(YOUR_WAV_FILE_PATH, content_hash)
+                cache_key = make_cache_key(content_hash, analysis_params())
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    print("Result cache hit for identical sample content.")
+                    print_cached_results(cached)
+                    return
         else:
             print(f"Failed to load WAV file: {YOUR_WAV_FILE_PATH}. Exiting.")
             return
@@ -45,9 +199,7 @@ def run_analysis():
             print(f"Using existing generated audio data: {GENERATED_AUDIO_FILENAME}")
         
         try:
-            with open(GENERATED_AUDIO_FILENAME, 'r') as f:
-                data = [float(line.strip()) for line in f]
-            audio_data_np = np.array(data, dtype=np.float32)
+            audio_data_np = read_text_samples(GENERATED_AUDIO_FILENAME, dtype=np.float32)
             ACTUAL_SAMPLE_RATE = DEFAULT_SAMPLE_RATE
             print(f"Loaded generated audio. Sample rate: {ACTUAL_SAMPLE_RATE} Hz, Samples: {len(audio_data_np)}")
         except Exception as e:
@@ -61,91 +213,260 @@ def run_analysis():
     print(f"\nProcessing audio with {len(audio_data_np)} samples at {ACTUAL_SAMPLE_RATE} Hz.")
     print(f"Interval length for analysis: {INTERVAL_LENGTH_S}s")
 
+    results = {
+        "num_samples": int(len(audio_data_np)),
+        "sample_rate": ACTUAL_SAMPLE_RATE,
+        "interval_length_s": INTERVAL_LENGTH_S,
+        "sequential": {},
+        "opencl": {},
+        "native": {},
+    }
+
+    backends = selected_backends()
+    s_time = s_int_time = s_fused_time = 0.0
+
+    ocl_processor = None
+    if "opencl" in backends:
+        try:
+            from opencl_processors import OpenCLProcessor
+            ocl_processor = OpenCLProcessor()
+        except Exception as e:
+            print(f"Error: Could not create the OpenCL processor: {e}")
+
+    native_processor = None
+    if "native" in backends:
+        try:
+            from native_processors import NativeProcessor
+            native_processor = NativeProcessor()
+        except Exception as e:
+            print(f"Error: Could not build or load the native C library: {e}")
+
+    failed = set()
+
+    @contextmanager
+    def backend_section(backend):
+        """One backend's part of a section: an exception marks that backend failed and the others go on."""
+        try:
+            yield
+        except Exception as e:
+            failed.add(backend)
+            print(f"\nError: {backend} backend failed: {e}")
+            traceback.print_exc()
+
     # --- 1. Min Max Amplitude ---
     print("\n" + "="*30)
     print("SECTION 1: Global Min Max Amplitude")
     print("="*30)
 
     # Sequential
-    print("\n--- Sequential Global Min/Max ---")
-    s_min, s_max, s_time = sequential_min_max_amplitude(audio_data_np)
-    if s_min is not None:
-        print(f"Sequential Min: {s_min:>6d}, Max: {s_max:>6d}")
-        print(f"Sequential Processing Time: {s_time:.6f} seconds")
-    else:
-        print("Sequential global min/max failed.")
+    if "sequential" in backends and "sequential" not in failed:
+        with backend_section("sequential"):
+            print("\n--- Sequential Global Min/Max ---")
+            s_min, s_max, s_time = sequential_min_max_amplitude(audio_data_np)
+            if s_min is not None:
+                print(f"Sequential Min: {s_min:>6d}, Max: {s_max:>6d}")
+                print(f"Sequential Processing Time: {s_time:.6f} seconds")
+                results["sequential"].update(global_min=s_min, global_max=s_max)
+            else:
+                print("Sequential global min/max failed.")
 
     # OpenCL
-    print("\n--- OpenCL Global Min/Max ---")
-    try:
-        ocl_processor = OpenCLProcessor()
-        
-        cl_min, cl_max, cl_total_time, cl_kernel_time = ocl_processor.get_global_min_max(audio_data_np)
-        if cl_min is not None:
-            # Assuming get_global_min_max returns scaled integer values (to be updated in opencl_processors.py)
-            print(f"OpenCL Min: {cl_min:>6d}, Max: {cl_max:>6d}")
-            print(f"OpenCL Total Time (Host + Device): {cl_total_time:.6f} seconds")
-            print(f"OpenCL Kernel-Only Execution Time: {cl_kernel_time:.6f} seconds")
-            if s_time > 0 and cl_total_time > 0:
-                 print(f"Speedup (Total Time vs Sequential): {s_time / cl_total_time:.2f}x")
-        else:
-            print("OpenCL global min/max processing failed.")
+    if ocl_processor is not None and "opencl" not in failed:
+        with backend_section("opencl"):
+            print("\n--- OpenCL Global Min/Max ---")
+            cl_min, cl_max, cl_total_time, cl_kernel_time = ocl_processor.get_global_min_max(audio_data_np)
+            if cl_min is not None:
+                print(f"OpenCL Min: {cl_min:>6d}, Max: {cl_max:>6d}")
+                print(f"OpenCL Total Time (Host + Device): {cl_total_time:.6f} seconds")
+                print(f"OpenCL Kernel-Only Execution Time: {cl_kernel_time:.6f} seconds")
+                results["opencl"].update(global_min=cl_min, global_max=cl_max)
+                if s_time > 0 and cl_total_time > 0:
+                     print(f"Speedup (Total Time vs Sequential): {s_time / cl_total_time:.2f}x")
+            else:
+                print("OpenCL global min/max processing failed.")
 
-        # --- 2. Interval Based Min Max Amplitude ---
-        print("\n" + "="*30)
-        print("SECTION 2: Interval Based Min Max Amplitude")
-        print("="*30)
+    # Native C library
+    if native_processor is not None and "native" not in failed:
+        with backend_section("native"):
+            print("\n--- Native C Global Min/Max ---")
+            n_min, n_max, n_total_time, n_kernel_time = native_processor.get_global_min_max(audio_data_np)
+            if n_min is not None:
+                print(f"Native Min: {n_min:>6d}, Max: {n_max:>6d}")
+                print(f"Native Total Time (incl. int16 conversion): {n_total_time:.6f} seconds")
+                print(f"Native Reduction-Only Time: {n_kernel_time:.6f} seconds")
+                results["native"].update(global_min=n_min, global_max=n_max)
+                if s_time > 0 and n_total_time > 0:
+                    print(f"Speedup (Total Time vs Sequential): {s_time / n_total_time:.2f}x")
+            else:
+                print("Native global min/max processing failed.")
 
-        # Sequential
-        print("\n--- Sequential Interval Min/Max & Filtering ---")
-        s_int_mins, s_int_maxs, s_filt_mins, s_filt_maxs, s_int_time = \
-            sequential_interval_min_max_amplitude(audio_data_np, ACTUAL_SAMPLE_RATE, INTERVAL_LENGTH_S)
-        
-        if s_int_mins:
-            num_intervals_seq = len(s_int_mins)
-            print(f"Sequential - Num Intervals: {num_intervals_seq}")
-            print(f"Sequential Interval Processing Time: {s_int_time:.6f} seconds")
-        else:
-            print("Sequential interval processing failed.")
-
-        # OpenCL
-        print("\n--- OpenCL Interval Min/Max & Filtering ---")
-        cl_int_mins, cl_int_maxs, cl_filt_mins, cl_filt_maxs, cl_int_total_time, cl_int_kernel_time = \
-            ocl_processor.get_interval_min_max(audio_data_np, ACTUAL_SAMPLE_RATE, INTERVAL_LENGTH_S)
-
-        if cl_int_mins:
-            num_intervals_cl = len(cl_int_mins)
-            print(f"OpenCL - Num Intervals: {num_intervals_cl}")
-            print(f"OpenCL Interval Total Time (Host + Device): {cl_int_total_time:.6f} seconds")
-            print(f"OpenCL Interval Kernel-Only Execution Time: {cl_int_kernel_time:.6f} seconds")
-            if s_int_time > 0 and cl_int_total_time > 0:
-                print(f"Speedup (Total Time vs Sequential): {s_int_time / cl_int_total_time:.2f}x")
+    # --- 2. Interval Based Min Max Amplitude ---
+    print("\n" + "="*30)
+    print("SECTION 2: Interval Based Min Max Amplitude")
+    print("="*30)
+
+    # Sequential
+    if "sequential" in backends and "sequential" not in failed:
+        with backend_section("sequential"):
+            print("\n--- Sequential Interval Min/Max & Filtering ---")
+            s_int_mins, s_int_maxs, s_filt_mins, s_filt_maxs, s_int_time = \
+                sequential_interval_min_max_amplitude(audio_data_np, ACTUAL_SAMPLE_RATE, INTERVAL_LENGTH_S, FILTER_METHOD, filter_params())
+
+            if s_int_mins:
+                num_intervals_seq = len(s_int_mins)
+                print(f"Sequential - Num Intervals: {num_intervals_seq}")
+                print(f"Sequential Interval Processing Time: {s_int_time:.6f} seconds")
+                results["sequential"].update(interval_mins=s_int_mins, interval_maxs=s_int_maxs,
+                                             filtered_mins=s_filt_mins, filtered_maxs=s_filt_maxs)
+            else:
+                print("Sequential interval processing failed.")
+
+    # OpenCL
+    if ocl_processor is not None and "opencl" not in failed:
+        with backend_section("opencl"):
+            print("\n--- OpenCL Interval Min/Max & Filtering ---")
+            cl_int_mins, cl_int_maxs, cl_filt_mins, cl_filt_maxs, cl_int_total_time, cl_int_kernel_time = \
+                ocl_processor.get_interval_min_max(audio_data_np, ACTUAL_SAMPLE_RATE, INTERVAL_LENGTH_S, FILTER_METHOD, filter_params())
+
+            if cl_int_mins:
+                num_intervals_cl = len(cl_int_mins)
+                print(f"OpenCL - Num Intervals: {num_intervals_cl}")
+                print(f"OpenCL Interval Total Time (Host + Device): {cl_int_total_time:.6f} seconds")
+                print(f"OpenCL Interval Kernel-Only Execution Time: {cl_int_kernel_time:.6f} seconds")
+                if s_int_time > 0 and cl_int_total_time > 0:
+                    print(f"Speedup (Total Time vs Sequential): {s_int_time / cl_int_total_time:.2f}x")
+                results["opencl"].update(interval_mins=cl_int_mins, interval_maxs=cl_int_maxs,
+                                         filtered_mins=cl_filt_mins, filtered_maxs=cl_filt_maxs)
+            else:
+                print("OpenCL interval processing failed.")
+
+    # Native C library
+    if native_processor is not None and "native" not in failed:
+        with backend_section("native"):
+            print("\n--- Native C Interval Min/Max & Filtering ---")
+            n_int_mins, n_int_maxs, n_filt_mins, n_filt_maxs, n_int_total_time, n_int_kernel_time = \
+                native_processor.get_interval_min_max(audio_data_np, ACTUAL_SAMPLE_RATE, INTERVAL_LENGTH_S, FILTER_SIGMA)
+            if n_int_mins:
+                print(f"Native - Num Intervals: {len(n_int_mins)}")
+                print(f"Native Interval Total Time (incl. int16 conversion): {n_int_total_time:.6f} seconds")
+                print(f"Native Interval Reduction-Only Time: {n_int_kernel_time:.6f} seconds")
+                if s_int_time > 0 and n_int_total_time > 0:
+                    print(f"Speedup (Total Time vs Sequential): {s_int_time / n_int_total_time:.2f}x")
+                results["native"].update(interval_mins=n_int_mins, interval_maxs=n_int_maxs,
+                                         filtered_mins=n_filt_mins, filtered_maxs=n_filt_maxs)
+            else:
+                print("Native interval processing failed.")
+
+    # --- 3. Fused Statistics ---
+    print("\n" + "="*30)
+    print("SECTION 3: Fused Interval Statistics (RMS, Peak, DC, Clipping)")
+    print("="*30)
+
+    # Sequential
+    if "sequential" in backends and "sequential" not in failed:
+        with backend_section("sequential"):
+            print("\n--- Sequential Fused Statistics ---")
+            s_fused, s_fused_time = sequential_fused_statistics(audio_data_np, ACTUAL_SAMPLE_RATE, INTERVAL_LENGTH_S)
+            if s_fused is not None:
+                print(f"Sequential Fused Processing Time: {s_fused_time:.6f} seconds")
+                results["sequential"]["fused"] = s_fused
+            else:
+                print("Sequential fused statistics failed.")
+
+    # OpenCL
+    if ocl_processor is not None and "opencl" not in failed:
+        with backend_section("opencl"):
+            print("\n--- OpenCL Fused Statistics ---")
+            cl_fused, cl_fused_total_time, cl_fused_kernel_time = \
+                ocl_processor.get_fused_statistics(audio_data_np, ACTUAL_SAMPLE_RATE, INTERVAL_LENGTH_S)
+            if cl_fused is not None:
+                print(f"OpenCL Fused Total Time (Host + Device): {cl_fused_total_time:.6f} seconds")
+                print(f"OpenCL Fused Kernel-Only Execution Time: {cl_fused_kernel_time:.6f} seconds")
+                if s_fused_time > 0 and cl_fused_total_time > 0:
+                    print(f"Speedup (Total Time vs Sequential): {s_fused_time / cl_fused_total_time:.2f}x")
+                results["opencl"]["fused"] = cl_fused
+            else:
+                print("OpenCL fused statistics failed.")
+
+    # Only complete results are cached; a backend that failed (or could not be created) is retried next time
+    if cache is not None and cache_key is not None:
+        missing = [b for b in backends if b in failed or not backend_finished(b, results[b])]
+        if missing:
+            print(f"\nNot caching: {', '.join(missing)} did not finish.")
         else:
-            print("OpenCL interval processing failed.")
+            cache.put(cache_key, results)
+            print(f"\nStored results in cache '{RESULT_CACHE_DIR}'.")
 
-    except Exception as e:
-        print(f"\nAn unexpected error occurred: {e}")
-        import traceback
-        traceback.print_exc()
+def parse_args(argv=None):
+    """
+    Command-line configuration. Each option defaults to its SPM_* environment variable and then to
+    the module-level setting above.
 
-if __name__ == "__main__":
+    Args:
+        argv (list, optional): Arguments to parse; defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace
+    """
+    def env(name, default):
+        return os.environ.get(f"SPM_{name}", default)
+
+    parser = argparse.ArgumentParser(
+        description="Global, interval and fused min/max analysis of a WAV file on the selected backends.",
+        epilog="Environment: SPM_WAV, SPM_INTERVAL, SPM_BACKENDS, SPM_FILTER, SPM_SIGMA, SPM_FILTER_PARAMS, "
+               "SPM_MAX_MEMORY, SPM_CACHE_DIR, SPM_NO_CACHE=1.")
+    parser.add_argument("wav", nargs="?", default=env("WAV", YOUR_WAV_FILE_PATH),
+                        help="WAV file to analyze; generated audio is used if it does not exist")
+    parser.add_argument("--interval", type=float, default=env("INTERVAL", INTERVAL_LENGTH_S),
+                        help="Interval length in seconds")
+    parser.add_argument("--backends", default=env("BACKENDS", ",".join(BACKENDS)),
+                        help="Comma-separated backends to run: sequential, opencl, native")
+    parser.add_argument("--filter", default=env("FILTER", FILTER_METHOD), help="Outlier filter: " + ", ".join(FILTER_METHODS))
+    parser.add_argument("--sigma", type=float, default=env("SIGMA", FILTER_SIGMA), help="k of the sigma band")
+    parser.add_argument("--filter-params", type=json.loads, default=env("FILTER_PARAMS", FILTER_PARAMS),
+                        help='JSON overrides of the filter parameters, e.g. \'{"k": 3.0}\'')
+    parser.add_argument("--max-memory", default=env("MAX_MEMORY", MAX_MEMORY),
+                        help="Stream the WAV file within this memory budget, e.g. 512M")
+    parser.add_argument("--cache-dir", default=env("CACHE_DIR", RESULT_CACHE_DIR), help="Result cache directory")
+    parser.add_argument("--no-cache", action="store_true", default=env("NO_CACHE", "0") not in ("", "0"),
+                        help="Do not read or store cached results")
+    args = parser.parse_args(argv)
+
+    args.backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in args.backends if b not in BACKEND_VERSIONS]
+    if unknown or not args.backends:
+        parser.error(f"--backends must name one or more of {', '.join(BACKEND_VERSIONS)}, got {unknown or 'none'}")
+    if args.filter not in FILTER_METHODS:
+        parser.error(f"--filter must be one of {', '.join(FILTER_METHODS)}, got {args.filter!r}")
+    return args
+
+def configure(args):
+    """Applies parsed command-line options to the module-level configuration."""
+    global YOUR_WAV_FILE_PATH, INTERVAL_LENGTH_S, BACKENDS, FILTER_METHOD, FILTER_SIGMA, FILTER_PARAMS, \
+        MAX_MEMORY, RESULT_CACHE_DIR, USE_RESULT_CACHE
+    YOUR_WAV_FILE_PATH = args.wav
+    INTERVAL_LENGTH_S = args.interval
+    BACKENDS = tuple(args.backends)
+    FILTER_METHOD = args.filter
+    FILTER_SIGMA = args.sigma
+    FILTER_PARAMS = dict(args.filter_params)
+    MAX_MEMORY = args.max_memory or None
+    RESULT_CACHE_DIR = args.cache_dir
+    USE_RESULT_CACHE = not args.no_cache
+
+def main(argv=None):
+    configure(parse_args(argv))
     if YOUR_WAV_FILE_PATH == "test.wav" and not os.path.exists("test.wav"):
-        print("Creating a dummy 'test.wav' as it's specified and not found...")
-        sr_test = 22050
-        duration_test = 10
-        frequency_test = 440
-        t_test = np.linspace(0, duration_test, int(sr_test * duration_test), False)
-        note_test = np.sin(frequency_test * t_test * 2 * np.pi)
-        noise = np.random.normal(0, 0.1, len(note_test))
-        note_test = note_test + noise
-        note_test = np.clip(note_test, -1.0, 1.0)
-
-        audio_test_int16 = (note_test * 32767).astype(np.int16)
+        print("Creating a synthetic 'test.wav' as it's specified and not found...")
         try:
-            from scipy.io import wavfile as scipy_wavfile
-            scipy_wavfile.write("test.wav", sr_test, audio_test_int16)
+            from workload_generator import generate_workload
+            # Tones, noise and silence with injected clicks and clipping, so the filters have outliers to find
+            generate_workload("test.wav", duration_seconds=10, sample_rate=22050, seed=0)
             print("'test.wav' created for demonstration.")
         except Exception as e_wav:
-            print(f"Could not create dummy 'test.wav': {e_wav}. Please provide a WAV file or ensure scipy is installed.")
-            
-    run_analysis()
\ No newline at end of file
+            print(f"Could not create dummy 'test.wav': {e_wav}. Please provide a WAV file.")
+
+    run_analysis()
+
+if __name__ == "__main__":
+    main()
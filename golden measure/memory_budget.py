@@ -0,0 +1,300 @@
+# memory_budget.py
+import os
+import threading
+import time
+import numpy as np
+
+from partial_summary import PartialSummary
+from outlier_filters import filter_mask, masked_pairs
+from sequential_processors import FUSED_CHUNK_SAMPLES
+from wav_decoder import read_wav_blocks, read_wav_header
+
+# Memory-budgeted analysis. The whole-array path holds the decoded file, its copies and (for
+# OpenCL) a device buffer of the same size; here the recording is streamed in chunks whose size
+# is chosen from a max_memory budget:
+#
+#   budget = fixed working set + per-interval results + chunk_samples * bytes per chunk sample
+#
+# The fixed part covers the reduction temporaries (sequential_processors works on
+# FUSED_CHUNK_SAMPLES rows at a time, at least one interval); the per-sample part is the raw
+# read buffer, the decoded float32 block and the backend's own copy (int16 conversion for the
+# native library, the device input for OpenCL). On OpenCL devices a chunk is also capped by the
+# device's MAX_MEM_ALLOC_SIZE. Each chunk is reduced to a PartialSummary (or fed to the native
+# interval stream), so results are identical to the single-array processors.
+#
+# The budget covers the run's working memory above the process baseline (interpreter, libraries,
+# OpenCL runtime). MemoryMonitor measures what the run actually used: peak resident host memory
+# sampled from /proc, and the peak of device buffers held by the OpenCLProcessor's pool.
+
+BACKENDS = ("sequential", "opencl", "native")
+MIN_CHUNK_SAMPLES = 1 << 12
+FIXED_OVERHEAD_BYTES = 8 << 20
+RESULT_BYTES_PER_INTERVAL = 320  # Summary arrays while merging (2 x 32 B) and the result lists
+BACKEND_BYTES_PER_SAMPLE = {"sequential": 0, "opencl": 4, "native": 6}  # Native: float32 temp + int16
+DEFAULT_MONITOR_INTERVAL_S = 0.005
+
+_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_memory_size(value):
+    """
+    Bytes of a memory size: an int, or a string such as "512M", "2G", "1.5GiB" or "64MB"
+    (binary units).
+
+    Raises:
+        ValueError: If the size cannot be parsed or is not positive.
+    """
+    if isinstance(value, (int, np.integer)):
+        size = int(value)
+    else:
+        text = str(value).strip().upper().replace("IB", "").rstrip("B")
+        unit = text[-1] if text and text[-1] in _UNITS else ""
+        try:
+            size = int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+        except ValueError:
+            raise ValueError(f"Invalid memory size '{value}'.") from None
+    if size <= 0:
+        raise ValueError(f"Memory size must be positive, got '{value}'.")
+    return size
+
+
+def working_set_bytes(samples_per_interval):
+    """Chunk-independent working memory of the interval reduction."""
+    return FIXED_OVERHEAD_BYTES + 12 * max(FUSED_CHUNK_SAMPLES, samples_per_interval)
+
+
+def plan_chunk_samples(max_memory, num_samples, samples_per_interval, backend="sequential", bytes_per_frame=4,
+                       processor=None):
+    """
+    Largest chunk (in samples) that keeps a run under max_memory.
+
+    Args:
+        max_memory (int or str): Budget, see parse_memory_size.
+        num_samples (int): Length of the recording (sizes the per-interval results).
+        samples_per_interval (int): Interval length in samples.
+        backend (str): One of BACKENDS.
+        bytes_per_frame (int): Raw bytes read per sample (WAV block align); 4 for in-memory float32.
+        processor (OpenCLProcessor, optional): Caps the chunk at the device's MAX_MEM_ALLOC_SIZE.
+
+    Returns:
+        int: Chunk length, a multiple of the interval length when at least one interval fits.
+
+    Raises:
+        ValueError: If the budget cannot hold the results plus a chunk of MIN_CHUNK_SAMPLES.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'; expected one of {BACKENDS}.")
+    max_memory = parse_memory_size(max_memory)
+    num_intervals = -(-num_samples // samples_per_interval)
+    reserved = working_set_bytes(samples_per_interval) + num_intervals * RESULT_BYTES_PER_INTERVAL
+    per_sample = 4 + bytes_per_frame + BACKEND_BYTES_PER_SAMPLE[backend]
+    chunk = (max_memory - reserved) // per_sample
+    if processor is not None:
+        chunk = min(chunk, processor.ctx.devices[0].max_mem_alloc_size // 4)
+    if chunk < MIN_CHUNK_SAMPLES:
+        needed = reserved + MIN_CHUNK_SAMPLES * per_sample
+        raise ValueError(f"max_memory of {max_memory} bytes is too small for {num_samples} samples in "
+                         f"{num_intervals} intervals; at least {needed} bytes are needed.")
+    if chunk >= samples_per_interval:
+        chunk = chunk // samples_per_interval * samples_per_interval
+    return int(min(chunk, max(num_samples, MIN_CHUNK_SAMPLES)))
+
+
+def _resident_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource  # Peak since process start (not resettable); kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMonitor:
+    """
+    Context manager measuring a run's peak memory above its level at entry: resident host memory,
+    sampled by a background thread, and device buffers held by an OpenCLProcessor's pool.
+    """
+
+    def __init__(self, processor=None, interval=DEFAULT_MONITOR_INTERVAL_S):
+        self.processor = processor
+        self.interval = interval
+        self.host_baseline = self.host_peak = 0
+        self.device_baseline = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        self.host_peak = max(self.host_peak, _resident_bytes())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.host_baseline = self.host_peak = _resident_bytes()
+        if self.processor is not None:
+            self.processor.pool.reset_peak()
+            self.device_baseline = self.processor.pool.held_bytes
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def report(self):
+        device_peak = 0
+        if self.processor is not None:
+            device_peak = self.processor.pool.peak_held_bytes - self.device_baseline
+        return {"host_peak_bytes": self.host_peak - self.host_baseline, "host_peak_rss": self.host_peak,
+                "device_peak_bytes": device_peak}
+
+
+def _native_results(processor, blocks, samples_per_interval, filter_method, filter_params):
+    """Interval min/max of streamed blocks in the C library (complete intervals, like NativeProcessor)."""
+    from native_processors import NativeIntervalStream
+    stream = NativeIntervalStream(processor.lib, samples_per_interval)
+    mins, maxs = [], []
+    num_samples = 0
+    for block in blocks:
+        num_samples += block.size
+        block_mins, block_maxs = stream.feed(block)
+        mins.append(block_mins)
+        maxs.append(block_maxs)
+    mins = np.concatenate(mins).astype(np.int64) if mins else np.empty(0, dtype=np.int64)
+    maxs = np.concatenate(maxs).astype(np.int64) if maxs else np.empty(0, dtype=np.int64)
+    # Global extremes include the samples of the unfinished last interval
+    tail_min, tail_max, tail_count = stream.partial()
+    lows = ([int(mins.min())] if mins.size else []) + ([tail_min] if tail_count else [])
+    highs = ([int(maxs.max())] if maxs.size else []) + ([tail_max] if tail_count else [])
+    filter_params = filter_params or {}
+    if filter_method == "sigma":
+        sigma = filter_params.get("k", 1.0)
+        filtered_mins = [v for _, v in processor.filter_within_sigma(mins, sigma)]
+        filtered_maxs = [v for _, v in processor.filter_within_sigma(maxs, sigma)]
+    else:
+        filtered_mins = [v for _, v in masked_pairs(mins, filter_mask(mins, filter_method, **filter_params))]
+        filtered_maxs = [v for _, v in masked_pairs(maxs, filter_mask(maxs, filter_method, **filter_params))]
+    return {
+        "num_samples": num_samples,
+        "global_min": min(lows) if lows else None,
+        "global_max": max(highs) if highs else None,
+        "interval_mins": mins.tolist(),
+        "interval_maxs": maxs.tolist(),
+        "filtered_mins": filtered_mins,
+        "filtered_maxs": filtered_maxs,
+    }
+
+
+def analyze_budgeted(source, max_memory, interval_length_seconds=1.0, backend="sequential", sample_rate=None,
+                     processor=None, filter_method="sigma", filter_params=None, hasher=None):
+    """
+    Interval analysis of a WAV file (streamed) or an in-memory float32 array (processed through
+    views) within a memory budget.
+
+    Args:
+        source (str or np.ndarray): WAV path, or float32 samples in [-1.0, 1.0].
+        max_memory (int or str): Budget, see parse_memory_size.
+        backend (str): "sequential", "opencl" or "native".
+        sample_rate (int, optional): Required for array sources.
+        processor: OpenCLProcessor or NativeProcessor to reuse; created when needed.
+        hasher (result_cache.SampleHasher, optional): Fed every decoded chunk.
+
+    Returns:
+        Tuple (results, report): results as PartialSummary.finalize (the native backend reports
+        min/max only); report with max_memory, chunk_samples, num_chunks, host_peak_bytes,
+        host_peak_rss, device_peak_bytes and time.
+    """
+    start_time = time.time()
+    max_memory = parse_memory_size(max_memory)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            header = read_wav_header(f)
+        sample_rate, num_samples, bytes_per_frame = header["sample_rate"], header["num_frames"], header["block_align"]
+    else:
+        if sample_rate is None:
+            raise ValueError("sample_rate is required for array sources.")
+        source = np.ascontiguousarray(source, dtype=np.float32)
+        num_samples, bytes_per_frame = source.size, 0  # Chunks are views; nothing is read
+    samples_per_interval = int(sample_rate * interval_length_seconds)
+    if samples_per_interval == 0:
+        raise ValueError("Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+
+    if backend == "opencl" and processor is None:
+        from opencl_processors import OpenCLProcessor
+        processor = OpenCLProcessor()
+    elif backend == "native" and processor is None:
+        from native_processors import NativeProcessor
+        processor = NativeProcessor()
+    chunk_samples = plan_chunk_samples(max_memory, num_samples, samples_per_interval, backend, bytes_per_frame,
+                                       processor if backend == "opencl" else None)
+    saved_chunk_bytes = None
+    if backend == "opencl":
+        processor.pool.clear()  # Idle buffers of earlier runs would count against the budget
+        # The budget applies to this run only; a caller's processor gets its own limit back afterwards
+        saved_chunk_bytes = processor.max_chunk_bytes
+        processor.max_chunk_bytes = min(processor.ctx.devices[0].max_mem_alloc_size, chunk_samples * 4)
+
+    def chunks():
+        if isinstance(source, np.ndarray):
+            for start in range(0, num_samples, chunk_samples):
+                yield source[start:start + chunk_samples]
+        else:
+            yield from read_wav_blocks(source, chunk_samples)[1]
+
+    def counted(blocks):
+        for block in blocks:
+            report["num_chunks"] += 1
+            if hasher is not None:
+                hasher.update(block)
+            yield block
+
+    report = {"max_memory": max_memory, "chunk_samples": chunk_samples, "num_chunks": 0}
+    try:
+        with MemoryMonitor(processor if backend == "opencl" else None) as monitor:
+            if backend == "native":
+                results = _native_results(processor, counted(chunks()), samples_per_interval, filter_method, filter_params)
+            else:
+                parts, position = [], 0
+                for block in counted(chunks()):
+                    parts.append(PartialSummary.from_samples(block, position, samples_per_interval,
+                                                             processor if backend == "opencl" else None))
+                    position += block.size
+                summary = PartialSummary.merge_all(parts) if position else PartialSummary.identity(samples_per_interval, 0, 0)
+                del parts
+                results = summary.finalize(filter_method, filter_params)
+    finally:
+        if saved_chunk_bytes is not None:
+            processor.max_chunk_bytes = saved_chunk_bytes
+    report.update(monitor.report())
+    report["time"] = time.time() - start_time
+    return results, report
+
+
+def print_memory_report(report):
+    mb = 1 << 20
+    print(f"Memory budget {report['max_memory'] / mb:.1f} MiB: {report['num_chunks']} chunks of "
+          f"{report['chunk_samples']} samples; peak host {report['host_peak_bytes'] / mb:.1f} MiB above baseline "
+          f"(RSS {report['host_peak_rss'] / mb:.1f} MiB), peak device {report['device_peak_bytes'] / mb:.1f} MiB; "
+          f"{report['time']:.3f} s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Interval analysis of a WAV file within a memory budget.")
+    parser.add_argument("wav", help="WAV file to analyze")
+    parser.add_argument("--max-memory", required=True, help="Budget, e.g. 256M or 2G")
+    parser.add_argument("--interval", type=float, default=1.0, help="Interval length in seconds")
+    parser.add_argument("--backend", choices=BACKENDS, default="sequential")
+    args = parser.parse_args()
+
+    results, report = analyze_budgeted(args.wav, args.max_memory, args.interval, args.backend)
+    for i in range(min(10, len(results["interval_mins"]))):
+        print(f"Interval {i}: Min = {results['interval_mins'][i]:>6d}, Max = {results['interval_maxs'][i]:>6d}")
+    print(f"Global Min: {results['global_min']}, Max: {results['global_max']}")
+    print(f"Filtered Mins: {results['filtered_mins']}")
+    print(f"Filtered Maxs: {results['filtered_maxs']}")
+    print_memory_report(report)
@@ -0,0 +1,209 @@
+# native_processors.py
+import ctypes
+import os
+import subprocess
+import time
+import numpy as np
+from backend_versions import BACKEND_VERSIONS
+
+try:
+    import fcntl  # Serializes concurrent builds of the library; not available on Windows
+except ImportError:
+    fcntl = None
+
+# Part of the result cache key; bumped in backend_versions.py.
+BACKEND_VERSION = BACKEND_VERSIONS["native"]
+
+SOURCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio_filter_reference.c")
+LIBRARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "libaudio_filter_reference.so")
+COMPILE_COMMAND = ["gcc", "-O3", "-shared", "-fPIC", "-DSPM_LIBRARY"]
+
+_int16_ptr = np.ctypeslib.ndpointer(dtype=np.int16, flags='C_CONTIGUOUS')
+_int64_ptr = np.ctypeslib.ndpointer(dtype=np.int64, flags='C_CONTIGUOUS')
+
+
+class _IntervalState(ctypes.Structure):
+    _fields_ = [("interval_len", ctypes.c_uint64), ("fill", ctypes.c_uint64),
+                ("cur_min", ctypes.c_int16), ("cur_max", ctypes.c_int16)]
+
+
+def _library_is_current(output, source):
+    return os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source)
+
+
+def build_library(source=SOURCE_FILE, output=LIBRARY_FILE, compiler_command=None):
+    """
+    Compiles the C reference as a shared library if it is missing or older than its source.
+    Builds are serialized across processes by a lock file and compile to a temporary file that
+    replaces the library atomically, so no process loads a half-written library.
+    """
+    if _library_is_current(output, source):
+        return output
+    with open(f"{output}.lock", 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if _library_is_current(output, source):
+            return output  # Built by another process while this one waited
+        root, ext = os.path.splitext(output)
+        tmp = f"{root}.{os.getpid()}.tmp{ext}"
+        cmd = list(compiler_command or COMPILE_COMMAND) + ["-o", tmp, source, "-lm"]
+        try:
+            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            os.replace(tmp, output)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return output
+
+
+def load_library(path=None):
+    """Loads the shared library (building it first if needed) and declares its signatures."""
+    lib = ctypes.CDLL(path or build_library())
+    u64 = ctypes.c_uint64
+    i16_out = ctypes.POINTER(ctypes.c_int16)
+
+    lib.spm_global_min_max.argtypes = [_int16_ptr, u64, i16_out, i16_out]
+    lib.spm_global_min_max.restype = ctypes.c_int
+    lib.spm_interval_init.argtypes = [ctypes.POINTER(_IntervalState), u64]
+    lib.spm_interval_init.restype = None
+    lib.spm_interval_feed.argtypes = [ctypes.POINTER(_IntervalState), _int16_ptr, u64,
+                                      _int16_ptr, _int16_ptr, u64, ctypes.POINTER(u64)]
+    lib.spm_interval_feed.restype = u64
+    lib.spm_interval_partial.argtypes = [ctypes.POINTER(_IntervalState), i16_out, i16_out]
+    lib.spm_interval_partial.restype = u64
+    lib.spm_interval_min_max.argtypes = [_int16_ptr, u64, u64, _int16_ptr, _int16_ptr]
+    lib.spm_interval_min_max.restype = u64
+    lib.spm_filter_within_sigma.argtypes = [_int16_ptr, u64, ctypes.c_double, _int64_ptr]
+    lib.spm_filter_within_sigma.restype = u64
+    return lib
+
+
+def to_int16_samples(audio_data):
+    """
+    Returns the samples as a C-contiguous int16 array. int16 input is passed through without a
+    copy; float input in [-1.0, 1.0] is scaled by 32768 and truncated like int(x * 32768), with
+    +1.0 saturating at 32767.
+    """
+    audio_data = np.asarray(audio_data)
+    if audio_data.dtype == np.int16:
+        return np.ascontiguousarray(audio_data)
+    scaled = np.multiply(audio_data, 32768, dtype=np.float32)
+    np.clip(scaled, -32768, 32767, out=scaled)
+    return scaled.astype(np.int16)
+
+
+class NativeIntervalStream:
+    """
+    Streaming interval reduction in the C library: feed int16 blocks of any size, get the
+    min/max of every interval completed so far. Intervals may span blocks.
+    """
+
+    def __init__(self, lib, samples_per_interval):
+        self.lib = lib
+        self.state = _IntervalState()
+        lib.spm_interval_init(ctypes.byref(self.state), samples_per_interval)
+        self.samples_per_interval = samples_per_interval
+
+    def feed(self, samples):
+        """Returns (mins, maxs) int16 arrays for the intervals completed by this block."""
+        samples = to_int16_samples(samples)
+        capacity = (int(self.state.fill) + samples.size) // self.samples_per_interval
+        mins = np.empty(capacity, dtype=np.int16)
+        maxs = np.empty(capacity, dtype=np.int16)
+        done = self.lib.spm_interval_feed(ctypes.byref(self.state), samples, samples.size,
+                                          mins, maxs, capacity, None)
+        return mins[:done], maxs[:done]
+
+    def partial(self):
+        """(min, max, count) of the samples of the unfinished interval."""
+        mn, mx = ctypes.c_int16(), ctypes.c_int16()
+        count = self.lib.spm_interval_partial(ctypes.byref(self.state), ctypes.byref(mn), ctypes.byref(mx))
+        return mn.value, mx.value, int(count)
+
+
+class NativeProcessor:
+    def __init__(self, library_path=None):
+        # Build (if needed) and load the C reference library
+        self.lib = load_library(library_path)
+
+    def filter_within_sigma(self, values, sigma=1.0):
+        """(index, value) pairs of the int16 values within mean +/- sigma * std."""
+        values = np.ascontiguousarray(values, dtype=np.int16)
+        indices = np.empty(values.size, dtype=np.int64)
+        kept = self.lib.spm_filter_within_sigma(values, values.size, sigma, indices)
+        return [(int(i), int(values[i])) for i in indices[:kept]]
+
+    def get_global_min_max(self, audio_data):
+        """
+        Computes global min/max amplitude in the C library.
+
+        Args:
+            audio_data: NumPy array of int16 samples (used in place) or float32 samples in [-1.0, 1.0].
+
+        Returns:
+            Tuple (min_val_int, max_val_int, total_time, kernel_time):
+                - min_val_int: Minimum amplitude scaled to 16-bit integer.
+                - max_val_int: Maximum amplitude scaled to 16-bit integer.
+                - total_time: Total execution time including the conversion to int16.
+                - kernel_time: Time spent in the C reduction.
+        """
+        if audio_data.size == 0:
+            return None, None, 0.0, 0.0
+
+        start_time = time.time()
+        samples = to_int16_samples(audio_data)
+        mn, mx = ctypes.c_int16(), ctypes.c_int16()
+        kernel_start = time.perf_counter()
+        self.lib.spm_global_min_max(samples, samples.size, ctypes.byref(mn), ctypes.byref(mx))
+        kernel_time = time.perf_counter() - kernel_start
+        total_time = time.time() - start_time
+        return mn.value, mx.value, total_time, kernel_time
+
+    def get_interval_min_max(self, audio_data, sample_rate, interval_length_seconds, sigma=1.0):
+        """
+        Computes interval-based min/max amplitudes and filters them in the C library.
+
+        Args:
+            audio_data: NumPy array of int16 samples (used in place) or float32 samples in [-1.0, 1.0].
+            sample_rate: Samples per second (e.g., 44100 Hz).
+            interval_length_seconds: Length of each interval in seconds (e.g., 1.0).
+            sigma: Width of the outlier band in standard deviations.
+
+        Returns:
+            Tuple (interval_mins, interval_maxs, filtered_mins, filtered_maxs, total_time, kernel_time),
+            as returned by OpenCLProcessor.get_interval_min_max.
+        """
+        if audio_data.size == 0:
+            return [], [], [], [], 0.0, 0.0
+
+        start_time = time.time()
+        samples_per_interval = int(sample_rate * interval_length_seconds)
+        if samples_per_interval == 0:
+            print("Error: Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+            return [], [], [], [], 0.0, 0.0
+
+        samples = to_int16_samples(audio_data)
+        num_intervals = samples.size // samples_per_interval
+        interval_mins = np.empty(num_intervals, dtype=np.int16)
+        interval_maxs = np.empty(num_intervals, dtype=np.int16)
+        kernel_start = time.perf_counter()
+        self.lib.spm_interval_min_max(samples, samples.size, samples_per_interval, interval_mins, interval_maxs)
+        filtered_mins_with_idx = self.filter_within_sigma(interval_mins, sigma)
+        filtered_maxs_with_idx = self.filter_within_sigma(interval_maxs, sigma)
+        kernel_time = time.perf_counter() - kernel_start
+
+        # Print first 10 intervals
+        for i in range(min(10, num_intervals)):
+            print(f"Interval {i}: Min = {interval_mins[i]:>6d}, Max = {interval_maxs[i]:>6d}")
+
+        # Print filtered results
+        print("\n--- Filtered Results ---")
+        for idx, val in filtered_mins_with_idx:
+            print(f"Filtered Min[{idx}] = {val:>6d}")
+        for idx, val in filtered_maxs_with_idx:
+            print(f"Filtered Max[{idx}] = {val:>6d}")
+
+        total_time = time.time() - start_time
+        filtered_mins = [val for _, val in filtered_mins_with_idx]
+        filtered_maxs = [val for _, val in filtered_maxs_with_idx]
+        return interval_mins.astype(int).tolist(), interval_maxs.astype(int).tolist(), filtered_mins, filtered_maxs, total_time, kernel_time
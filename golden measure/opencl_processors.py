@@ -1,6 +1,98 @@
+import threading
 import numpy as np
 import pyopencl as cl
 import time
+from contextlib import contextmanager
+from sequential_processors import combine_fused_statistics, print_fused_statistics, scale_to_int16
+from outlier_filters import DEFAULT_FILTER_PARAMS, FILTER_METHODS, MAD_SCALE, filter_mask, masked_pairs, \
+    histogram_percentiles, integer_bounds
+from amplitude_histogram import histogram_shift
+from backend_versions import BACKEND_VERSIONS
+
+# Part of the result cache key; bumped in backend_versions.py.
+BACKEND_VERSION = BACKEND_VERSIONS["opencl"]
+
+# Interval counts from which the outlier filter runs on the device instead of the host
+DEVICE_FILTER_MIN_VALUES = 1 << 16
+
+
+def shares_host_memory(device):
+    """True for CPU and integrated devices, whose buffers live in host memory anyway."""
+    if device.type == cl.device_type.CPU:
+        return True
+    try:
+        return bool(device.host_unified_memory)
+    except cl.Error:  # Query removed in OpenCL 3.0 drivers that dropped it
+        return False
+
+
+class DeviceBufferPool:
+    """
+    Device buffers bucketed by power-of-two size and reused across calls, so repeated jobs do not
+    allocate. With host_accessible the buffers are allocated in host-visible memory
+    (ALLOC_HOST_PTR) and results can be mapped instead of copied.
+
+    Buffers are larger than requested; kernels take their element counts as arguments.
+    """
+
+    MIN_BUCKET_BYTES = 4096
+
+    def __init__(self, ctx, host_accessible=False):
+        self.ctx = ctx
+        self.flags = cl.mem_flags.READ_WRITE | (cl.mem_flags.ALLOC_HOST_PTR if host_accessible else 0)
+        self._free = {}    # Bucket size -> idle buffers
+        self._issued = {}  # int_ptr -> buffer handed out by acquire
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.reuses = 0
+        self.held_bytes = 0       # Bytes of all pooled buffers, idle or in use
+        self.peak_held_bytes = 0
+
+    @classmethod
+    def bucket_size(cls, nbytes):
+        return max(cls.MIN_BUCKET_BYTES, 1 << (max(int(nbytes), 1) - 1).bit_length())
+
+    def acquire(self, nbytes):
+        """Buffer of at least nbytes; give it back with release once the queue is done with it."""
+        size = self.bucket_size(nbytes)
+        with self._lock:
+            idle = self._free.get(size)
+            if idle:
+                buf = idle.pop()
+                self.reuses += 1
+            else:
+                buf = cl.Buffer(self.ctx, self.flags, size)
+                self.allocations += 1
+                self.held_bytes += size
+                self.peak_held_bytes = max(self.peak_held_bytes, self.held_bytes)
+            self._issued[buf.int_ptr] = buf
+        return buf
+
+    def release(self, *buffers):
+        """Returns buffers to the pool; buffers that did not come from acquire are ignored."""
+        with self._lock:
+            for buf in buffers:
+                if self._issued.pop(buf.int_ptr, None) is not None:
+                    self._free.setdefault(buf.size, []).append(buf)
+
+    def clear(self):
+        """Frees the idle buffers."""
+        with self._lock:
+            self.held_bytes -= sum(size * len(bufs) for size, bufs in self._free.items())
+            self._free.clear()
+
+    def reset_peak(self):
+        with self._lock:
+            self.peak_held_bytes = self.held_bytes
+
+    def stats(self):
+        with self._lock:
+            idle = sum(len(bufs) for bufs in self._free.values())
+            idle_bytes = sum(size * len(bufs) for size, bufs in self._free.items())
+            return {"allocations": self.allocations, "reuses": self.reuses, "in_use": len(self._issued),
+                    "idle": idle, "idle_bytes": idle_bytes, "held_bytes": self.held_bytes,
+                    "peak_held_bytes": self.peak_held_bytes}
+
 
 class OpenCLProcessor:
     def __init__(self):
@@ -10,6 +102,54 @@ class OpenCLProcessor:
         # Load and build the OpenCL program
         with open("audio_kernels.cl", 'r') as f:
             self.program = cl.Program(self.ctx, f.read()).build()
+        self._kernels = {}
+        # On devices sharing host memory, inputs are wrapped (USE_HOST_PTR) and results mapped
+        # rather than copied; elsewhere the pool holds plain device buffers
+        self.zero_copy = shares_host_memory(self.ctx.devices[0])
+        self.pool = DeviceBufferPool(self.ctx, host_accessible=self.zero_copy)
+        # Largest input handed to one kernel launch; longer inputs are processed in chunks.
+        # memory_budget lowers it to fit a max_memory setting.
+        self.max_chunk_bytes = self.ctx.devices[0].max_mem_alloc_size
+
+    @property
+    def max_chunk_samples(self):
+        return max(1, self.max_chunk_bytes // np.float32().nbytes)
+
+    def _kernel(self, name):
+        """Kernel object reused across calls (each program attribute lookup creates a new one)."""
+        if name not in self._kernels:
+            self._kernels[name] = cl.Kernel(self.program, name)
+        return self._kernels[name]
+
+    def _input_buffer(self, array):
+        """Read-only device view of a contiguous array: the array itself when zero_copy, else a pooled copy."""
+        if self.zero_copy:
+            return cl.Buffer(self.ctx, cl.mem_flags.READ_ONLY | cl.mem_flags.USE_HOST_PTR, hostbuf=array)
+        buf = self.pool.acquire(array.nbytes)
+        cl.enqueue_copy(self.queue, buf, array, is_blocking=False)
+        return buf
+
+    @contextmanager
+    def _host_views(self, *specs):
+        """
+        Results as host arrays, one per (buffer, count, dtype), after all queued work: mapped when
+        zero_copy (valid inside the with block only), else copied. One wait covers all of them.
+        """
+        if self.zero_copy:
+            maps = [cl.enqueue_map_buffer(self.queue, buf, cl.map_flags.READ, 0, (count,), dtype, is_blocking=False)
+                    for buf, count, dtype in specs]
+            cl.wait_for_events([event for _, event in maps])
+            try:
+                yield [view for view, _ in maps]
+            finally:
+                for view, _ in maps:
+                    view.base.release(self.queue)
+        else:
+            hosts = [np.empty(count, dtype=dtype) for _, count, dtype in specs]
+            for host, (buf, _, _) in zip(hosts, specs):
+                cl.enqueue_copy(self.queue, host, buf, is_blocking=False)
+            self.queue.finish()
+            yield hosts
 
     def get_global_min_max(self, audio_data):
         """
@@ -30,51 +170,52 @@ class OpenCLProcessor:
 
         start_time = time.time()
         
-        # Convert audio_data to float32 and ensure contiguous array
-        audio_data = np.array(audio_data, dtype=np.float32, order='C')
+        # Convert audio_data to float32 and ensure contiguous array (no copy if it already is)
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
         n_samples = audio_data.size
 
         # Define work-group size (tune based on device, 256 is a common choice)
         local_size = 256
-        global_size = max(local_size, (n_samples + local_size - 1) // local_size * local_size)
-        num_groups = global_size // local_size
+        min_val, max_val, kernel_time = np.inf, -np.inf, 0.0
+        # Inputs beyond one device allocation (or the memory budget) are reduced chunk by chunk
+        chunk_samples = max(local_size, self.max_chunk_samples // local_size * local_size)
+        for start in range(0, n_samples, chunk_samples):
+            chunk = audio_data[start:start + chunk_samples]
+            global_size = (chunk.size + local_size - 1) // local_size * local_size
+            num_groups = global_size // local_size
 
-        # Allocate device buffers
-        mf = cl.mem_flags
-        audio_buf = cl.Buffer(self.ctx, mf.READ_ONLY | mf.COPY_HOST_PTR, hostbuf=audio_data)
-        group_mins_buf = cl.Buffer(self.ctx, mf.WRITE_ONLY, num_groups * np.float32().nbytes)
-        group_maxs_buf = cl.Buffer(self.ctx, mf.WRITE_ONLY, num_groups * np.float32().nbytes)
-        local_mins = cl.LocalMemory(local_size * np.float32().nbytes)
-        local_maxs = cl.LocalMemory(local_size * np.float32().nbytes)
+            # Device buffers: the samples in place (or a pooled copy), pooled result buffers
+            audio_buf = self._input_buffer(chunk)
+            group_mins_buf = self.pool.acquire(num_groups * np.float32().nbytes)
+            group_maxs_buf = self.pool.acquire(num_groups * np.float32().nbytes)
+            local_mins = cl.LocalMemory(local_size * np.float32().nbytes)
+            local_maxs = cl.LocalMemory(local_size * np.float32().nbytes)
 
-        # Execute the kernel
-        kernel = self.program.min_max_global_kernel
-        kernel.set_args(audio_buf, group_mins_buf, group_maxs_buf, local_mins, local_maxs, np.uint32(n_samples))
-        event = cl.enqueue_nd_range_kernel(self.queue, kernel, (global_size,), (local_size,), wait_for=None)
-        
-        # Wait for kernel completion and get execution time
-        event.wait()
-        kernel_time = (event.profile.end - event.profile.start) * 1e-9  # Convert nanoseconds to seconds
+            # Execute the kernel
+            kernel = self._kernel("min_max_global_kernel")
+            kernel.set_args(audio_buf, group_mins_buf, group_maxs_buf, local_mins, local_maxs, np.uint32(chunk.size))
+            event = cl.enqueue_nd_range_kernel(self.queue, kernel, (global_size,), (local_size,), wait_for=None)
 
-        # Read results back to host
-        group_mins = np.empty(num_groups, dtype=np.float32)
-        group_maxs = np.empty(num_groups, dtype=np.float32)
-        cl.enqueue_copy(self.queue, group_mins, group_mins_buf)
-        cl.enqueue_copy(self.queue, group_maxs, group_maxs_buf)
-        self.queue.finish()
+            # Wait for kernel completion and get execution time
+            event.wait()
+            kernel_time += (event.profile.end - event.profile.start) * 1e-9  # Convert nanoseconds to seconds
 
-        # Perform final reduction on host
-        min_val = np.min(group_mins)
-        max_val = np.max(group_maxs)
+            # Perform final reduction on host, on the mapped (or copied) group results
+            with self._host_views((group_mins_buf, num_groups, np.float32),
+                                  (group_maxs_buf, num_groups, np.float32)) as (group_mins, group_maxs):
+                min_val = min(min_val, np.min(group_mins))
+                max_val = max(max_val, np.max(group_maxs))
+            self.queue.finish()
+            self.pool.release(audio_buf, group_mins_buf, group_maxs_buf)
 
         # Scale to 16-bit integer range
-        min_val_int = int(min_val * 32768)
-        max_val_int = int(max_val * 32768)
+        min_val_int = int(scale_to_int16(min_val))
+        max_val_int = int(scale_to_int16(max_val))
 
         total_time = time.time() - start_time
         return min_val_int, max_val_int, total_time, kernel_time
 
-    def get_interval_min_max(self, audio_data, sample_rate, interval_length_seconds):
+    def get_interval_min_max(self, audio_data, sample_rate, interval_length_seconds, filter_method="sigma", filter_params=None):
         """
         Computes interval-based min/max amplitudes and filters them using OpenCL kernel.
         
@@ -82,6 +223,8 @@ class OpenCLProcessor:
             audio_data: NumPy array of float32 audio samples in [-1.0, 1.0].
             sample_rate: Samples per second (e.g., 44100 Hz).
             interval_length_seconds: Length of each interval in seconds (e.g., 1.0).
+            filter_method: Outlier filter, one of outlier_filters.FILTER_METHODS.
+            filter_params: Parameters of the filter (e.g. {"k": 2.0}); defaults per method.
         
         Returns:
             Tuple (interval_mins, interval_maxs, filtered_mins, filtered_maxs, total_time, kernel_time):
@@ -97,69 +240,54 @@ class OpenCLProcessor:
 
         start_time = time.time()
 
-        # Convert audio_data to float32 and ensure contiguous array
-        audio_data = np.array(audio_data, dtype=np.float32, order='C')
+        # Convert audio_data to float32 and ensure contiguous array (no copy if it already is)
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
         samples_per_interval = int(sample_rate * interval_length_seconds)
         if samples_per_interval == 0:
             print("Error: Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
             return [], [], [], [], 0.0, 0.0
 
-        num_intervals = (audio_data.size + samples_per_interval - 1) // samples_per_interval  # Handle partial last interval
+        # Complete intervals only, like the sequential and C backends: a partial last interval is dropped.
+        # Inputs beyond one device allocation (or the memory budget) are processed in chunks of whole intervals.
+        num_complete = audio_data.size // samples_per_interval
+        chunk_samples = max(1, self.max_chunk_samples // samples_per_interval) * samples_per_interval
+        mins_parts, maxs_parts, kernel_time = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], 0.0
+        for start in range(0, num_complete * samples_per_interval, chunk_samples):
+            chunk = audio_data[start:min(start + chunk_samples, num_complete * samples_per_interval)]
+            num_intervals = chunk.size // samples_per_interval
 
-        # Allocate device buffers
-        mf = cl.mem_flags
-        audio_buf = cl.Buffer(self.ctx, mf.READ_ONLY | mf.COPY_HOST_PTR, hostbuf=audio_data)
-        interval_mins_buf = cl.Buffer(self.ctx, mf.WRITE_ONLY, num_intervals * np.float32().nbytes)
-        interval_maxs_buf = cl.Buffer(self.ctx, mf.WRITE_ONLY, num_intervals * np.float32().nbytes)
+            # Device buffers: the samples in place (or a pooled copy), pooled result buffers
+            audio_buf = self._input_buffer(chunk)
+            interval_mins_buf = self.pool.acquire(num_intervals * np.float32().nbytes)
+            interval_maxs_buf = self.pool.acquire(num_intervals * np.float32().nbytes)
 
-        # Execute the kernel
-        kernel = self.program.min_max_interval_kernel
-        kernel.set_args(audio_buf, interval_mins_buf, interval_maxs_buf, np.uint32(samples_per_interval), np.uint32(num_intervals))
-        event = cl.enqueue_nd_range_kernel(self.queue, kernel, (num_intervals,), None, wait_for=None)
-        
-        # Wait for kernel completion and get execution time
-        event.wait()
-        kernel_time = (event.profile.end - event.profile.start) * 1e-9  # Convert nanoseconds to seconds
+            # Execute the kernel
+            kernel = self._kernel("min_max_interval_kernel")
+            kernel.set_args(audio_buf, interval_mins_buf, interval_maxs_buf, np.uint32(samples_per_interval), np.uint32(num_intervals))
+            event = cl.enqueue_nd_range_kernel(self.queue, kernel, (num_intervals,), None, wait_for=None)
 
-        # Read results back to host
-        interval_mins = np.empty(num_intervals, dtype=np.float32)
-        interval_maxs = np.empty(num_intervals, dtype=np.float32)
-        cl.enqueue_copy(self.queue, interval_mins, interval_mins_buf)
-        cl.enqueue_copy(self.queue, interval_maxs, interval_maxs_buf)
-        self.queue.finish()
+            # Wait for kernel completion and get execution time
+            event.wait()
+            kernel_time += (event.profile.end - event.profile.start) * 1e-9  # Convert nanoseconds to seconds
 
-        # Scale to 16-bit integer range
-        interval_mins_int = (interval_mins * 32768).astype(np.int32)
-        interval_maxs_int = (interval_maxs * 32768).astype(np.int32)
+            # Scale to 16-bit integer range, straight from the mapped (or copied) results
+            with self._host_views((interval_mins_buf, num_intervals, np.float32),
+                                  (interval_maxs_buf, num_intervals, np.float32)) as (interval_mins, interval_maxs):
+                mins_parts.append(scale_to_int16(interval_mins))
+                maxs_parts.append(scale_to_int16(interval_maxs))
+            self.queue.finish()
+            self.pool.release(audio_buf, interval_mins_buf, interval_maxs_buf)
+        interval_mins_int = np.concatenate(mins_parts)
+        interval_maxs_int = np.concatenate(maxs_parts)
 
         # Print first 10 intervals
         for i in range(min(10, len(interval_mins_int))):
             print(f"Interval {i}: Min = {interval_mins_int[i]:>6d}, Max = {interval_maxs_int[i]:>6d}")
 
         # Filtering with original interval indices
-        filtered_mins_with_idx = []
-        if len(interval_mins_int) > 1:
-            mean_mins = np.mean(interval_mins_int)
-            std_mins = np.std(interval_mins_int)
-            lower_bound_mins = mean_mins - std_mins
-            upper_bound_mins = mean_mins + std_mins
-            for idx, m in enumerate(interval_mins_int):
-                if lower_bound_mins <= m <= upper_bound_mins:
-                    filtered_mins_with_idx.append((idx, m))
-        elif len(interval_mins_int) == 1:
-            filtered_mins_with_idx = [(0, interval_mins_int[0])]
-
-        filtered_maxs_with_idx = []
-        if len(interval_maxs_int) > 1:
-            mean_maxs = np.mean(interval_maxs_int)
-            std_maxs = np.std(interval_maxs_int)
-            lower_bound_maxs = mean_maxs - std_maxs
-            upper_bound_maxs = mean_maxs + std_maxs
-            for idx, m in enumerate(interval_maxs_int):
-                if lower_bound_maxs <= m <= upper_bound_maxs:
-                    filtered_maxs_with_idx.append((idx, m))
-        elif len(interval_maxs_int) == 1:
-            filtered_maxs_with_idx = [(0, interval_maxs_int[0])]
+        filter_params = filter_params or {}
+        filtered_mins_with_idx = masked_pairs(interval_mins_int, self.filter_mask(interval_mins_int, filter_method, **filter_params))
+        filtered_maxs_with_idx = masked_pairs(interval_maxs_int, self.filter_mask(interval_maxs_int, filter_method, **filter_params))
 
         # Print filtered results
         print("\n--- Filtered Results ---")
@@ -171,4 +299,215 @@ class OpenCLProcessor:
         total_time = time.time() - start_time
         filtered_mins = [val for _, val in filtered_mins_with_idx]
         filtered_maxs = [val for _, val in filtered_maxs_with_idx]
-        return list(interval_mins_int), list(interval_maxs_int), filtered_mins, filtered_maxs, total_time, kernel_time
\ No newline at end of file
+        return list(interval_mins_int), list(interval_maxs_int), filtered_mins, filtered_maxs, total_time, kernel_time
+
+    def get_fused_statistics(self, audio_data, sample_rate, interval_length_seconds):
+        """
+        Computes min/max, RMS, absolute peak, DC offset, clipped-sample count and the sample index
+        of each extreme per interval and globally in a single kernel pass over the samples.
+
+        Args:
+            audio_data: NumPy array of float32 audio samples in [-1.0, 1.0].
+            sample_rate: Samples per second (e.g., 44100 Hz).
+            interval_length_seconds: Length of each interval in seconds (e.g., 1.0).
+
+        Returns:
+            Tuple (stats, total_time, kernel_time): stats as returned by
+            sequential_processors.combine_fused_statistics.
+        """
+        if audio_data.size == 0:
+            return None, 0.0, 0.0
+
+        start_time = time.time()
+
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+        n_samples = audio_data.size
+        samples_per_interval = int(sample_rate * interval_length_seconds)
+        if samples_per_interval == 0:
+            print("Error: Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+            return None, 0.0, 0.0
+
+        partials, kernel_time = self.fused_partials(audio_data, samples_per_interval)
+        num_intervals = n_samples // samples_per_interval
+        stats = combine_fused_statistics(partials, num_intervals)
+        print_fused_statistics(stats)
+
+        total_time = time.time() - start_time
+        return stats, total_time, kernel_time
+
+    def filter_mask(self, values, method="sigma", **params):
+        """
+        Boolean mask of the interval values kept by an outlier filter (see outlier_filters).
+        Large inputs are filtered on the device: exact integer moments for the sigma band and
+        histogram selection for medians and percentiles, so nothing is sorted.
+
+        Args:
+            values: Integer interval values in [-32768, 32768] (16-bit scaled mins or maxs).
+            method: One of outlier_filters.FILTER_METHODS.
+            **params: Filter parameters; defaults from outlier_filters.DEFAULT_FILTER_PARAMS.
+
+        Returns:
+            np.ndarray of bool, one per value.
+        """
+        values = np.asarray(values)
+        if values.size < DEVICE_FILTER_MIN_VALUES:
+            return filter_mask(values, method, **params)
+        if method not in FILTER_METHODS:
+            raise ValueError(f"Unknown filter method '{method}'; expected one of {FILTER_METHODS}.")
+        params = {**DEFAULT_FILTER_PARAMS[method], **params}
+        values = np.ascontiguousarray(values, dtype=np.int32)
+        if values.min() < -32768 or values.max() > 32768:
+            raise ValueError("Device filtering requires values in [-32768, 32768].")
+
+        n = np.uint32(values.size)
+        values_buf = self._input_buffer(values)
+
+        if method == "sigma":
+            local_size = 256
+            num_groups = min(256, (values.size + local_size - 1) // local_size)
+            sums_buf = self.pool.acquire(num_groups * 8)
+            sumsqs_buf = self.pool.acquire(num_groups * 8)
+            self._kernel("filter_moments_kernel")(self.queue, (num_groups * local_size,), (local_size,),
+                                               values_buf, sums_buf, sumsqs_buf,
+                                               cl.LocalMemory(local_size * 8), cl.LocalMemory(local_size * 8), n)
+            with self._host_views((sums_buf, num_groups, np.int64),
+                                  (sumsqs_buf, num_groups, np.int64)) as (sums, sumsqs):
+                total, total_sq = int(sums.sum()), int(sumsqs.sum())
+            self.pool.release(sums_buf, sumsqs_buf)
+            # Exact integer moments: population variance = (n * sum(v^2) - sum(v)^2) / n^2
+            count = values.size
+            mean = total / count
+            std = np.sqrt((count * total_sq - total * total) / (count * count))
+            lower, upper = mean - params["k"] * std, mean + params["k"] * std
+        else:
+            center = self._histogram_percentiles(values_buf, n, [50.0] if method == "mad" else
+                                                 [params["lower"], params["upper"]])
+            if method == "mad":
+                median = float(center[0])
+                mad = float(self._histogram_percentiles(values_buf, n, [50.0], center2=int(round(2 * median)))[0])
+                lower = median - params["k"] * MAD_SCALE * mad
+                upper = median + params["k"] * MAD_SCALE * mad
+            else:
+                lower, upper = center
+
+        lower_i, upper_i = np.clip(integer_bounds(lower, upper), -65537, 65537)
+        mask_buf = self.pool.acquire(values.size)
+        self._kernel("band_mask_kernel")(self.queue, (values.size,), None, values_buf, mask_buf,
+                                      np.int32(lower_i), np.int32(upper_i), n)
+        with self._host_views((mask_buf, values.size, np.uint8)) as (mapped,):
+            mask = mapped.astype(bool)
+        self.queue.finish()
+        self.pool.release(values_buf, mask_buf)
+        return mask
+
+    def _histogram_percentiles(self, values_buf, n, qs, center2=None):
+        """Percentiles of the values (or of |v - center2 / 2| when center2 is given) via a device histogram."""
+        num_bins = 131073 if center2 is not None else 65537
+        bins_buf = self.pool.acquire(num_bins * 4)
+        cl.enqueue_fill_buffer(self.queue, bins_buf, np.uint32(0), 0, num_bins * 4)
+        self._kernel("filter_histogram_kernel")(self.queue, (int(n),), None, values_buf, bins_buf,
+                                             np.int32(center2 or 0), np.uint32(center2 is not None), n)
+        with self._host_views((bins_buf, num_bins, np.uint32)) as (bins,):
+            if center2 is not None:
+                result = histogram_percentiles(bins, qs, offset=0, scale=2)
+            else:
+                result = histogram_percentiles(bins, qs, offset=32768)
+        self.pool.release(bins_buf)
+        return result
+
+    def fused_partials(self, audio_data, samples_per_interval, num_bins=None):
+        """
+        Runs fused_stats_interval_kernel and returns the raw per-group partial statistics
+        (one entry per complete interval plus one for a partial tail), as
+        sequential_processors.sequential_fused_partials does, including the "hist" and
+        "global_hist" amplitude histograms when num_bins is given. Inputs beyond
+        max_chunk_samples are processed in chunks of whole intervals.
+
+        Returns:
+            Tuple (partials, kernel_time).
+        """
+        audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+        n_samples = audio_data.size
+        rows_per_chunk = max(1, self.max_chunk_samples // samples_per_interval)
+        if num_bins is not None:
+            # The histogram rows of a chunk are one device buffer as well
+            rows_per_chunk = max(1, min(rows_per_chunk, self.max_chunk_bytes // (num_bins * 4)))
+        chunk_samples = rows_per_chunk * samples_per_interval
+        parts, kernel_time = [], 0.0
+        global_hist = None
+        for start in range(0, n_samples, chunk_samples):
+            part, part_time = self._fused_partials_chunk(audio_data[start:start + chunk_samples], samples_per_interval,
+                                                         num_bins)
+            # Extreme indices are relative to the chunk
+            part["min_index"] += start
+            part["max_index"] += start
+            if num_bins is not None:
+                chunk_hist = part.pop("global_hist")
+                global_hist = chunk_hist if global_hist is None else global_hist + chunk_hist
+            parts.append(part)
+            kernel_time += part_time
+        partials = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+        if global_hist is not None:
+            partials["global_hist"] = global_hist
+
+        num_groups = partials["min"].size
+        counts = np.full(num_groups, samples_per_interval, dtype=np.int64)
+        counts[-1] = n_samples - (num_groups - 1) * samples_per_interval
+        partials["count"] = counts
+        return partials, kernel_time
+
+    def _fused_partials_chunk(self, audio_data, samples_per_interval, num_bins=None):
+        """One fused_stats_interval_kernel launch over a contiguous float32 array."""
+        n_samples = audio_data.size
+        num_groups = (n_samples + samples_per_interval - 1) // samples_per_interval  # Last group takes the partial tail
+        local_size = 256
+
+        # Device buffers: the samples in place (or a pooled copy), pooled result buffers
+        audio_buf = self._input_buffer(audio_data)
+        output_types = {
+            "min": np.float32,
+            "max": np.float32,
+            "min_index": np.uint32,
+            "max_index": np.uint32,
+            "sum": np.float32,
+            "sumsq": np.float32,
+            "clips": np.uint32,
+        }
+        out_bufs = {key: self.pool.acquire(num_groups * 4) for key in output_types}
+        local_bufs = [cl.LocalMemory(local_size * 4) for _ in output_types]
+
+        # Histogram rows and the global histogram (zeroed here; the kernel merges into it)
+        hist_args = [None, None, cl.LocalMemory(4), np.uint32(0), np.uint32(0), np.uint32(0)]
+        hist_bufs = []
+        if num_bins is not None:
+            hist_bufs = [self.pool.acquire(num_groups * num_bins * 4), self.pool.acquire(num_bins * 4)]
+            fill = cl.enqueue_fill_buffer(self.queue, hist_bufs[1], np.uint32(0), 0, num_bins * 4)
+            local_needed = (num_bins + len(local_bufs) * local_size) * 4
+            use_local = local_needed <= self.ctx.devices[0].local_mem_size
+            hist_args = [hist_bufs[0], hist_bufs[1], cl.LocalMemory(num_bins * 4 if use_local else 4),
+                         np.uint32(num_bins), np.uint32(histogram_shift(num_bins)), np.uint32(use_local)]
+
+        # Execute the kernel
+        kernel = self._kernel("fused_stats_interval_kernel")
+        kernel.set_args(audio_buf, *out_bufs.values(), *local_bufs,
+                        np.uint32(samples_per_interval), np.uint32(n_samples), *hist_args)
+        event = cl.enqueue_nd_range_kernel(self.queue, kernel, (num_groups * local_size,), (local_size,),
+                                           wait_for=[fill] if hist_bufs else None)
+
+        # Wait for kernel completion and get execution time
+        event.wait()
+        kernel_time = (event.profile.end - event.profile.start) * 1e-9  # Convert nanoseconds to seconds
+
+        # Read results back to host, converting each straight from the mapped (or copied) buffer
+        widened = {"sum": np.float64, "sumsq": np.float64, "min_index": np.int64, "max_index": np.int64}
+        specs = [(out_bufs[key], num_groups, dtype) for key, dtype in output_types.items()]
+        if hist_bufs:
+            specs += [(hist_bufs[0], num_groups * num_bins, np.uint32), (hist_bufs[1], num_bins, np.uint32)]
+        with self._host_views(*specs) as views:
+            partials = {key: values.astype(widened.get(key, values.dtype)) for key, values in zip(output_types, views)}
+            if hist_bufs:
+                partials["hist"] = views[-2].reshape(num_groups, num_bins).astype(np.int64)
+                partials["global_hist"] = views[-1].astype(np.int64)
+        self.queue.finish()
+        self.pool.release(audio_buf, *out_bufs.values(), *hist_bufs)
+        return partials, kernel_time
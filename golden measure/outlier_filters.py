@@ -0,0 +1,114 @@
+# outlier_filters.py
+import numpy as np
+
+# Outlier filters for interval min/max values. Every filter computes a band [lower, upper] and
+# returns a boolean mask of the values inside it (bounds inclusive), so millions of intervals
+# filter with a few vectorized passes. Medians and percentiles use linear-time selection
+# (np.partition / introselect) instead of sorting.
+#
+#   sigma       mean +/- k * population std (k=1.0 is the original filter)
+#   mad         median +/- k * 1.4826 * median absolute deviation; robust to the outliers themselves
+#   percentile  [lower, upper] percentiles (linear interpolation, as np.percentile)
+
+FILTER_METHODS = ("sigma", "mad", "percentile")
+DEFAULT_FILTER_PARAMS = {
+    "sigma": {"k": 1.0},
+    "mad": {"k": 3.0},
+    "percentile": {"lower": 5.0, "upper": 95.0},
+}
+MAD_SCALE = 1.4826  # Makes the MAD a consistent estimator of the std for normal data
+
+
+def select_percentiles(values, qs):
+    """
+    Percentiles of values by linear-time selection; same interpolation as np.percentile.
+
+    Args:
+        values: 1D array.
+        qs: Percentiles in [0, 100].
+
+    Returns:
+        np.ndarray of float64, one per percentile.
+    """
+    values = np.asarray(values)
+    positions = np.asarray(qs, dtype=np.float64) / 100.0 * (values.size - 1)
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, values.size - 1)
+    ranks = np.unique(np.concatenate([below, above]))
+    part = np.partition(values, ranks)
+    frac = positions - below
+    low = part[below].astype(np.float64)
+    return low + frac * (part[above] - low)
+
+
+def select_median(values):
+    return float(select_percentiles(values, [50.0])[0])
+
+
+def sigma_band(values, k=1.0):
+    values = np.asarray(values)
+    mean = np.mean(values)
+    std = np.std(values)
+    return mean - k * std, mean + k * std
+
+
+def mad_band(values, k=3.0):
+    median = select_median(values)
+    mad = select_median(np.abs(np.asarray(values, dtype=np.float64) - median))
+    return median - k * MAD_SCALE * mad, median + k * MAD_SCALE * mad
+
+
+def percentile_band(values, lower=5.0, upper=95.0):
+    low, high = select_percentiles(values, [lower, upper])
+    return low, high
+
+
+_BANDS = {"sigma": sigma_band, "mad": mad_band, "percentile": percentile_band}
+
+
+def filter_band(values, method="sigma", **params):
+    """(lower, upper) bounds of the given filter method; params override DEFAULT_FILTER_PARAMS."""
+    if method not in _BANDS:
+        raise ValueError(f"Unknown filter method '{method}'; expected one of {FILTER_METHODS}.")
+    return _BANDS[method](values, **{**DEFAULT_FILTER_PARAMS[method], **params})
+
+
+def filter_mask(values, method="sigma", **params):
+    """
+    Boolean mask of the values kept by the filter. A single value is always kept and an empty
+    input gives an empty mask, as in the original processors.
+    """
+    values = np.asarray(values)
+    if values.size <= 1:
+        return np.ones(values.size, dtype=bool)
+    lower, upper = filter_band(values, method, **params)
+    return (values >= lower) & (values <= upper)
+
+
+def masked_pairs(values, mask):
+    """(index, value) pairs of the kept values, in interval order."""
+    idx = np.flatnonzero(mask)
+    return list(zip(idx.tolist(), np.asarray(values)[idx].tolist()))
+
+
+# --- Histogram selection (used by the OpenCL filter for integer values) ---
+
+def histogram_percentiles(counts, qs, offset=0, scale=1):
+    """
+    Percentiles from a histogram of integer values where bin b holds the value (b - offset) / scale.
+    Same interpolation as select_percentiles over the underlying values.
+    """
+    cumulative = np.cumsum(counts, dtype=np.int64)
+    n = int(cumulative[-1])
+    positions = np.asarray(qs, dtype=np.float64) / 100.0 * (n - 1)
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, n - 1)
+    # The value at rank r is the first bin whose cumulative count exceeds r
+    low = (np.searchsorted(cumulative, below, side='right') - offset) / scale
+    high = (np.searchsorted(cumulative, above, side='right') - offset) / scale
+    return low + (positions - below) * (high - low)
+
+
+def integer_bounds(lower, upper):
+    """Tightest integer bounds equivalent to lower <= v <= upper for integer v."""
+    return int(np.ceil(lower)), int(np.floor(upper))
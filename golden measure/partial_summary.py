@@ -0,0 +1,287 @@
+# partial_summary.py
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import reduce
+from multiprocessing import get_context, shared_memory
+import numpy as np
+
+from outlier_filters import filter_mask, masked_pairs
+from sequential_processors import scale_to_int16
+
+SUMMARY_FORMAT_VERSION = 1
+DEFAULT_SHARD_SECONDS = 60.0
+
+
+class PartialSummary:
+    """
+    Mergeable summary of any set of samples of one recording, keyed by global interval index.
+
+    Intervals are aligned to sample 0 of the recording, so a shard starting mid-interval simply
+    contributes a partial interval (count < samples_per_interval) that the neighbouring shard
+    completes when the summaries are merged. Per covered interval it keeps the min, max, count,
+    sum and sum of squares of the samples (float samples in [-1.0, 1.0]); intervals without
+    samples hold the merge identity (+inf, -inf, 0, 0, 0). Merging is associative and
+    commutative, so shards can be reduced anywhere and combined in any order.
+    """
+
+    def __init__(self, samples_per_interval, first_interval=0, mins=None, maxs=None, counts=None,
+                 sums=None, sumsqs=None):
+        self.samples_per_interval = int(samples_per_interval)
+        self.first_interval = int(first_interval)
+        self.mins = np.asarray(mins if mins is not None else [], dtype=np.float32)
+        self.maxs = np.asarray(maxs if maxs is not None else [], dtype=np.float32)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=np.int64)
+        self.sums = np.asarray(sums if sums is not None else [], dtype=np.float64)
+        self.sumsqs = np.asarray(sumsqs if sumsqs is not None else [], dtype=np.float64)
+
+    @property
+    def num_samples(self):
+        return int(self.counts.sum())
+
+    @property
+    def stop_interval(self):
+        return self.first_interval + self.counts.size
+
+    @classmethod
+    def identity(cls, samples_per_interval, first_interval, num_intervals):
+        """Summary of no samples over the given interval range."""
+        return cls(samples_per_interval, first_interval,
+                   np.full(num_intervals, np.inf, dtype=np.float32),
+                   np.full(num_intervals, -np.inf, dtype=np.float32),
+                   np.zeros(num_intervals, dtype=np.int64),
+                   np.zeros(num_intervals), np.zeros(num_intervals))
+
+    @classmethod
+    def from_samples(cls, audio_data, start_sample, samples_per_interval, backend=None):
+        """
+        Reduces one shard: the samples audio_data[0:n] are samples start_sample .. start_sample+n-1
+        of the recording.
+
+        Args:
+            audio_data: float32 samples in [-1.0, 1.0].
+            start_sample (int): Global index of the first sample of the shard.
+            samples_per_interval (int): Interval length in samples.
+            backend: None/"sequential" for NumPy, or an OpenCLProcessor; the interval-aligned part
+                of the shard is reduced with the backend's fused statistics pass.
+        """
+        audio_data = np.asarray(audio_data, dtype=np.float32)
+        spi = int(samples_per_interval)
+        first = start_sample // spi
+        summary = cls.identity(spi, first, 0)
+        if audio_data.size == 0:
+            return summary
+
+        # Head: samples before the first interval boundary inside the shard
+        head_len = min((-start_sample) % spi, audio_data.size)
+        parts = []
+        if head_len:
+            head = audio_data[:head_len]
+            parts.append(cls(spi, first, [head.min()], [head.max()], [head_len],
+                             [head.sum(dtype=np.float64)], [np.dot(head.astype(np.float64), head)]))
+        body = audio_data[head_len:]
+        if body.size:
+            if backend is None or backend == "sequential":
+                from sequential_processors import sequential_fused_partials
+                partials, _ = sequential_fused_partials(body, spi)
+            else:
+                partials, _ = backend.fused_partials(body, spi)
+            body_first = (start_sample + head_len) // spi
+            parts.append(cls(spi, body_first, partials["min"], partials["max"], partials["count"],
+                             partials["sum"], partials["sumsq"]))
+        return reduce(PartialSummary.merge, parts, summary)
+
+    def merge(self, other):
+        """Combines two summaries of disjoint samples of the same recording into a new summary."""
+        if other.samples_per_interval != self.samples_per_interval:
+            raise ValueError("Cannot merge summaries with different interval lengths.")
+        if self.counts.size == 0:
+            return other.copy()
+        if other.counts.size == 0:
+            return self.copy()
+        return PartialSummary.merge_all([self, other])
+
+    @staticmethod
+    def merge_all(parts):
+        """Merges any number of summaries in one allocation (pairwise merging copies the result each time)."""
+        parts = [part for part in parts if part.counts.size]
+        if not parts:
+            raise ValueError("merge_all needs at least one non-empty summary.")
+        spi = parts[0].samples_per_interval
+        if any(part.samples_per_interval != spi for part in parts):
+            raise ValueError("Cannot merge summaries with different interval lengths.")
+        first = min(part.first_interval for part in parts)
+        stop = max(part.stop_interval for part in parts)
+        merged = PartialSummary.identity(spi, first, stop - first)
+        for part in parts:
+            sl = slice(part.first_interval - first, part.stop_interval - first)
+            np.minimum(merged.mins[sl], part.mins, out=merged.mins[sl])
+            np.maximum(merged.maxs[sl], part.maxs, out=merged.maxs[sl])
+            merged.counts[sl] += part.counts
+            merged.sums[sl] += part.sums
+            merged.sumsqs[sl] += part.sumsqs
+        if np.any(merged.counts > spi):
+            raise ValueError("Merged summaries overlap: an interval holds more samples than its length.")
+        return merged
+
+    def copy(self):
+        return PartialSummary(self.samples_per_interval, self.first_interval, self.mins.copy(), self.maxs.copy(),
+                              self.counts.copy(), self.sums.copy(), self.sumsqs.copy())
+
+    # --- serialization ---
+
+    def to_bytes(self):
+        """Compact binary form (.npz container: per interval 32 bytes plus a small header)."""
+        buf = io.BytesIO()
+        header = {"version": SUMMARY_FORMAT_VERSION, "samples_per_interval": self.samples_per_interval,
+                  "first_interval": self.first_interval}
+        np.savez(buf, header=np.frombuffer(json.dumps(header).encode(), dtype=np.uint8),
+                 mins=self.mins, maxs=self.maxs, counts=self.counts, sums=self.sums, sumsqs=self.sumsqs)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        with np.load(io.BytesIO(payload)) as data:
+            header = json.loads(data["header"].tobytes().decode())
+            if header["version"] != SUMMARY_FORMAT_VERSION:
+                raise ValueError(f"Unsupported summary format version {header['version']}.")
+            return cls(header["samples_per_interval"], header["first_interval"], data["mins"], data["maxs"],
+                       data["counts"], data["sums"], data["sumsqs"])
+
+    # --- final results ---
+
+    def finalize(self, filter_method="sigma", filter_params=None):
+        """
+        Final results of a summary covering a recording from sample 0, in the form of the
+        single-array processors: complete intervals only, 16-bit scaled min/max, filtered values.
+
+        Returns:
+            dict: global_min, global_max, interval_mins, interval_maxs, filtered_mins, filtered_maxs,
+                  interval_rms, interval_dc_offsets and num_samples.
+        """
+        if self.counts.size and self.first_interval != 0:
+            raise ValueError("Summary does not start at the first interval of the recording.")
+        spi = self.samples_per_interval
+        complete = self.counts == spi
+        # Complete intervals of a single-array run are the leading run of full intervals
+        num_complete = int(np.argmin(complete)) if not complete.all() else complete.size
+        if np.any(self.counts[num_complete + 1:]):
+            raise ValueError("Summary has gaps: samples are missing before the end of the recording.")
+        mins = scale_to_int16(self.mins[:num_complete])
+        maxs = scale_to_int16(self.maxs[:num_complete])
+        filter_params = filter_params or {}
+        covered = self.counts > 0
+        results = {
+            "num_samples": self.num_samples,
+            "global_min": int(scale_to_int16(self.mins[covered].min())) if covered.any() else None,
+            "global_max": int(scale_to_int16(self.maxs[covered].max())) if covered.any() else None,
+            "interval_mins": mins.tolist(),
+            "interval_maxs": maxs.tolist(),
+            "filtered_mins": [v for _, v in masked_pairs(mins, filter_mask(mins, filter_method, **filter_params))],
+            "filtered_maxs": [v for _, v in masked_pairs(maxs, filter_mask(maxs, filter_method, **filter_params))],
+            "interval_rms": (np.sqrt(self.sumsqs[:num_complete] / spi) * 32768).tolist(),
+            "interval_dc_offsets": (self.sums[:num_complete] / spi * 32768).tolist(),
+        }
+        return results
+
+
+# --- local multi-process stand-in for distributed analysis ---
+
+_worker_shm = None
+_worker_samples = None
+_worker_processor = None
+
+
+def _attach_worker(shm_name, n_samples):
+    global _worker_shm, _worker_samples
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_samples = np.ndarray((n_samples,), dtype=np.float32, buffer=_worker_shm.buf)
+
+
+def _summarize_shard(start, stop, samples_per_interval, backend):
+    """Worker: reduces samples[start:stop] of the shared recording and returns the serialized summary."""
+    global _worker_processor
+    if backend == "opencl" and _worker_processor is None:
+        # One context and program build per worker process, reused for all its shards
+        from opencl_processors import OpenCLProcessor
+        _worker_processor = OpenCLProcessor()
+    processor = _worker_processor if backend == "opencl" else None
+    summary = PartialSummary.from_samples(_worker_samples[start:stop], start, samples_per_interval, processor)
+    return summary.to_bytes()
+
+
+def shard_bounds(n_samples, shard_samples):
+    """(start, stop) pairs covering n_samples; shard edges need not align with intervals."""
+    return [(start, min(start + shard_samples, n_samples)) for start in range(0, n_samples, shard_samples)]
+
+
+def run_sharded_analysis(audio_data, sample_rate, interval_length_seconds, shard_samples=None, workers=None,
+                         backend="sequential", filter_method="sigma", filter_params=None):
+    """
+    Splits a recording into shards, reduces each in a separate process (samples are shared, not
+    copied) and merges the summaries with one merge_all once every shard has finished.
+
+    Args:
+        audio_data: float32 samples in [-1.0, 1.0].
+        shard_samples (int, optional): Shard length; defaults to DEFAULT_SHARD_SECONDS of audio.
+        workers (int, optional): Worker processes (default: CPU count).
+        backend (str): "sequential" or "opencl", used by every worker.
+
+    Returns:
+        Tuple (results, summary, total_time): results as returned by PartialSummary.finalize.
+    """
+    start_time = time.time()
+    samples_per_interval = int(sample_rate * interval_length_seconds)
+    if samples_per_interval == 0:
+        print("Error: Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+        return None, None, 0.0
+    audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+    shard_samples = shard_samples or int(DEFAULT_SHARD_SECONDS * sample_rate)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(audio_data.nbytes, 1))
+    try:
+        np.ndarray(audio_data.shape, dtype=np.float32, buffer=shm.buf)[:] = audio_data
+        parts = []
+        # Spawned (not forked) workers: a forked OpenCL runtime of the parent is unusable in the child
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, mp_context=get_context("spawn"),
+                                 initializer=_attach_worker, initargs=(shm.name, audio_data.size)) as pool:
+            futures = [pool.submit(_summarize_shard, start, stop, samples_per_interval, backend)
+                       for start, stop in shard_bounds(audio_data.size, shard_samples)]
+            for future in as_completed(futures):
+                parts.append(PartialSummary.from_bytes(future.result()))
+        # One allocation for the whole recording instead of copying the growing summary per shard
+        summary = PartialSummary.merge_all(parts) if any(part.counts.size for part in parts) \
+            else PartialSummary.identity(samples_per_interval, 0, 0)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results = summary.finalize(filter_method, filter_params)
+    return results, summary, time.time() - start_time
+
+
+if __name__ == "__main__":
+    import argparse
+    from audio_generator import load_wav_to_float_array
+
+    parser = argparse.ArgumentParser(description="Sharded multi-process interval analysis with mergeable summaries.")
+    parser.add_argument("wav", help="WAV file to analyze")
+    parser.add_argument("--interval", type=float, default=1.0, help="Interval length in seconds")
+    parser.add_argument("--shard-seconds", type=float, default=DEFAULT_SHARD_SECONDS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", choices=["sequential", "opencl"], default="sequential")
+    args = parser.parse_args()
+
+    audio, sr = load_wav_to_float_array(args.wav)
+    if audio is None:
+        raise SystemExit(1)
+    results, summary, total_time = run_sharded_analysis(audio, sr, args.interval, int(args.shard_seconds * sr),
+                                                        args.workers, args.backend)
+    for i in range(min(10, len(results["interval_mins"]))):
+        print(f"Interval {i}: Min = {results['interval_mins'][i]:>6d}, Max = {results['interval_maxs'][i]:>6d}")
+    print(f"Global Min: {results['global_min']}, Max: {results['global_max']}")
+    print(f"Filtered Mins: {results['filtered_mins']}")
+    print(f"Filtered Maxs: {results['filtered_maxs']}")
+    print(f"Sharded analysis time: {total_time:.6f} seconds ({len(summary.to_bytes())} byte summary)")
@@ -0,0 +1,316 @@
+# peak_limiter.py
+import math
+import os
+import time
+import numpy as np
+from scipy.ndimage import minimum_filter1d
+
+from native_processors import to_int16_samples
+from wav_decoder import DEFAULT_BLOCK_FRAMES, read_wav_blocks
+from workload_generator import wav_header
+
+# Streaming look-ahead peak limiter for loudspeaker protection. The gain that keeps a sample at
+# the threshold is g_req = threshold / max(|x|, threshold). Per sample:
+#
+#   hold    = sliding min of g_req over the next L samples   (the sliding extreme of |x|)
+#   attack  = mean of hold over the previous L samples        (linear ramp, reaches g_req in time)
+#   gain    = 1 - max_k (1 - attack[k]) * decay^(n - k)       (exponential release)
+#
+# Every window of the attack mean contains the sample itself, so attack <= g_req and the output
+# never exceeds the threshold. The release recursion is evaluated as a running maximum in the
+# log domain (np.maximum.accumulate), so the whole stage is vectorized; the output lags the input
+# by the look-ahead of L - 1 samples, which flush() returns at the end of the stream.
+
+DEFAULT_THRESHOLD = 10 ** (-1.0 / 20)  # -1 dBFS
+DEFAULT_LOOKAHEAD_S = 0.005
+DEFAULT_RELEASE_S = 0.05
+DEFAULT_BLOCK_SAMPLES = 1 << 20
+RELEASE_SEGMENT = 4096  # Samples per work-item of the OpenCL release recursion
+
+
+class PeakLimiter:
+    """
+    Look-ahead peak limiter over a stream of float32 blocks.
+
+    Args:
+        sample_rate (int): Samples per second.
+        threshold (float): Output peak ceiling in (0, 1].
+        lookahead_seconds (float): Look-ahead (and attack) time.
+        release_seconds (float): Time constant of the exponential gain recovery.
+        block_size (int): Largest block expected; work buffers are preallocated for it and
+                          grown only if a larger block arrives.
+    """
+
+    def __init__(self, sample_rate, threshold=DEFAULT_THRESHOLD, lookahead_seconds=DEFAULT_LOOKAHEAD_S,
+                 release_seconds=DEFAULT_RELEASE_S, block_size=DEFAULT_BLOCK_SAMPLES):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("Threshold must be in (0, 1].")
+        if release_seconds <= 0.0:
+            raise ValueError("Release time must be positive.")
+        self.sample_rate = sample_rate
+        self.threshold = np.float32(threshold)
+        self.lookahead = max(1, int(round(lookahead_seconds * sample_rate)))
+        self.log_decay = -1.0 / (release_seconds * sample_rate)  # log of the per-sample release factor
+        self.history = 2 * (self.lookahead - 1)  # Input samples carried between blocks
+        self._capacity = 0
+        self._allocate(block_size)
+        self.reset()
+
+    def _allocate(self, block_size):
+        n = block_size + self.history
+        self._capacity = block_size
+        self._buf = np.zeros(n, dtype=np.float32)      # Carried history followed by the new block
+        self._greq = np.empty(n, dtype=np.float32)
+        self._hold = np.empty(n, dtype=np.float32)
+        self._cumsum = np.empty(n + 1, dtype=np.float64)
+        self._gain64 = np.empty(n, dtype=np.float64)
+        self._ramp = np.arange(n, dtype=np.float64) * -self.log_decay
+        self._gain = np.empty(n, dtype=np.float32)
+        self._out = np.empty(n, dtype=np.float32)
+
+    def reset(self):
+        """Starts a new stream: silence before the first sample, no gain reduction in progress."""
+        self._buf[:self.lookahead - 1] = 0.0
+        self._filled = self.lookahead - 1
+        self._env = 0.0  # Gain reduction (1 - gain) at the last output sample
+        self.samples_out = 0
+        self.limited_samples = 0
+        self.min_gain = 1.0
+        self.input_peak = 0.0
+        self.output_peak = 0.0
+
+    def process(self, block):
+        """
+        Consumes a block and returns the limited samples that are now complete (block size minus
+        the look-ahead for the first block). The returned array is a view of an internal buffer
+        that the next call overwrites.
+        """
+        block = np.asarray(block, dtype=np.float32)
+        if block.size > self._capacity:
+            carried = self._buf[:self._filled].copy()
+            self._allocate(block.size)
+            self._buf[:carried.size] = carried
+        n = self._filled + block.size
+        self._buf[self._filled:n] = block
+        if block.size:
+            self.input_peak = max(self.input_peak, float(np.max(np.abs(block))))
+        n_out = n - self.history
+        if n_out <= 0:
+            self._filled = n
+            return self._out[:0]
+
+        out = self._out[:n_out]
+        gain = self._gain[:n_out]
+        self._limit(n, n_out, out, gain)
+        np.clip(out, -self.threshold, self.threshold, out=out)  # Absorbs the last float32 rounding step
+
+        self.samples_out += n_out
+        self.min_gain = min(self.min_gain, float(gain.min()))
+        self.limited_samples += int(np.count_nonzero(gain < 1.0))
+        self.output_peak = max(self.output_peak, float(np.max(np.abs(out))))
+        # Keep the look-ahead/attack context for the next block
+        self._buf[:self.history] = self._buf[n - self.history:n]
+        self._filled = self.history
+        return out
+
+    def flush(self):
+        """Returns the last look-ahead samples, treating the stream as silent after its end."""
+        return self.process(np.zeros(self.lookahead - 1, dtype=np.float32))
+
+    def _limit(self, n, n_out, out, gain):
+        """Computes gain[:n_out] for the samples buf[L-1:L-1+n_out] and writes the limited samples."""
+        L = self.lookahead
+        buf = self._buf[:n]
+        greq = self._greq[:n]
+        np.abs(buf, out=greq)
+        np.maximum(greq, self.threshold, out=greq)
+        np.divide(self.threshold, greq, out=greq)
+        hold = self._hold[:n]
+        minimum_filter1d(greq, L, output=hold, mode='nearest', origin=-(L // 2))
+
+        # Attack: moving mean of the hold curve (cumulative sums in double)
+        cumsum = self._cumsum[:n_out + L]
+        cumsum[0] = 0.0
+        np.cumsum(hold[:n_out + L - 1], dtype=np.float64, out=cumsum[1:])
+        g = self._gain64[:n_out]
+        np.subtract(cumsum[L:], cumsum[:n_out], out=g)
+        g *= 1.0 / L
+
+        # Release: env[n] = max_k dep[k] * decay^(n-k) = exp(cummax(log dep[k] + k*c) - n*c)
+        ramp = self._ramp[:n_out]
+        np.subtract(1.0, g, out=g)
+        with np.errstate(divide='ignore'):
+            np.log(g, out=g)
+            carried = math.log(self._env) + self.log_decay if self._env > 0.0 else -np.inf
+        g += ramp
+        np.maximum.accumulate(g, out=g)
+        np.maximum(g, carried, out=g)
+        g -= ramp
+        np.exp(g, out=g)
+        self._env = float(g[-1])
+        np.subtract(1.0, g, out=g)
+
+        np.copyto(gain, g, casting='same_kind')
+        center = slice(L - 1, L - 1 + n_out)
+        np.minimum(gain, greq[center], out=gain)  # Guards against rounding in the mean
+        np.multiply(buf[center], gain, out=out)
+
+    def stats(self):
+        return {
+            "samples": self.samples_out,
+            "limited_samples": self.limited_samples,
+            "max_gain_reduction_db": -20 * math.log10(max(self.min_gain, 1e-12)),
+            "input_peak": self.input_peak,
+            "output_peak": self.output_peak,
+        }
+
+
+class OpenCLPeakLimiter(PeakLimiter):
+    """
+    PeakLimiter with the per-sample work on an OpenCL device (limiter_* kernels in audio_kernels.cl).
+    Sliding minima and moving sums use per-segment prefix/suffix scans, the release recursion runs
+    per RELEASE_SEGMENT samples with the carry between segments propagated on the host. Results
+    match the host limiter to float32 rounding.
+
+    Args:
+        processor (OpenCLProcessor): Provides the context, queue and compiled program.
+    """
+
+    def __init__(self, processor, sample_rate, **kwargs):
+        self.processor = processor
+        self.kernel_time = 0.0
+        super().__init__(sample_rate, **kwargs)
+
+    def _allocate(self, block_size):
+        super()._allocate(block_size)
+        import pyopencl as cl
+        ctx = self.processor.ctx
+        n = block_size + self.history
+        n_segments = -(-n // self.lookahead)
+        mf = cl.mem_flags
+        self._dev = {name: cl.Buffer(ctx, mf.READ_WRITE, n * 4)
+                     for name in ("x", "prefix_min", "suffix_min", "prefix_sum", "suffix_sum", "env", "out", "gain")}
+        n_release = -(-n // RELEASE_SEGMENT)
+        self._seg_end = np.empty(n_release, dtype=np.float32)
+        self._carry = np.empty(n_release, dtype=np.float32)
+        self._dev["seg_end"] = cl.Buffer(ctx, mf.READ_WRITE, self._seg_end.nbytes)
+        self._dev["carry"] = cl.Buffer(ctx, mf.READ_WRITE, self._carry.nbytes)
+        self._n_segments = n_segments
+
+    def _limit(self, n, n_out, out, gain):
+        import pyopencl as cl
+        queue, d, L = self.processor.queue, self._dev, self.lookahead
+        kernel = self.processor._kernel
+        decay = np.float32(math.exp(self.log_decay))
+        n_segments = -(-n // L)
+        n_release = -(-n_out // RELEASE_SEGMENT)
+
+        cl.enqueue_copy(queue, d["x"], self._buf[:n])
+        events = [
+            kernel("limiter_hold_scan_kernel")(queue, (n_segments,), None, d["x"], d["prefix_min"], d["suffix_min"],
+                                               self.threshold, np.uint32(L), np.uint32(n)),
+        ]
+        events.append(kernel("limiter_attack_scan_kernel")(queue, (n_segments,), None, d["prefix_min"], d["suffix_min"],
+                                                           d["prefix_sum"], d["suffix_sum"], np.uint32(L), np.uint32(n)))
+        events.append(kernel("limiter_release_kernel")(queue, (n_release,), None, d["prefix_sum"], d["suffix_sum"],
+                                                       d["env"], d["seg_end"], np.uint32(L), np.uint32(RELEASE_SEGMENT),
+                                                       decay, np.uint32(n_out)))
+        seg_end = self._seg_end[:n_release]
+        cl.enqueue_copy(queue, seg_end, d["seg_end"])
+
+        # Carry of the release recursion into each segment (one step per RELEASE_SEGMENT samples)
+        carry = self._carry[:n_release]
+        env = self._env
+        segment_decay = math.exp(self.log_decay * RELEASE_SEGMENT)
+        for s in range(n_release):
+            carry[s] = env
+            length = min(RELEASE_SEGMENT, n_out - s * RELEASE_SEGMENT)
+            env = max(float(seg_end[s]), env * (segment_decay if length == RELEASE_SEGMENT
+                                                  else math.exp(self.log_decay * length)))
+        self._env = env
+        cl.enqueue_copy(queue, d["carry"], carry)
+
+        events.append(kernel("limiter_apply_kernel")(queue, (n_out,), None, d["x"], d["env"], d["carry"], d["out"],
+                                                     d["gain"], self.threshold, np.uint32(L),
+                                                     np.uint32(RELEASE_SEGMENT), decay, np.uint32(n_out)))
+        cl.enqueue_copy(queue, out, d["out"])
+        cl.enqueue_copy(queue, gain, d["gain"])
+        queue.finish()
+        self.kernel_time += sum((e.profile.end - e.profile.start) * 1e-9 for e in events)
+
+
+def limit_array(audio_data, sample_rate, processor=None, **limiter_kwargs):
+    """
+    Limits a whole array (float32 in [-1.0, 1.0]) block by block.
+
+    Returns:
+        Tuple (limited, stats): limited samples (same length) and PeakLimiter.stats().
+    """
+    audio_data = np.asarray(audio_data, dtype=np.float32)
+    limiter_kwargs.setdefault("block_size", min(DEFAULT_BLOCK_SAMPLES, max(1, audio_data.size)))
+    limiter = (OpenCLPeakLimiter(processor, sample_rate, **limiter_kwargs) if processor is not None
+               else PeakLimiter(sample_rate, **limiter_kwargs))
+    block_size = limiter_kwargs["block_size"]
+    result = np.empty(audio_data.size, dtype=np.float32)
+    pos = 0
+    for start in range(0, audio_data.size, block_size):
+        y = limiter.process(audio_data[start:start + block_size])
+        result[pos:pos + y.size] = y
+        pos += y.size
+    y = limiter.flush()
+    result[pos:pos + y.size] = y
+    return result, limiter.stats()
+
+
+def limit_file(input_path, output_path, processor=None, block_frames=DEFAULT_BLOCK_FRAMES, **limiter_kwargs):
+    """
+    Streams a WAV file through the limiter and writes 16-bit PCM, as WAV or raw int16
+    (.raw/.pcm/.bin) depending on the output extension. Memory use is bounded by the block size.
+
+    Args:
+        processor (OpenCLProcessor, optional): Run the limiter on the OpenCL device.
+        **limiter_kwargs: threshold, lookahead_seconds, release_seconds.
+
+    Returns:
+        dict: PeakLimiter.stats() plus processing time and the real-time factor.
+    """
+    start_time = time.time()
+    header, blocks = read_wav_blocks(input_path, block_frames)
+    sample_rate = header["sample_rate"]
+    limiter = (OpenCLPeakLimiter(processor, sample_rate, block_size=block_frames, **limiter_kwargs)
+               if processor is not None else PeakLimiter(sample_rate, block_size=block_frames, **limiter_kwargs))
+    raw_output = os.path.splitext(output_path)[1].lower() in (".raw", ".pcm", ".bin")
+    with open(output_path, "wb") as f:
+        if not raw_output:
+            f.write(wav_header(header["num_frames"], sample_rate))
+        for block in blocks:
+            f.write(to_int16_samples(limiter.process(block)).astype("<i2", copy=False).tobytes())
+        f.write(to_int16_samples(limiter.flush()).astype("<i2", copy=False).tobytes())
+
+    stats = limiter.stats()
+    stats["time"] = time.time() - start_time
+    stats["realtime_factor"] = header["num_frames"] / sample_rate / max(stats["time"], 1e-9)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Streaming look-ahead peak limiter for WAV files.")
+    parser.add_argument("input", help="Input WAV file")
+    parser.add_argument("output", help="Output file (.wav or raw int16 .raw/.pcm/.bin)")
+    parser.add_argument("--threshold-db", type=float, default=-1.0, help="Output ceiling in dBFS")
+    parser.add_argument("--lookahead-ms", type=float, default=DEFAULT_LOOKAHEAD_S * 1e3)
+    parser.add_argument("--release-ms", type=float, default=DEFAULT_RELEASE_S * 1e3)
+    parser.add_argument("--opencl", action="store_true", help="Run the limiter on the OpenCL device")
+    args = parser.parse_args()
+
+    processor = None
+    if args.opencl:
+        from opencl_processors import OpenCLProcessor
+        processor = OpenCLProcessor()
+    stats = limit_file(args.input, args.output, processor, threshold=10 ** (args.threshold_db / 20),
+                       lookahead_seconds=args.lookahead_ms / 1e3, release_seconds=args.release_ms / 1e3)
+    print(f"Limited {stats['samples']} samples in {stats['time']:.3f} seconds ({stats['realtime_factor']:.0f}x real time)")
+    print(f"Samples limited: {stats['limited_samples']}, max gain reduction: {stats['max_gain_reduction_db']:.2f} dB")
+    print(f"Peak in: {stats['input_peak']:.4f}, peak out: {stats['output_peak']:.4f}")
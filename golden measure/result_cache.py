@@ -0,0 +1,205 @@
+# result_cache.py
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+try:
+    import fcntl  # Inter-process locking of the index; not available on Windows
+except ImportError:
+    fcntl = None
+
+DEFAULT_CACHE_DIR = ".spm_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+INDEX_FILENAME = "index.json"
+LOCK_FILENAME = "index.lock"
+
+
+def hash_samples(audio_data):
+    """
+    Fast content hash of decoded sample data.
+    The dtype and shape are part of the hash so int16 and float32 views of the same bytes differ.
+    """
+    audio_data = np.ascontiguousarray(audio_data)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{audio_data.dtype.str}{audio_data.shape}".encode())
+    h.update(memoryview(audio_data).cast('B'))
+    return h.hexdigest()
+
+
+class SampleHasher:
+    """
+    Incremental hash_samples for data streamed in blocks: feed the consecutive blocks of a
+    1-D array of num_samples values; hexdigest() then equals hash_samples of the whole array.
+    """
+
+    def __init__(self, num_samples, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self._h = hashlib.blake2b(digest_size=16)
+        self._h.update(f"{self.dtype.str}{(int(num_samples),)}".encode())
+
+    def update(self, block):
+        self._h.update(memoryview(np.ascontiguousarray(block, dtype=self.dtype)).cast('B'))
+
+    def hexdigest(self):
+        return self._h.hexdigest()
+
+
+def make_cache_key(content_hash, params):
+    """Combines a content hash with the analysis parameters (sample rate, interval, sigma, backend versions)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(content_hash.encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _stat_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+class ResultCache:
+    """
+    Persistent, size-bounded LRU cache of analysis results keyed by content hash plus parameters.
+
+    Layout of cache_dir:
+        index.json      - entries {key: {bytes, last_used}} and stat records {abs_path: {signature, content_hash}}
+        <key>.json      - one cached result per entry
+
+    A stat record lets `lookup_file` answer for an unchanged file (same size, mtime and inode)
+    without decoding it. If the stat check misses, callers hash the decoded samples and use `get`,
+    so a touched-but-identical file still hits.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    # --- index handling ---
+
+    def _locked(self):
+        return _IndexLock(os.path.join(self.cache_dir, LOCK_FILENAME))
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILENAME), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"entries": {}, "stats": {}}
+
+    def _save_index(self, index):
+        path = os.path.join(self.cache_dir, INDEX_FILENAME)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, path)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # --- public API ---
+
+    def get(self, key):
+        """Returns the cached result for key, or None on a miss."""
+        with self._locked():
+            index = self._load_index()
+            entry = index["entries"].get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(self._entry_path(key), 'r') as f:
+                    result = json.load(f)
+            except (FileNotFoundError, ValueError):
+                # Entry file vanished or is corrupt; drop it from the index
+                del index["entries"][key]
+                self._save_index(index)
+                self.misses += 1
+                return None
+            entry["last_used"] = time.time()
+            self._save_index(index)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """Stores a JSON-serializable result and evicts least recently used entries beyond max_bytes."""
+        payload = json.dumps(result, default=_to_builtin)
+        with self._locked():
+            index = self._load_index()
+            tmp = f"{self._entry_path(key)}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                f.write(payload)
+            os.replace(tmp, self._entry_path(key))
+            index["entries"][key] = {"bytes": len(payload), "last_used": time.time()}
+            self._evict(index)
+            self._save_index(index)
+
+    def _evict(self, index):
+        entries = index["entries"]
+        total = sum(e["bytes"] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key]["bytes"]
+            del entries[key]
+            try:
+                os.remove(self._entry_path(key))
+            except FileNotFoundError:
+                pass
+        # Stat records pointing at evicted content are kept; their lookups simply miss.
+
+    def remember_file(self, path, content_hash):
+        """Records the stat signature of path so later lookups can skip decoding it."""
+        with self._locked():
+            index = self._load_index()
+            index["stats"][os.path.abspath(path)] = {"signature": _stat_signature(path), "content_hash": content_hash}
+            self._save_index(index)
+
+    def lookup_file(self, path, params):
+        """
+        Cheap pre-check: if path is unchanged since it was last hashed, returns (key, result)
+        without reading the file. Returns (None, None) when the file must be decoded and hashed.
+        """
+        try:
+            signature = _stat_signature(path)
+        except OSError:
+            return None, None
+        record = self._load_index()["stats"].get(os.path.abspath(path))
+        if record is None or record["signature"] != signature:
+            return None, None
+        key = make_cache_key(record["content_hash"], params)
+        result = self.get(key)
+        return (key, result) if result is not None else (None, None)
+
+
+class _IndexLock:
+    """Exclusive lock on the cache index shared by concurrent jobs (no-op without fcntl)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.f = open(self.path, 'a')
+            fcntl.flock(self.f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.f is not None:
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+            self.f.close()
+            self.f = None
+
+
+def _to_builtin(value):
+    """json.dumps fallback for NumPy scalars and arrays in results."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
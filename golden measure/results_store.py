@@ -0,0 +1,471 @@
+# results_store.py
+import json
+import os
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+import numpy as np
+
+from outlier_filters import filter_mask
+
+try:
+    import fcntl  # Inter-process locking of appends; not available on Windows
+except ImportError:
+    fcntl = None
+
+# Append-only columnar store of analysis results, for corpus-scale questions such as "which
+# recordings had more than three outlier intervals above -3 dBFS last month" without rerunning
+# the analysis. Layout of a store directory:
+#
+#   store.json          format version and schemas
+#   files.bin           one fixed-size FILE_DTYPE record per analyzed file (time, rates, row range, ...)
+#   paths.jsonl         the path of each file record, one JSON string per line
+#   time_index.bin      file ids (int64) sorted by analysis time
+#   intervals/<c>.bin   one raw little-endian column per INTERVAL_COLUMNS entry; the intervals of
+#                       a file are a contiguous chunk of rows in every column
+#   zones/<c>.bin       per block of BLOCK_ROWS interval rows, the (lo, hi) of each ZONE_COLUMNS column
+#
+# Reads memory-map the columns, so a scan touches only the columns and rows it needs: files are
+# selected by path and time through the file index, blocks whose zone (lo, hi) cannot satisfy a
+# predicate are skipped, and the remaining rows are filtered chunk by chunk. An append writes the
+# path, the interval columns and the zones first and the file record last; the file records are the
+# commit point, so rows of an interrupted append are truncated when the store is next opened.
+
+STORE_FORMAT_VERSION = 1
+BLOCK_ROWS = 4096
+DEFAULT_SCAN_ROWS = 1 << 20
+
+FILE_DTYPE = np.dtype([
+    ("time", "<f8"),              # Analysis (or recording) time, seconds since the epoch
+    ("sample_rate", "<i4"),
+    ("interval_length_s", "<f8"),
+    ("num_samples", "<i8"),
+    ("first_row", "<i8"),         # First interval row of the file
+    ("num_intervals", "<i8"),
+    ("global_min", "<i4"),
+    ("global_max", "<i4"),
+    ("outliers", "<i4"),          # Intervals whose min or max is outside the filter band
+])
+INTERVAL_COLUMNS = {
+    "file_id": np.dtype("<i4"),
+    "index": np.dtype("<i4"),       # Interval index within the file; start time is index * interval_length_s
+    "min": np.dtype("<i2"),         # 16-bit scaled interval min / max
+    "max": np.dtype("<i2"),
+    "peak_dbfs": np.dtype("<f4"),   # 20 * log10(max(|min|, |max|) / 32768); -inf for silence
+    "rms_dbfs": np.dtype("<f4"),    # NaN when the results carry no RMS
+    "dc_offset": np.dtype("<f4"),   # 16-bit scaled; NaN when the results carry no DC offset
+    "outlier": np.dtype("u1"),      # Bit 0: min outside the filter band, bit 1: max outside it
+}
+ZONE_COLUMNS = ("min", "max", "peak_dbfs", "rms_dbfs", "dc_offset")
+OPERATORS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": np.not_equal,
+}
+
+
+def _to_dbfs(values):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (20 * np.log10(np.asarray(values, dtype=np.float64) / 32768)).astype(np.float32)
+
+
+def interval_records(results, file_id, filter_method="sigma", filter_params=None):
+    """
+    Interval columns of one file's results (as PartialSummary.finalize or the single-array
+    processors return them): dict of INTERVAL_COLUMNS arrays.
+    """
+    mins = np.asarray(results["interval_mins"], dtype=np.int64)
+    maxs = np.asarray(results["interval_maxs"], dtype=np.int64)
+    n = mins.size
+    filter_params = filter_params or {}
+    outlier = np.zeros(n, dtype=np.uint8)
+    if n:
+        outlier |= ~filter_mask(mins, filter_method, **filter_params)
+        outlier |= (~filter_mask(maxs, filter_method, **filter_params)).astype(np.uint8) << 1
+    rms = results.get("interval_rms")
+    dc = results.get("interval_dc_offsets")
+    return {
+        "file_id": np.full(n, file_id, dtype=np.int32),
+        "index": np.arange(n, dtype=np.int32),
+        "min": mins.astype(np.int16),
+        "max": maxs.astype(np.int16),
+        "peak_dbfs": _to_dbfs(np.maximum(np.abs(mins), np.abs(maxs))),
+        "rms_dbfs": _to_dbfs(rms) if rms is not None else np.full(n, np.nan, dtype=np.float32),
+        "dc_offset": np.asarray(dc, dtype=np.float32) if dc is not None else np.full(n, np.nan, dtype=np.float32),
+        "outlier": outlier,
+    }
+
+
+def parse_predicate(text):
+    """'peak_dbfs>-3' -> ('peak_dbfs', '>', -3.0)."""
+    for op in ("<=", ">=", "==", "!=", "<", ">"):
+        column, sep, value = text.partition(op)
+        if sep:
+            return column.strip(), op, float(value)
+    raise ValueError(f"Predicate '{text}' has no comparison operator; expected one of {tuple(OPERATORS)}.")
+
+
+class ResultsStore:
+    """
+    Columnar, indexed store of per-file and per-interval results.
+
+    Args:
+        path (str): Store directory (created if missing).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, "intervals"), exist_ok=True)
+        os.makedirs(os.path.join(path, "zones"), exist_ok=True)
+        meta_path = os.path.join(path, "store.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta["version"] != STORE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported results store format version {meta['version']}.")
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({"version": STORE_FORMAT_VERSION, "block_rows": BLOCK_ROWS,
+                           "files": [[name, FILE_DTYPE[name].str] for name in FILE_DTYPE.names],
+                           "intervals": {name: dtype.str for name, dtype in INTERVAL_COLUMNS.items()}}, f)
+        self._lock = threading.Lock()
+        with self._locked():
+            self._recover()
+            self._load()
+
+    # --- layout ---
+
+    def _file(self, *parts):
+        return os.path.join(self.path, *parts)
+
+    def _column_path(self, name):
+        return self._file("intervals", f"{name}.bin")
+
+    def _zone_path(self, name):
+        return self._file("zones", f"{name}.bin")
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._file("store.lock"), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_files(self):
+        path = self._file("files.bin")
+        if not os.path.exists(path) or os.path.getsize(path) < FILE_DTYPE.itemsize:
+            return np.zeros(0, dtype=FILE_DTYPE)
+        return np.memmap(path, dtype=FILE_DTYPE, mode='r', shape=(os.path.getsize(path) // FILE_DTYPE.itemsize,))
+
+    def _recover(self):
+        """Drops whatever an interrupted append left beyond the last committed file record."""
+        files = self._read_files()
+        committed_files = files.size
+        rows = int(files["first_row"][-1] + files["num_intervals"][-1]) if committed_files else 0
+        del files
+        for path, size in [(self._file("files.bin"), committed_files * FILE_DTYPE.itemsize)] + \
+                          [(self._column_path(name), rows * dtype.itemsize) for name, dtype in INTERVAL_COLUMNS.items()]:
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, min(size, os.path.getsize(path)))
+        paths_file = self._file("paths.jsonl")
+        if os.path.exists(paths_file):
+            with open(paths_file, 'rb') as f:
+                lines = f.read().split(b"\n")
+            if len(lines) - 1 != committed_files:
+                with open(paths_file, 'wb') as f:
+                    f.write(b"".join(line + b"\n" for line in lines[:committed_files]))
+        self._write_zones(rows, first_block=min(max(self._zone_blocks() - 1, 0), rows // BLOCK_ROWS))
+        if committed_files != self._time_index_size():
+            self._write_time_index()
+
+    def _zone_blocks(self):
+        sizes = [os.path.getsize(self._zone_path(c)) // (2 * INTERVAL_COLUMNS[c].itemsize)
+                 if os.path.exists(self._zone_path(c)) else 0 for c in ZONE_COLUMNS]
+        return min(sizes)
+
+    def _time_index_size(self):
+        path = self._file("time_index.bin")
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _load(self):
+        """Maps the committed files, columns and zones for reading; called with the store locked."""
+        # Everything is mapped first and published at the end, so readers on other threads keep a
+        # consistent set of maps until the new one is complete
+        files_table = self._read_files()
+        num_rows = int(files_table["first_row"][-1] + files_table["num_intervals"][-1]) if files_table.size else 0
+        with open(self._file("paths.jsonl"), 'a+') as f:
+            f.seek(0)
+            paths = [json.loads(line) for line in f.read().splitlines()[:files_table.size]]
+        file_ids = {}
+        for file_id, path in enumerate(paths):
+            file_ids.setdefault(path, []).append(file_id)
+        columns = {name: self._map(self._column_path(name), dtype, (num_rows,))
+                   for name, dtype in INTERVAL_COLUMNS.items()}
+        num_blocks = -(-num_rows // BLOCK_ROWS)
+        zones = {name: self._map(self._zone_path(name), INTERVAL_COLUMNS[name], (num_blocks, 2))
+                 for name in ZONE_COLUMNS}
+        time_index = self._map(self._file("time_index.bin"), np.dtype("<i8"), (files_table.size,))
+        self.files_table, self.num_rows, self.paths, self._file_ids = files_table, num_rows, paths, file_ids
+        self.columns, self.zones, self.time_index = columns, zones, time_index
+
+    @staticmethod
+    def _map(path, dtype, shape):
+        if not np.prod(shape):
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    def _write_zones(self, rows, first_block=None):
+        """Recomputes the zones from first_block (default: the last, possibly partial, stored block) on."""
+        if first_block is None:
+            first_block = max(self._zone_blocks() - 1, 0)
+        for name in ZONE_COLUMNS:
+            dtype = INTERVAL_COLUMNS[name]
+            path = self._zone_path(name)
+            start = first_block * BLOCK_ROWS
+            values = np.fromfile(self._column_path(name), dtype=dtype, offset=start * dtype.itemsize) \
+                if rows > start else np.zeros(0, dtype=dtype)
+            values = values[:rows - start]
+            pad = -values.size % BLOCK_ROWS
+            if dtype.kind == "f":
+                blocks = np.concatenate([values, np.full(pad, np.nan, dtype=dtype)]).reshape(-1, BLOCK_ROWS)
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN blocks keep NaN zones
+                    zones = np.stack([np.nanmin(blocks, axis=1), np.nanmax(blocks, axis=1)], axis=1)
+            else:
+                edge = values[-1:] if values.size else np.zeros(1, dtype=dtype)
+                blocks = np.concatenate([values, np.repeat(edge, pad)]).reshape(-1, BLOCK_ROWS)
+                zones = np.stack([blocks.min(axis=1), blocks.max(axis=1)], axis=1)
+            # Replaced as a whole, never truncated in place: readers may have the old file mapped
+            kept = np.fromfile(path, dtype=dtype, count=first_block * 2) if os.path.exists(path) else np.zeros(0, dtype)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(kept.tobytes())
+                f.write(zones.astype(dtype).tobytes())
+            os.replace(tmp, path)
+
+    def _write_time_index(self):
+        files = self._read_files()
+        order = np.argsort(files["time"], kind='stable').astype("<i8")
+        tmp = self._file(f"time_index.bin.{os.getpid()}.tmp")
+        order.tofile(tmp)
+        os.replace(tmp, self._file("time_index.bin"))
+
+    # --- writing ---
+
+    def append(self, path, results, analyzed_at=None, filter_method="sigma", filter_params=None):
+        """
+        Appends the results of one analyzed file.
+
+        Args:
+            path (str): The analyzed file (or any name for the recording).
+            results (dict): interval_mins, interval_maxs, sample_rate, interval_length_s and
+                            num_samples; global_min / global_max, interval_rms and
+                            interval_dc_offsets when available.
+            analyzed_at (float, optional): Time of the record in seconds since the epoch (default: now).
+            filter_method / filter_params: Outlier filter that flags the intervals (see outlier_filters).
+
+        Returns:
+            int: The file id.
+        """
+        with self._locked():
+            self._recover()
+            files = self._read_files()
+            file_id = files.size
+            first_row = int(files["first_row"][-1] + files["num_intervals"][-1]) if file_id else 0
+            del files
+            columns = interval_records(results, file_id, filter_method, filter_params)
+            n = columns["index"].size
+            record = np.zeros(1, dtype=FILE_DTYPE)
+            record["time"] = time.time() if analyzed_at is None else analyzed_at
+            record["sample_rate"] = results["sample_rate"]
+            record["interval_length_s"] = results["interval_length_s"]
+            record["num_samples"] = results.get("num_samples", 0)
+            record["first_row"] = first_row
+            record["num_intervals"] = n
+            record["global_min"] = results.get("global_min") if results.get("global_min") is not None else 0
+            record["global_max"] = results.get("global_max") if results.get("global_max") is not None else 0
+            record["outliers"] = int(np.count_nonzero(columns["outlier"]))
+
+            with open(self._file("paths.jsonl"), 'a') as f:
+                f.write(json.dumps(os.path.abspath(path) if os.path.exists(path) else path) + "\n")
+            for name, dtype in INTERVAL_COLUMNS.items():
+                with open(self._column_path(name), 'ab') as f:
+                    f.write(columns[name].astype(dtype, copy=False).tobytes())
+            self._write_zones(first_row + n)
+            with open(self._file("files.bin"), 'ab') as f:
+                f.write(record.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_time_index()
+            # Mapped under the lock: a concurrent append may otherwise grow the files between the reads
+            self._load()
+        return file_id
+
+    # --- reading ---
+
+    def refresh(self):
+        """Maps files appended (by this or another process) since the store was opened."""
+        with self._locked():
+            self._load()
+
+    def file_ids(self, path=None, since=None, until=None):
+        """File ids by path and/or time range [since, until), in time order."""
+        if since is None and until is None:
+            ids = np.asarray(self.time_index)
+        else:
+            times = self.files_table["time"][self.time_index]
+            lo = 0 if since is None else np.searchsorted(times, since, side='left')
+            hi = times.size if until is None else np.searchsorted(times, until, side='left')
+            ids = np.asarray(self.time_index[lo:hi])
+        if path is not None:
+            key = os.path.abspath(path) if os.path.exists(path) else path
+            ids = ids[np.isin(ids, self._file_ids.get(key, []))]
+        return ids
+
+    def file_record(self, file_id):
+        """dict of the file's FILE_DTYPE fields plus its path."""
+        record = self.files_table[int(file_id)]
+        return {"file_id": int(file_id), "path": self.paths[int(file_id)],
+                **{name: record[name].item() for name in FILE_DTYPE.names}}
+
+    def file_intervals(self, file_id, columns=None):
+        """Memory-mapped interval columns of one file (no copy)."""
+        record = self.files_table[int(file_id)]
+        start, stop = int(record["first_row"]), int(record["first_row"] + record["num_intervals"])
+        return {name: self.columns[name][start:stop] for name in (columns or INTERVAL_COLUMNS)}
+
+    def _block_mask(self, where):
+        """Blocks whose zones can satisfy every predicate."""
+        keep = np.ones(-(-self.num_rows // BLOCK_ROWS), dtype=bool)
+        for column, op, value in where:
+            if column not in ZONE_COLUMNS:
+                continue
+            lo, hi = self.zones[column][:, 0], self.zones[column][:, 1]
+            if op in (">", ">="):
+                keep &= OPERATORS[op](hi, value)
+            elif op in ("<", "<="):
+                keep &= OPERATORS[op](lo, value)
+            elif op == "==":
+                keep &= (lo <= value) & (hi >= value)
+            else:
+                keep &= ~((lo == value) & (hi == value))
+        return keep
+
+    def _row_ranges(self, file_ids, where):
+        """Row ranges of the selected files within blocks that pass the zone check."""
+        records = self.files_table[np.sort(file_ids)]
+        block_ok = self._block_mask(where)
+        ranges = []
+        for start, count in zip(records["first_row"].tolist(), records["num_intervals"].tolist()):
+            stop = start + count
+            if count == 0:
+                continue
+            first_block = start // BLOCK_ROWS
+            ok = block_ok[first_block:(stop - 1) // BLOCK_ROWS + 1]
+            # Runs of passing blocks, clipped to the file's rows
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], ok.view(np.int8), [0]))))
+            for run_start, run_stop in zip(edges[::2], edges[1::2]):
+                lo = max(start, (first_block + run_start) * BLOCK_ROWS)
+                hi = min(stop, (first_block + run_stop) * BLOCK_ROWS)
+                if ranges and ranges[-1][1] == lo:
+                    ranges[-1][1] = hi
+                else:
+                    ranges.append([lo, hi])
+        return ranges
+
+    def scan(self, columns=None, where=(), since=None, until=None, path=None, chunk_rows=DEFAULT_SCAN_ROWS):
+        """
+        Filtered scan over the interval rows of the selected files.
+
+        Args:
+            columns: Interval columns to return (default: all); file_id and index are always included.
+            where: Predicates (column, op, value) that must all hold, e.g. [("peak_dbfs", ">", -3)];
+                   op is one of OPERATORS. Strings such as "peak_dbfs>-3" are accepted too.
+            since, until (float, optional): Time range of the files, seconds since the epoch.
+            path (str, optional): Only files analyzed from this path.
+            chunk_rows (int): Rows read per step.
+
+        Yields:
+            dict of column -> array of the matching rows, one chunk at a time.
+        """
+        where = [parse_predicate(p) if isinstance(p, str) else tuple(p) for p in where]
+        for column, op, _ in where:
+            if column not in INTERVAL_COLUMNS or op not in OPERATORS:
+                raise ValueError(f"Invalid predicate on '{column}' with '{op}'.")
+        wanted = list(dict.fromkeys(["file_id", "index"] + list(columns or INTERVAL_COLUMNS)))
+        for lo, hi in self._row_ranges(self.file_ids(path, since, until), where):
+            for start in range(lo, hi, chunk_rows):
+                stop = min(start + chunk_rows, hi)
+                mask = np.ones(stop - start, dtype=bool)
+                for column, op, value in where:
+                    mask &= OPERATORS[op](self.columns[column][start:stop], value)
+                if mask.any():
+                    yield {name: self.columns[name][start:stop][mask] for name in wanted}
+
+    def query(self, columns=None, where=(), since=None, until=None, path=None):
+        """scan() concatenated into one dict of arrays."""
+        wanted = list(dict.fromkeys(["file_id", "index"] + list(columns or INTERVAL_COLUMNS)))
+        chunks = list(self.scan(columns, where, since, until, path))
+        return {name: np.concatenate([c[name] for c in chunks]) if chunks else np.zeros(0, INTERVAL_COLUMNS[name])
+                for name in wanted}
+
+    def count_by_file(self, where=(), since=None, until=None, path=None):
+        """{file_id: number of matching intervals} for files with at least one match."""
+        counts = np.zeros(self.files_table.size, dtype=np.int64)
+        for chunk in self.scan(["file_id"], where, since, until, path):
+            counts += np.bincount(chunk["file_id"], minlength=counts.size)
+        return {int(i): int(counts[i]) for i in np.flatnonzero(counts)}
+
+
+def _parse_time(text):
+    """'2026-09-01' / '2026-09-01T12:00', or '30d' / '12h' ago -> epoch seconds."""
+    from datetime import datetime
+    if text[-1:] in ("d", "h"):
+        return time.time() - float(text[:-1]) * (86400 if text[-1] == "d" else 3600)
+    return datetime.fromisoformat(text).timestamp()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Columnar store of interval analysis results.")
+    parser.add_argument("store", help="Store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="Analyze WAV files and append their results")
+    add.add_argument("wavs", nargs="+")
+    add.add_argument("--interval", type=float, default=1.0, help="Interval length in seconds")
+    query = sub.add_parser("query", help="Files with at least --min-count matching intervals")
+    query.add_argument("--where", action="append", default=[], help="Predicate such as 'peak_dbfs>-3' (repeatable)")
+    query.add_argument("--since", type=_parse_time, help="ISO date/time, or an age such as 30d or 12h")
+    query.add_argument("--until", type=_parse_time)
+    query.add_argument("--path")
+    query.add_argument("--min-count", type=int, default=1)
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store)
+    if args.command == "add":
+        from audio_generator import load_wav_to_float_array
+        from partial_summary import PartialSummary
+        for wav in args.wavs:
+            audio, sr = load_wav_to_float_array(wav)
+            if audio is None:
+                continue
+            results = PartialSummary.from_samples(audio, 0, int(sr * args.interval)).finalize()
+            results.update(sample_rate=sr, interval_length_s=args.interval)
+            print(f"Stored {wav} as file {store.append(wav, results)} ({len(results['interval_mins'])} intervals)")
+    else:
+        start = time.time()
+        counts = store.count_by_file(args.where, args.since, args.until, args.path)
+        matches = {i: c for i, c in counts.items() if c >= args.min_count}
+        for file_id, count in sorted(matches.items(), key=lambda item: -item[1]):
+            record = store.file_record(file_id)
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(record["time"]))
+            print(f"{count:>8} intervals  {when}  {record['path']}")
+        print(f"{len(matches)} of {len(store.file_ids(args.path, args.since, args.until))} files match "
+              f"({store.num_rows} intervals stored, {time.time() - start:.3f} s)")
@@ -0,0 +1,134 @@
+# sample_text_io.py
+import warnings
+import numpy as np
+
+# Bulk readers and writers for the legacy text sample format shared with audio_filter_reference.c
+# and the Verilog testbenches: one sample per line, either 16-bit integers ("-123") or floats in the
+# form f"{sample}" produces for a NumPy float ("0.2739233672618866", "9.1552734375e-05").
+# Files are processed in chunks; no Python-level loop runs per sample.
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024  # Bytes parsed per chunk when reading
+DEFAULT_CHUNK_SAMPLES = 1 << 20         # Samples formatted per chunk when writing
+
+_int16_table = None  # Lazily built lookup table of the text rows for every 16-bit value
+
+
+def _parse_block(block, dtype):
+    """Parses a block that ends on a line break with NumPy's C separator parser."""
+    if not block.strip():
+        return np.empty(0, dtype=dtype)  # fromstring returns a spurious value for whitespace-only input
+    parse_dtype = np.int64 if np.issubdtype(dtype, np.integer) else np.float64
+    with warnings.catch_warnings():
+        # fromstring stops at the first bad token with a DeprecationWarning (a ValueError on NumPy >= 2.3);
+        # raising it avoids a second pass over the bytes to count the tokens
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(block, dtype=parse_dtype, sep=' ')
+        except (DeprecationWarning, ValueError):
+            raise ValueError("Sample text contains non-numeric data.") from None
+    if np.issubdtype(dtype, np.integer) and values.size:
+        info = np.iinfo(dtype)
+        if values.min() < info.min or values.max() > info.max:
+            raise ValueError(f"Sample text contains values outside the {dtype} range [{info.min}, {info.max}].")
+    # Floats are parsed as double and then narrowed, like np.array([float(line) ...], dtype=np.float32)
+    return values.astype(dtype)
+
+
+def read_text_samples(filename, dtype=np.float32, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Reads a one-sample-per-line text file in bulk.
+
+    Args:
+        filename (str): Path of the text file.
+        dtype: Output dtype, np.float32 for normalized samples or an integer type for 16-bit samples.
+        chunk_bytes (int): Bytes parsed at a time, bounding the temporary memory.
+
+    Returns:
+        numpy.ndarray: The samples.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file contains non-numeric data.
+    """
+    dtype = np.dtype(dtype)
+    parts = []
+    tail = b''
+    with open(filename, 'rb') as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = tail + block
+            # Parse up to the last line break; the remainder may be a number split by the read
+            cut = block.rfind(b'\n')
+            if cut < 0:
+                tail = block
+                continue
+            tail = block[cut + 1:]
+            parts.append(_parse_block(block[:cut + 1], dtype))
+    if tail.strip():
+        parts.append(_parse_block(tail, dtype))
+    if not parts:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(parts)
+
+
+def _get_int16_table():
+    """(65536, 7) uint8 rows "-32768\\n" ... "32767\\n" and their lengths, indexed by value + 32768."""
+    global _int16_table
+    if _int16_table is None:
+        text = np.frombuffer(("\n".join(map(str, range(-32768, 32768))) + "\n").encode(), dtype=np.uint8)
+        ends = np.flatnonzero(text == ord('\n')) + 1
+        starts = np.concatenate(([0], ends[:-1]))
+        lengths = ends - starts
+        cols = np.arange(int(lengths.max()))[None, :]
+        src = np.minimum(starts[:, None] + cols, text.size - 1)
+        rows = np.where(cols < lengths[:, None], text[src], 0).astype(np.uint8)
+        _int16_table = (rows, lengths)
+    return _int16_table
+
+
+def format_int_text(samples):
+    """Formats integer samples as bytes, one per line, identical to f"{int(x)}\\n" per sample."""
+    values = np.asarray(samples)
+    if values.size == 0:
+        return b''
+    if values.min() >= -32768 and values.max() <= 32767:
+        # Gather each sample's precomputed row and keep only its used bytes
+        rows, lengths = _get_int16_table()
+        idx = values.astype(np.int32) + 32768
+        mask = np.arange(rows.shape[1])[None, :] < lengths[idx][:, None]
+        return rows[idx][mask].tobytes()
+    return ("\n".join(map(str, values.tolist())) + "\n").encode()
+
+
+def format_float_text(samples):
+    """
+    Formats float samples as bytes, one per line, identical to f"{x}\\n" per sample:
+    repr() of each value as a double (float32 samples are widened exactly).
+    """
+    values = np.asarray(samples)
+    if values.size == 0:
+        return b''
+    # tolist() widens to Python floats in C; join/map then run without per-sample bytecode
+    return ("\n".join(map(repr, values.tolist())) + "\n").encode()
+
+
+def write_text_samples(filename, samples, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+    """
+    Writes samples one per line in bulk, chunk by chunk.
+
+    Integer arrays are written as integers and float arrays in repr() form; the output is
+    byte-identical to writing f"{sample}\\n" for every element of the array.
+
+    Args:
+        filename (str): Path of the text file to create.
+        samples (numpy.ndarray): 1-D array of samples.
+        chunk_samples (int): Samples formatted at a time, bounding the temporary memory.
+    """
+    samples = np.asarray(samples).ravel()
+    integer = np.issubdtype(samples.dtype, np.integer)
+    with open(filename, 'wb') as f:
+        for start in range(0, samples.size, chunk_samples):
+            chunk = samples[start:start + chunk_samples]
+            f.write(format_int_text(chunk) if integer else format_float_text(chunk))
@@ -2,13 +2,33 @@
 import numpy as np
 import time
 import math
+from sample_text_io import read_text_samples
+from outlier_filters import filter_mask, masked_pairs
+from amplitude_histogram import block_histograms
+from backend_versions import BACKEND_VERSIONS
+
+# Part of the result cache key; bumped in backend_versions.py.
+BACKEND_VERSION = BACKEND_VERSIONS["sequential"]
+
+# Samples at or beyond these levels are full scale (int16 32767 / -32768) and counted as clipped
+CLIP_HIGH = 32767 / 32768
+CLIP_LOW = -1.0
+# Whole intervals are reduced in chunks of about this many samples so every statistic is
+# computed while the chunk is still in cache: one traversal of the data in memory
+FUSED_CHUNK_SAMPLES = 1 << 18
+
+def scale_to_int16(values):
+    """
+    Float samples in [-1.0, 1.0] as 16-bit values: truncated like int(x * 32768) and saturated
+    to [-32768, 32767] like the C reference and the int16 hardware (so +1.0 becomes 32767).
+    Returns an int64 array (0-d for a scalar).
+    """
+    return np.clip(np.multiply(values, 32768, dtype=np.float64), -32768, 32767).astype(np.int64)
 
 def load_audio_from_text(filename="audio_samples.txt"):
     """Loads audio samples from a text file."""
     try:
-        with open(filename, 'r') as f:
-            data = [float(line.strip()) for line in f]
-        return np.array(data, dtype=np.float32)
+        return read_text_samples(filename, dtype=np.float32)
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found. Please generate it first.")
         return np.array([], dtype=np.float32)
@@ -30,14 +50,16 @@ def sequential_min_max_amplitude(audio_data):
     
     processing_time = end_time - start_time
     # Scale to 16-bit integer range for display
-    min_val_int = int(min_val * 32768)
-    max_val_int = int(max_val * 32768)
+    min_val_int = int(scale_to_int16(min_val))
+    max_val_int = int(scale_to_int16(max_val))
     return min_val_int, max_val_int, processing_time
 
-def sequential_interval_min_max_amplitude(audio_data, sample_rate, interval_length_seconds):
+def sequential_interval_min_max_amplitude(audio_data, sample_rate, interval_length_seconds, filter_method="sigma", filter_params=None):
     """
     Finds min/max for intervals and filters them sequentially.
     Modified to show the actual interval indices for filtered results.
+    filter_method / filter_params select the outlier band (see outlier_filters); the default
+    keeps the intervals within mean +/- one std.
     """
     if audio_data.size == 0:
         return [], [], [], [], 0.0
@@ -62,8 +84,8 @@ def sequential_interval_min_max_amplitude(audio_data, sample_rate, interval_leng
             min_val = np.min(interval_data)
             max_val = np.max(interval_data)
             # Scale to 16-bit integer range
-            interval_mins.append(int(min_val * 32768))
-            interval_maxs.append(int(max_val * 32768))
+            interval_mins.append(int(scale_to_int16(min_val)))
+            interval_maxs.append(int(scale_to_int16(max_val)))
         else:
             interval_mins.append(0)
             interval_maxs.append(0)
@@ -76,29 +98,9 @@ def sequential_interval_min_max_amplitude(audio_data, sample_rate, interval_leng
         print(f"Interval {i}: Min = {interval_mins[i]:>6d}, Max = {interval_maxs[i]:>6d}")
 
     # Filtering with original interval indices
-    filtered_mins_with_idx = []
-    if len(interval_mins) > 1:
-        mean_mins = np.mean(interval_mins)
-        std_mins = np.std(interval_mins)
-        lower_bound_mins = mean_mins - std_mins
-        upper_bound_mins = mean_mins + std_mins
-        for idx, m in enumerate(interval_mins):
-            if lower_bound_mins <= m <= upper_bound_mins:
-                filtered_mins_with_idx.append((idx, m))
-    elif len(interval_mins) == 1:
-        filtered_mins_with_idx = [(0, interval_mins[0])]
-
-    filtered_maxs_with_idx = []
-    if len(interval_maxs) > 1:
-        mean_maxs = np.mean(interval_maxs)
-        std_maxs = np.std(interval_maxs)
-        lower_bound_maxs = mean_maxs - std_maxs
-        upper_bound_maxs = mean_maxs + std_maxs
-        for idx, m in enumerate(interval_maxs):
-            if lower_bound_maxs <= m <= upper_bound_maxs:
-                filtered_maxs_with_idx.append((idx, m))
-    elif len(interval_maxs) == 1:
-        filtered_maxs_with_idx = [(0, interval_maxs[0])]
+    filter_params = filter_params or {}
+    filtered_mins_with_idx = masked_pairs(interval_mins, filter_mask(interval_mins, filter_method, **filter_params))
+    filtered_maxs_with_idx = masked_pairs(interval_maxs, filter_mask(interval_maxs, filter_method, **filter_params))
 
     # Print filtered results with original interval indices
     print("\n--- Filtered Results ---")
@@ -115,6 +117,161 @@ def sequential_interval_min_max_amplitude(audio_data, sample_rate, interval_leng
     filtered_maxs = [val for _, val in filtered_maxs_with_idx]
     return list(interval_mins), list(interval_maxs), filtered_mins, filtered_maxs, processing_time
 
+def _fused_block_statistics(blocks, first_index, num_bins=None):
+    """
+    Per-row statistics of a 2D float32 block of consecutive intervals starting at sample
+    first_index: min, max, their sample indices, sum, sum of squares and clipped-sample count,
+    plus the amplitude histogram of each row when num_bins is given.
+    """
+    rows = np.arange(blocks.shape[0])
+    argmins = blocks.argmin(axis=1)
+    argmaxs = blocks.argmax(axis=1)
+    mins = blocks[rows, argmins]
+    maxs = blocks[rows, argmaxs]
+    # Row sums are pairwise in float32, accurate enough for RMS/DC and twice as fast as float64
+    sums = blocks.sum(axis=1).astype(np.float64)
+    sumsqs = np.square(blocks).sum(axis=1).astype(np.float64)
+    # Only rows whose extremes reach full scale can hold clipped samples
+    clips = np.zeros(blocks.shape[0], dtype=np.int64)
+    hot = np.flatnonzero((mins <= CLIP_LOW) | (maxs >= CLIP_HIGH))
+    if hot.size:
+        clips[hot] = np.count_nonzero((blocks[hot] >= CLIP_HIGH) | (blocks[hot] <= CLIP_LOW), axis=1)
+    offsets = first_index + rows * blocks.shape[1]
+    partials = {
+        "min": mins,
+        "max": maxs,
+        "min_index": offsets + argmins,
+        "max_index": offsets + argmaxs,
+        "sum": sums,
+        "sumsq": sumsqs,
+        "clips": clips,
+        "count": np.full(blocks.shape[0], blocks.shape[1], dtype=np.int64),
+    }
+    if num_bins is not None:
+        partials["hist"] = block_histograms(blocks, num_bins)
+    return partials
+
+def combine_fused_statistics(partials, num_intervals):
+    """
+    Turns per-block partial statistics into the fused result. The first num_intervals blocks
+    are the complete intervals; any block after them (the partial tail) only counts globally.
+
+    Args:
+        partials: dict of equal-length arrays (min, max, min_index, max_index, sum, sumsq, clips, count),
+            with min/max as float samples in [-1.0, 1.0].
+        num_intervals: Number of complete intervals at the front of the partials.
+
+    Returns:
+        dict: interval_* lists and a "global" dict, with amplitudes scaled to the 16-bit range.
+    """
+    def scaled_peak(mins, maxs, min_idx, max_idx):
+        # Peak is the larger magnitude extreme; on a tie the earlier sample wins
+        neg = np.abs(mins) > np.abs(maxs)
+        tie = np.abs(mins) == np.abs(maxs)
+        use_min = neg | (tie & (min_idx < max_idx))
+        return np.where(use_min, np.abs(mins), np.abs(maxs)), np.where(use_min, min_idx, max_idx)
+
+    mins_int = scale_to_int16(partials["min"])
+    maxs_int = scale_to_int16(partials["max"])
+    counts = partials["count"]
+    peaks, peak_idx = scaled_peak(mins_int, maxs_int, partials["min_index"], partials["max_index"])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rms = np.sqrt(partials["sumsq"] / counts) * 32768
+        dc = partials["sum"] / counts * 32768
+
+    k = num_intervals
+    stats = {
+        "interval_mins": mins_int[:k].tolist(),
+        "interval_maxs": maxs_int[:k].tolist(),
+        "interval_min_indices": partials["min_index"][:k].astype(int).tolist(),
+        "interval_max_indices": partials["max_index"][:k].astype(int).tolist(),
+        "interval_peaks": peaks[:k].tolist(),
+        "interval_peak_indices": peak_idx[:k].astype(int).tolist(),
+        "interval_rms": rms[:k].tolist(),
+        "interval_dc_offsets": dc[:k].tolist(),
+        "interval_clip_counts": partials["clips"][:k].astype(int).tolist(),
+        "global": {},
+    }
+    total = int(counts.sum())
+    if total:
+        gmin = int(np.argmin(partials["min"]))
+        gmax = int(np.argmax(partials["max"]))
+        g_peak, g_peak_idx = scaled_peak(mins_int[gmin], maxs_int[gmax],
+                                         partials["min_index"][gmin], partials["max_index"][gmax])
+        stats["global"] = {
+            "min": int(mins_int[gmin]), "max": int(maxs_int[gmax]),
+            "min_index": int(partials["min_index"][gmin]), "max_index": int(partials["max_index"][gmax]),
+            "peak": int(g_peak), "peak_index": int(g_peak_idx),
+            "rms": float(np.sqrt(partials["sumsq"].sum() / total) * 32768),
+            "dc_offset": float(partials["sum"].sum() / total * 32768),
+            "clip_count": int(partials["clips"].sum()),
+            "samples": total,
+        }
+    return stats
+
+def print_fused_statistics(stats):
+    """Prints the first 10 intervals and the global line of a fused statistics result."""
+    for i in range(min(10, len(stats["interval_rms"]))):
+        print(f"Interval {i}: RMS = {stats['interval_rms'][i]:>9.2f}, Peak = {stats['interval_peaks'][i]:>6d} "
+              f"@ {stats['interval_peak_indices'][i]}, DC = {stats['interval_dc_offsets'][i]:>8.2f}, "
+              f"Clipped = {stats['interval_clip_counts'][i]}")
+    g = stats["global"]
+    if g:
+        print(f"Global: Min = {g['min']:>6d} @ {g['min_index']}, Max = {g['max']:>6d} @ {g['max_index']}, "
+              f"RMS = {g['rms']:.2f}, Peak = {g['peak']} @ {g['peak_index']}, "
+              f"DC = {g['dc_offset']:.2f}, Clipped = {g['clip_count']}")
+
+def sequential_fused_partials(audio_data, samples_per_interval, num_bins=None):
+    """
+    Per-interval partial statistics (see _fused_block_statistics) of every complete interval,
+    followed by one entry for the partial last interval if there is one. With num_bins, "hist"
+    holds the amplitude histogram of each entry and "global_hist" that of all samples.
+
+    Returns:
+        Tuple (partials, num_intervals): dict of arrays, and the number of complete intervals.
+    """
+    audio_data = np.asarray(audio_data, dtype=np.float32)
+    num_intervals = len(audio_data) // samples_per_interval
+    rows_per_chunk = max(1, FUSED_CHUNK_SAMPLES // samples_per_interval)
+    parts = []
+    for first in range(0, num_intervals, rows_per_chunk):
+        rows = min(rows_per_chunk, num_intervals - first)
+        start = first * samples_per_interval
+        blocks = audio_data[start:start + rows * samples_per_interval].reshape(rows, samples_per_interval)
+        parts.append(_fused_block_statistics(blocks, start, num_bins))
+    tail_start = num_intervals * samples_per_interval
+    if tail_start < len(audio_data):
+        parts.append(_fused_block_statistics(audio_data[tail_start:].reshape(1, -1), tail_start, num_bins))
+    partials = {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+    if num_bins is not None:
+        partials["global_hist"] = partials["hist"].sum(axis=0)
+    return partials, num_intervals
+
+def sequential_fused_statistics(audio_data, sample_rate, interval_length_seconds):
+    """
+    Computes min/max, RMS, absolute peak, DC offset, clipped-sample count and the sample index of
+    each extreme, per complete interval and globally (including a partial last interval), in one
+    traversal: every chunk of intervals is reduced for all statistics while it is in cache.
+
+    Returns:
+        Tuple (stats, processing_time): stats as returned by combine_fused_statistics.
+    """
+    if audio_data.size == 0:
+        return None, 0.0
+
+    start_time = time.time()
+    samples_per_interval = int(sample_rate * interval_length_seconds)
+    if samples_per_interval == 0:
+        print("Error: Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+        return None, 0.0
+
+    partials, num_intervals = sequential_fused_partials(audio_data, samples_per_interval)
+    stats = combine_fused_statistics(partials, num_intervals)
+    print_fused_statistics(stats)
+
+    processing_time = time.time() - start_time
+    return stats, processing_time
+
 if __name__ == "__main__":
     # Generate dummy data if it doesn't exist
     import os
@@ -0,0 +1,283 @@
+# verilog_regression.py
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from hardware_model import TB_MEM_TRAILING_EDGES, simulate_min_max_amplitude, simulate_top
+from sample_text_io import read_text_samples
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERVAL_DIR = os.path.join(REPO_ROOT, "Interval min-max")
+GLOBAL_DIR = os.path.join(REPO_ROOT, "Global min-max")
+
+# Testbench top module and sources for each design under test
+DESIGNS = {
+    "interval": ("tb_mem", [os.path.join(INTERVAL_DIR, f) for f in ("tb_mem.v", "top.v", "min_max.v")]),
+    "global": ("tb_min_max_amplitude_mem", [os.path.join(GLOBAL_DIR, f) for f in ("tb_min_max_amplitude_mem.v", "min_max_amplitude.v")]),
+}
+
+DEFAULT_INTERVAL_LEN = 44100
+DEFAULT_NUM_INTERVALS = 10
+DEFAULT_BUILD_DIR = ".verilog_build"
+
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_INTERVAL_RE = re.compile(r"^Interval (\d+): Min = (-?\d+), Max = (-?\d+)")
+_FILTERED_RE = re.compile(r"^Filtered (Min|Max)\[(\d+)\] = (-?\d+)")
+_GLOBAL_RE = re.compile(r"^(Minimum|Maximum) Amplitude =\s*(-?\d+)")
+
+
+# --- input conversion ---
+
+def load_int16_samples(path):
+    """
+    Loads any supported input as 16-bit signed samples.
+
+    Supports WAV files, .npy arrays, raw little-endian int16 (.raw/.pcm/.bin) and text files.
+    Text files holding integers are taken as 16-bit samples; float text and float arrays in
+    [-1.0, 1.0] are scaled by 32768 and truncated like the golden measure does.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".wav":
+        from audio_generator import load_wav_to_float_array
+        data, _ = load_wav_to_float_array(path)
+        if data is None:
+            raise ValueError(f"Could not load WAV file '{path}'.")
+    elif ext == ".npy":
+        data = np.load(path)
+    elif ext in (".raw", ".pcm", ".bin"):
+        return np.fromfile(path, dtype='<i2').astype(np.int16)
+    else:
+        data = read_text_samples(path, dtype=np.float64)
+        if np.all(data == np.trunc(data)) and np.abs(data).max(initial=0) > 1.0:
+            return data.astype(np.int16)
+    if np.issubdtype(data.dtype, np.integer):
+        return data.astype(np.int16)
+    return np.clip((data * 32768).astype(np.int32), -32768, 32767).astype(np.int16)
+
+
+def write_memh(samples, path):
+    """Writes int16 samples as a $readmemh image: one 4-digit two's complement hex word per line."""
+    words = np.asarray(samples, dtype=np.int16).view(np.uint16)
+    rows = np.empty((words.size, 5), dtype=np.uint8)
+    for col, shift in enumerate((12, 8, 4, 0)):
+        rows[:, col] = _HEX[(words >> shift) & 0xF]
+    rows[:, 4] = ord('\n')
+    with open(path, 'wb') as f:
+        f.write(rows.tobytes())
+
+
+# --- golden measure ---
+
+def filter_within_one_std(values):
+    """(index, value) pairs within mean +/- one population std, as the golden measure and top.v filter."""
+    values = np.asarray(values)
+    if values.size == 0:
+        return []
+    if values.size == 1:
+        return [(0, int(values[0]))]
+    mean = values.mean()
+    std = values.std()
+    keep = np.flatnonzero((values >= mean - std) & (values <= mean + std))
+    return [(int(i), int(values[i])) for i in keep]
+
+
+def golden_interval_results(samples, interval_len=DEFAULT_INTERVAL_LEN, num_intervals=DEFAULT_NUM_INTERVALS):
+    """Interval min/max over the first num_intervals complete intervals and their 1-sigma filtering."""
+    n = min(num_intervals, samples.size // interval_len)
+    blocks = samples[:n * interval_len].reshape(n, interval_len)
+    mins = blocks.min(axis=1).astype(int)
+    maxs = blocks.max(axis=1).astype(int)
+    # top.v only filters once all NUM_INTERVALS intervals are stored
+    complete = n == num_intervals
+    return {
+        "intervals": [(i, int(mins[i]), int(maxs[i])) for i in range(n)],
+        "filtered_mins": filter_within_one_std(mins) if complete else [],
+        "filtered_maxs": filter_within_one_std(maxs) if complete else [],
+    }
+
+
+def golden_global_results(samples):
+    return {"min": int(samples.min()), "max": int(samples.max())} if samples.size else {}
+
+
+# --- simulator output parsing ---
+
+def parse_interval_output(text):
+    """Parses the $display output of top.v into the same structure as golden_interval_results."""
+    intervals, fmins, fmaxs = [], [], []
+    for line in text.splitlines():
+        m = _INTERVAL_RE.match(line.strip())
+        if m:
+            intervals.append((int(m.group(1)), int(m.group(2)), int(m.group(3))))
+            continue
+        m = _FILTERED_RE.match(line.strip())
+        if m:
+            (fmins if m.group(1) == "Min" else fmaxs).append((int(m.group(2)), int(m.group(3))))
+    return {"intervals": intervals, "filtered_mins": fmins, "filtered_maxs": fmaxs}
+
+
+def parse_global_output(text):
+    result = {}
+    for line in text.splitlines():
+        m = _GLOBAL_RE.match(line.strip())
+        if m:
+            result["min" if m.group(1) == "Minimum" else "max"] = int(m.group(2))
+    return result
+
+
+def display_lines(text):
+    """Simulator stdout without vvp's own $finish and VCD messages."""
+    return [line for line in text.splitlines()
+            if "$finish called" not in line and not line.startswith("VCD info")]
+
+
+def diff_results(expected, actual):
+    """Returns a list of human-readable differences between two result dicts (empty if equal)."""
+    diffs = []
+    for key in sorted(set(expected) | set(actual)):
+        exp, act = expected.get(key), actual.get(key)
+        if exp == act:
+            continue
+        if isinstance(exp, list) and isinstance(act, list):
+            exp_set, act_set = set(exp), set(act)
+            for item in sorted(exp_set - act_set):
+                diffs.append(f"{key}: missing {item}")
+            for item in sorted(act_set - exp_set):
+                diffs.append(f"{key}: unexpected {item}")
+        else:
+            diffs.append(f"{key}: expected {exp}, got {act}")
+    return diffs
+
+
+# --- simulation ---
+
+class VerilogRegression:
+    """
+    Compiles parameterized testbenches once per parameter set and runs many iverilog
+    simulations in parallel, diffing every run against the golden measure.
+    """
+
+    def __init__(self, build_dir=DEFAULT_BUILD_DIR, jobs=None, iverilog="iverilog", vvp="vvp"):
+        self.build_dir = build_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.iverilog = iverilog
+        self.vvp = vvp
+        os.makedirs(build_dir, exist_ok=True)
+
+    def available(self):
+        return shutil.which(self.iverilog) is not None and shutil.which(self.vvp) is not None
+
+    def compile(self, design, max_samples, interval_len=DEFAULT_INTERVAL_LEN, num_intervals=DEFAULT_NUM_INTERVALS):
+        """Builds (or reuses) the vvp image for a design and parameter set; returns its path."""
+        top, sources = DESIGNS[design]
+        params = {"MAX_SAMPLES": max_samples}
+        if design == "interval":
+            params.update(INTERVAL_LEN=interval_len, NUM_INTERVALS=num_intervals)
+        h = hashlib.blake2b(digest_size=8)
+        for src in sources:
+            with open(src, 'rb') as f:
+                h.update(f.read())
+        h.update(repr(sorted(params.items())).encode())
+        out = os.path.join(self.build_dir, f"{design}_{h.hexdigest()}.vvp")
+        if not os.path.exists(out):
+            cmd = [self.iverilog, "-g2005", "-s", top, "-o", out]
+            cmd += [f"-P{top}.{k}={v}" for k, v in params.items()]
+            subprocess.run(cmd + sources, check=True, capture_output=True, text=True)
+        return out
+
+    def run_one(self, design, samples, name, interval_len=DEFAULT_INTERVAL_LEN,
+                num_intervals=DEFAULT_NUM_INTERVALS, dump=False):
+        """
+        Simulates one input and returns a result record with the golden diff and whether the
+        $display output matches the bit-accurate hardware model line for line.
+        """
+        # Memory depth is bucketed to a power of two so inputs of similar size share a build
+        max_samples = 1 << max(int(samples.size - 1).bit_length(), 10)
+        image = self.compile(design, max_samples, interval_len, num_intervals)
+        with tempfile.TemporaryDirectory(dir=self.build_dir) as tmp:
+            memfile = os.path.join(tmp, "samples.memh")
+            write_memh(samples, memfile)
+            cmd = [self.vvp, "-n", image, f"+memfile={memfile}", f"+nsamples={samples.size}"]
+            if dump:
+                cmd += ["+dump", f"+dumpfile={os.path.abspath(name)}.vcd"]
+            start = time.perf_counter()
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            sim_time = time.perf_counter() - start
+        if design == "interval":
+            actual = parse_interval_output(proc.stdout)
+            expected = golden_interval_results(samples, interval_len, num_intervals)
+            model = simulate_top(samples, interval_len, num_intervals, TB_MEM_TRAILING_EDGES)
+        else:
+            actual = parse_global_output(proc.stdout)
+            expected = golden_global_results(samples)
+            model = simulate_min_max_amplitude(samples)
+        diffs = diff_results(expected, actual)
+        if proc.returncode != 0:
+            diffs.insert(0, f"vvp exited with {proc.returncode}: {proc.stderr.strip()}")
+        return {"name": name, "design": design, "samples": int(samples.size), "sim_time": sim_time,
+                "passed": not diffs, "diffs": diffs, "actual": actual, "expected": expected,
+                "model_match": display_lines(proc.stdout) == model["lines"]}
+
+    def run(self, inputs, designs=("interval", "global"), interval_len=DEFAULT_INTERVAL_LEN,
+            num_intervals=DEFAULT_NUM_INTERVALS, dump=False):
+        """
+        Runs every design on every input in parallel.
+
+        Args:
+            inputs: Iterable of file paths, or (name, int16 array) pairs.
+
+        Returns:
+            list: One result record per (input, design).
+        """
+        cases = []
+        for item in inputs:
+            name, samples = (item, load_int16_samples(item)) if isinstance(item, str) else item
+            for design in designs:
+                cases.append((design, samples, name))
+        # Compile serially first so parallel runs never race on the same build
+        for design, samples, _ in cases:
+            self.compile(design, 1 << max(int(samples.size - 1).bit_length(), 10), interval_len, num_intervals)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = [pool.submit(self.run_one, design, samples, name, interval_len, num_intervals, dump)
+                       for design, samples, name in cases]
+            return [f.result() for f in futures]
+
+
+def print_report(results):
+    passed = sum(r["passed"] for r in results)
+    for r in results:
+        status = "PASS" if r["passed"] else "FAIL"
+        model = "" if r["model_match"] else ", differs from hardware model"
+        print(f"[{status}] {r['design']:<8s} {r['name']} ({r['samples']} samples, {r['sim_time']:.2f}s{model})")
+        for d in r["diffs"][:20]:
+            print(f"    {d}")
+    print(f"\n{passed}/{len(results)} simulations match the golden measure.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel iverilog regression against the golden measure.")
+    parser.add_argument("inputs", nargs="+", help="WAV, text, .npy or raw int16 inputs")
+    parser.add_argument("--design", choices=["interval", "global", "both"], default="both")
+    parser.add_argument("--interval-len", type=int, default=DEFAULT_INTERVAL_LEN)
+    parser.add_argument("--num-intervals", type=int, default=DEFAULT_NUM_INTERVALS)
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel simulations (default: CPU count)")
+    parser.add_argument("--dump", action="store_true", help="Write a VCD per simulation")
+    parser.add_argument("--build-dir", default=DEFAULT_BUILD_DIR)
+    args = parser.parse_args()
+
+    regression = VerilogRegression(args.build_dir, args.jobs)
+    if not regression.available():
+        print("Error: iverilog/vvp not found on PATH.")
+        raise SystemExit(1)
+    designs = ("interval", "global") if args.design == "both" else (args.design,)
+    results = regression.run(args.inputs, designs, args.interval_len, args.num_intervals, args.dump)
+    print_report(results)
+    raise SystemExit(0 if all(r["passed"] for r in results) else 1)
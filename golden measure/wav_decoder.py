@@ -0,0 +1,219 @@
+# wav_decoder.py
+import struct
+import numpy as np
+
+# Vectorized RIFF/WAVE decoder. Reads the data chunk block by block straight into a preallocated
+# mono output array in the analysis dtype:
+#
+#   PCM 8-bit (unsigned), 16-bit, packed 24-bit and 32-bit integers, IEEE float 32/64-bit,
+#   and WAVE_FORMAT_EXTENSIBLE headers whose subformat is PCM or IEEE float.
+#
+# Integers are scaled by their container width (8-bit: (u - 128) / 128, 16-bit: / 32768, ...),
+# so 24-in-32 EXTENSIBLE files decode correctly without looking at the valid-bits field. Two
+# channels are averaged and files with more channels use the first one, as load_wav_to_float_array
+# always did. Min/max of the output are tracked per block while it is in cache, so no separate
+# pass over the signal is needed; float data is only rescaled when it actually exceeds [-1, 1].
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+DEFAULT_BLOCK_FRAMES = 1 << 18  # Frames decoded per block
+
+_SAMPLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 8): "pcm8",
+    (WAVE_FORMAT_PCM, 16): "pcm16",
+    (WAVE_FORMAT_PCM, 24): "pcm24",
+    (WAVE_FORMAT_PCM, 32): "pcm32",
+    (WAVE_FORMAT_IEEE_FLOAT, 32): "float32",
+    (WAVE_FORMAT_IEEE_FLOAT, 64): "float64",
+}
+
+
+def read_wav_header(f):
+    """
+    Parses the RIFF chunks of an open binary file up to the data chunk and leaves the file
+    positioned at the first sample.
+
+    Returns:
+        dict: format_tag (PCM or IEEE float after resolving EXTENSIBLE), sample_format,
+              channels, sample_rate, bits_per_sample, block_align, data_offset, num_frames.
+
+    Raises:
+        ValueError: If the file is not a WAVE file or its sample format is not supported.
+    """
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file.")
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            raise ValueError("No data chunk found.")
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            body = f.read(size + (size & 1))
+            if size < 16:
+                raise ValueError("fmt chunk is too short.")
+            tag, channels, rate, _, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+            if tag == WAVE_FORMAT_EXTENSIBLE:
+                if size < 40:
+                    raise ValueError("WAVE_FORMAT_EXTENSIBLE fmt chunk is too short.")
+                # The first two bytes of the subformat GUID are the actual format tag
+                tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (tag, channels, rate, block_align, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("data chunk precedes the fmt chunk.")
+            break
+        else:
+            f.seek(size + (size & 1), 1)
+
+    tag, channels, rate, block_align, bits = fmt
+    sample_format = _SAMPLE_FORMATS.get((tag, bits))
+    if sample_format is None:
+        raise ValueError(f"Unsupported WAV sample format (format tag {tag:#06x}, {bits} bits).")
+    if channels < 1 or block_align != channels * bits // 8:
+        raise ValueError(f"Inconsistent WAV header: {channels} channels, block align {block_align}, {bits} bits.")
+    data_offset = f.tell()
+    # Streamed recordings may leave the size unset (0 or 0xFFFFFFFF): use what is in the file
+    f.seek(0, 2)
+    available = f.tell() - data_offset
+    f.seek(data_offset)
+    data_bytes = size if 0 < size <= available else available
+    return {
+        "format_tag": tag,
+        "sample_format": sample_format,
+        "channels": channels,
+        "sample_rate": rate,
+        "bits_per_sample": bits,
+        "block_align": block_align,
+        "data_offset": data_offset,
+        "num_frames": data_bytes // block_align,
+    }
+
+
+def _channel_view(raw, sample_format, channels):
+    """(frames, channels) array of the undecoded values of a block; 24-bit becomes int32 << 8."""
+    if sample_format == "pcm24":
+        # Place the 3 little-endian bytes in the top of an int32: sign extension comes for free
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        wide = np.zeros((packed.shape[0], 4), dtype=np.uint8)
+        wide[:, 1:] = packed
+        values = wide.view("<i4").ravel()
+    else:
+        dtype = {"pcm8": np.uint8, "pcm16": "<i2", "pcm32": "<i4", "float32": "<f4", "float64": "<f8"}[sample_format]
+        values = np.frombuffer(raw, dtype=dtype)
+    return values.reshape(-1, channels)
+
+
+# value * scale + offset maps each container to [-1, 1)
+_SCALES = {
+    "pcm8": (1.0 / 128, -1.0),
+    "pcm16": (1.0 / 32768, 0.0),
+    "pcm24": (1.0 / 2147483648, 0.0),  # Value sits in the top 24 bits of an int32
+    "pcm32": (1.0 / 2147483648, 0.0),
+    "float32": (1.0, 0.0),
+    "float64": (1.0, 0.0),
+}
+
+
+def _decode_block(raw, header, out):
+    """Decodes one block of whole frames into the float32 slice out (mono)."""
+    frames = _channel_view(raw, header["sample_format"], header["channels"])
+    scale, offset = _SCALES[header["sample_format"]]
+    if header["channels"] == 2:
+        # Average in the container domain (summed in double, rounded once), then scale once
+        np.add(frames[:, 0], frames[:, 1], out=out, dtype=np.float64, casting="same_kind")
+        scale *= 0.5
+    else:
+        np.copyto(out, frames[:, 0], casting="unsafe")
+    if scale != 1.0:
+        out *= np.float32(scale)
+    if offset:
+        out += np.float32(offset)
+
+
+def _raw_blocks(f, header, block_frames):
+    """Reads the data chunk into one reused buffer; yields a view of each block of whole frames."""
+    buf = bytearray(block_frames * header["block_align"])
+    remaining = header["num_frames"]
+    while remaining > 0:
+        count = min(block_frames, remaining)
+        view = memoryview(buf)[:count * header["block_align"]]
+        if f.readinto(view) < len(view):
+            raise ValueError("WAV data ended early.")
+        yield view
+        remaining -= count
+
+
+def read_wav_blocks(path, block_frames=DEFAULT_BLOCK_FRAMES):
+    """
+    Streaming decode for files larger than memory.
+
+    Returns:
+        Tuple (header, blocks): header as read_wav_header; blocks is a generator of float32 mono
+        blocks of up to block_frames samples. The blocks share one preallocated buffer, so each
+        must be consumed (or copied) before the next is requested. Float data is not normalized.
+    """
+    f = open(path, "rb")
+    try:
+        header = read_wav_header(f)
+    except Exception:
+        f.close()
+        raise
+
+    def blocks():
+        out = np.empty(block_frames, dtype=np.float32)
+        with f:
+            for raw in _raw_blocks(f, header, block_frames):
+                block = out[:len(raw) // header["block_align"]]
+                _decode_block(raw, header, block)
+                yield block
+
+    return header, blocks()
+
+
+def decode_wav(path, dtype=np.float32, block_frames=DEFAULT_BLOCK_FRAMES, normalize_float=True):
+    """
+    Decodes a WAV file to mono samples.
+
+    Args:
+        path (str): WAV file.
+        dtype: np.float32 for samples in [-1.0, 1.0] or np.int16 for 16-bit samples
+               (int(x * 32768), +1.0 saturating, as native_processors.to_int16_samples).
+        block_frames (int): Frames decoded per block; bounds the temporary memory.
+        normalize_float (bool): Divide float data by its peak if it exceeds 1.0.
+
+    Returns:
+        Tuple (samples, sample_rate, header): header as read_wav_header, plus "min" and "max"
+        of the decoded float samples.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.int16):
+        raise ValueError(f"Unsupported output dtype {dtype}; expected float32 or int16.")
+    with open(path, "rb") as f:
+        header = read_wav_header(f)
+        n = header["num_frames"]
+        out = np.empty(n, dtype=np.float32)
+        lo, hi = np.inf, -np.inf
+        pos = 0
+        for raw in _raw_blocks(f, header, block_frames):
+            block = out[pos:pos + len(raw) // header["block_align"]]
+            _decode_block(raw, header, block)
+            lo, hi = min(lo, float(block.min())), max(hi, float(block.max()))
+            pos += block.size
+
+    if n and normalize_float and header["format_tag"] == WAVE_FORMAT_IEEE_FLOAT:
+        peak = max(abs(lo), abs(hi))
+        if peak > 1.0:
+            print(f"Floating point data is outside [-1,1] (max abs: {peak}). Normalizing.")
+            out /= np.float32(peak)
+            lo, hi = lo / peak, hi / peak
+    header["min"] = lo if n else None
+    header["max"] = hi if n else None
+
+    if dtype == np.int16:
+        scaled = np.multiply(out, 32768, out=out)
+        np.clip(scaled, -32768, 32767, out=scaled)
+        return scaled.astype(np.int16), header["sample_rate"], header
+    return out, header["sample_rate"], header
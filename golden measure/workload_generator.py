@@ -0,0 +1,256 @@
+# workload_generator.py
+import json
+import os
+import struct
+import time
+import numpy as np
+
+from outlier_filters import filter_mask
+from sample_text_io import format_float_text, format_int_text
+
+# Reproducible synthetic workloads for benchmarking at scale. Every interval gets its own content
+# (tone, noise or silence with a random level) and some intervals receive impulsive clicks or are
+# driven into clipping, so the interval filters have real outliers to find. Samples are generated
+# block by block, quantized to 16 bits and streamed to the output file, so multi-GB signals never
+# sit in memory. Block b is drawn from np.random.default_rng([seed, b]) and blocks are a fixed
+# number of whole intervals, so a (seed, parameters) pair always produces the same samples.
+#
+# A JSON manifest records the parameters, the expected interval and global extremes (16-bit scaled,
+# as the processors report them), the intervals kept by the default filter and the ground truth of
+# the injected clicks and clipped regions.
+
+SEGMENT_KINDS = ("tone", "noise", "silence")
+DEFAULT_KIND_WEIGHTS = (0.45, 0.45, 0.10)
+DEFAULT_CLICK_PROBABILITY = 0.02  # Per interval
+DEFAULT_CLIP_PROBABILITY = 0.01   # Per interval
+DEFAULT_BLOCK_SAMPLES = 1 << 20   # Target samples generated per block (rounded to whole intervals)
+MAX_CLICKS_PER_INTERVAL = 3
+RAW_EXTENSIONS = (".raw", ".pcm", ".bin")
+WAV_MAX_DATA_BYTES = 0xFFFFFFFF - 36  # RIFF sizes are 32-bit
+
+
+def block_intervals_for(samples_per_interval, block_samples=DEFAULT_BLOCK_SAMPLES):
+    """Whole intervals per generated block; part of the reproducibility contract."""
+    return max(1, block_samples // samples_per_interval)
+
+
+def _quantize(signal):
+    """float signal in [-1.0, 1.0] -> int16 like int(x * 32768), +1.0 saturating at 32767."""
+    scaled = np.multiply(signal, 32768, dtype=np.float32)
+    np.clip(scaled, -32768, 32767, out=scaled)
+    return scaled.astype(np.int16)
+
+
+def generate_block(seed, block_index, samples_per_interval, block_intervals, sample_rate,
+                   kind_weights=DEFAULT_KIND_WEIGHTS, click_probability=DEFAULT_CLICK_PROBABILITY,
+                   clip_probability=DEFAULT_CLIP_PROBABILITY):
+    """
+    Generates one block of block_intervals whole intervals.
+
+    Returns:
+        Tuple (samples, info):
+            - samples: int16 array of block_intervals * samples_per_interval samples.
+            - info: dict with the per-interval "kinds" (indices into SEGMENT_KINDS), the global
+              indices of the "click_intervals" and "clip_intervals" and the global "click_samples".
+    """
+    rng = np.random.default_rng([seed, block_index])
+    m, spi = block_intervals, samples_per_interval
+    first_interval = block_index * block_intervals
+    first_sample = first_interval * spi
+
+    weights = np.asarray(kind_weights, dtype=np.float64)
+    kinds = rng.choice(len(SEGMENT_KINDS), size=m, p=weights / weights.sum())
+    levels = rng.uniform(0.05, 0.6, size=m).astype(np.float32)
+    freqs = rng.uniform(50.0, 5000.0, size=m)
+    phases = rng.uniform(0.0, 2 * np.pi, size=m)
+
+    # Tone: continuous time axis of the recording, random frequency and phase per interval
+    t = (first_sample + np.arange(m * spi, dtype=np.float64)).reshape(m, spi) / sample_rate
+    tone = np.sin(2 * np.pi * freqs[:, None] * t + phases[:, None]).astype(np.float32)
+    noise = rng.standard_normal((m, spi), dtype=np.float32) * np.float32(0.3)
+    signal = np.where((kinds == 0)[:, None], tone, np.where((kinds == 1)[:, None], noise, np.float32(0.0)))
+
+    # Clipped regions: intervals overdriven with a gain of 2x-8x, clipped to full scale below
+    clipped = (rng.random(m) < clip_probability) & (kinds != 2)  # Silence cannot clip
+    gains = rng.uniform(2.0, 8.0, size=m).astype(np.float32)
+    signal *= np.where(clipped, gains, levels)[:, None]
+
+    # Impulsive clicks: 1..MAX_CLICKS_PER_INTERVAL single samples near full scale
+    clicked = rng.random(m) < click_probability
+    counts = np.where(clicked, rng.integers(1, MAX_CLICKS_PER_INTERVAL + 1, size=m), 0)
+    rows = np.repeat(np.arange(m), counts)
+    cols = rng.integers(0, spi, size=rows.size)
+    amplitudes = rng.uniform(0.8, 1.0, size=rows.size) * rng.choice([-1.0, 1.0], size=rows.size)
+    signal[rows, cols] = amplitudes
+
+    np.clip(signal, -1.0, 1.0, out=signal)
+    click_samples = np.unique(first_sample + rows * spi + cols)
+    info = {
+        "kinds": kinds,
+        "click_intervals": first_interval + np.flatnonzero(clicked),
+        "clip_intervals": first_interval + np.flatnonzero(clipped),
+        "click_samples": click_samples,
+    }
+    return _quantize(signal.ravel()), info
+
+
+def generate_workload_blocks(num_samples, sample_rate=44100, interval_length_seconds=1.0, seed=0,
+                             block_samples=DEFAULT_BLOCK_SAMPLES, **block_params):
+    """
+    Generator over the whole workload: yields (samples, info) per block, the last block truncated
+    to num_samples. block_params are passed to generate_block.
+    """
+    samples_per_interval = int(sample_rate * interval_length_seconds)
+    if samples_per_interval == 0:
+        raise ValueError("Interval length is too short for the given sample rate, resulting in 0 samples per interval.")
+    block_intervals = block_intervals_for(samples_per_interval, block_samples)
+    block_len = block_intervals * samples_per_interval
+    for block_index in range(-(-num_samples // block_len)):
+        samples, info = generate_block(seed, block_index, samples_per_interval, block_intervals, sample_rate,
+                                       **block_params)
+        remaining = num_samples - block_index * block_len
+        if remaining < block_len:
+            samples = samples[:remaining]
+            info["click_samples"] = info["click_samples"][info["click_samples"] < num_samples]
+        yield samples, info
+
+
+def wav_header(num_samples, sample_rate):
+    """44-byte header of a mono 16-bit PCM WAV file."""
+    data_bytes = 2 * num_samples
+    if data_bytes > WAV_MAX_DATA_BYTES:
+        raise ValueError(f"{num_samples} samples exceed the 4 GiB RIFF limit; use a raw output file.")
+    return (b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, 2 * sample_rate, 2, 16)
+            + b"data" + struct.pack("<I", data_bytes))
+
+
+def _output_format(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".wav":
+        return "wav"
+    if ext in RAW_EXTENSIONS:
+        return "raw"
+    if ext == ".txt":
+        return "text"
+    raise ValueError(f"Unsupported output format '{ext}'; expected .wav, .txt or one of {RAW_EXTENSIONS}.")
+
+
+def generate_workload(filename, duration_seconds=10, sample_rate=44100, interval_length_seconds=1.0, seed=0,
+                      text_format="int", manifest_path=None, block_samples=DEFAULT_BLOCK_SAMPLES, **block_params):
+    """
+    Streams a synthetic workload to a file and writes its manifest.
+
+    Args:
+        filename (str): Output file; .wav (16-bit PCM), .raw/.pcm/.bin (int16 little-endian) or
+                        .txt (one sample per line).
+        duration_seconds (float): Length of the signal.
+        sample_rate (int): Samples per second.
+        interval_length_seconds (float): Interval length the manifest's expected results refer to.
+        seed (int): Seed of the workload; the same seed and parameters give the same file.
+        text_format (str): "int" for 16-bit integers (C reference, testbenches) or "float" for
+                           normalized samples sample / 32768 (load_audio_from_text).
+        manifest_path (str, optional): Defaults to filename + ".manifest.json".
+        block_samples (int): Target samples per generated block; bounds the memory used.
+        **block_params: kind_weights, click_probability, clip_probability (see generate_block).
+
+    Returns:
+        dict: The manifest.
+    """
+    fmt = _output_format(filename)
+    if text_format not in ("int", "float"):
+        raise ValueError(f"Unknown text format '{text_format}'; expected 'int' or 'float'.")
+    num_samples = int(duration_seconds * sample_rate)
+    samples_per_interval = int(sample_rate * interval_length_seconds)
+    header = wav_header(num_samples, sample_rate) if fmt == "wav" else b""
+
+    start_time = time.time()
+    interval_mins, interval_maxs = [], []
+    click_intervals, clip_intervals, click_samples = [], [], []
+    kind_counts = np.zeros(len(SEGMENT_KINDS), dtype=np.int64)
+    global_min, global_max = None, None
+    num_complete = 0
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    with open(filename, "wb") as f:
+        f.write(header)
+        for samples, info in generate_workload_blocks(num_samples, sample_rate, interval_length_seconds, seed,
+                                                      block_samples, **block_params):
+            if fmt == "text":
+                f.write(format_int_text(samples) if text_format == "int" else format_float_text(samples / np.float32(32768)))
+            else:
+                f.write(samples.astype("<i2", copy=False).tobytes())
+
+            # Expected results: only complete intervals count, the tail still feeds the global extremes
+            complete = samples.size // samples_per_interval
+            body = samples[:complete * samples_per_interval].reshape(complete, samples_per_interval)
+            interval_mins.append(body.min(axis=1))
+            interval_maxs.append(body.max(axis=1))
+            block_min, block_max = int(samples.min()), int(samples.max())
+            global_min = block_min if global_min is None else min(global_min, block_min)
+            global_max = block_max if global_max is None else max(global_max, block_max)
+
+            num_complete += complete
+            click_intervals.append(info["click_intervals"][info["click_intervals"] < num_complete])
+            clip_intervals.append(info["clip_intervals"][info["clip_intervals"] < num_complete])
+            click_samples.append(info["click_samples"])
+            kind_counts += np.bincount(info["kinds"][:complete], minlength=len(SEGMENT_KINDS))
+
+    interval_mins = np.concatenate(interval_mins) if interval_mins else np.empty(0, dtype=np.int16)
+    interval_maxs = np.concatenate(interval_maxs) if interval_maxs else np.empty(0, dtype=np.int16)
+    mins = interval_mins.astype(np.int64)
+    maxs = interval_maxs.astype(np.int64)
+    manifest = {
+        "file": os.path.basename(filename),
+        "format": fmt if fmt != "text" else f"text-{text_format}",
+        "seed": seed,
+        "num_samples": num_samples,
+        "sample_rate": sample_rate,
+        "interval_length_s": interval_length_seconds,
+        "samples_per_interval": samples_per_interval,
+        "block_intervals": block_intervals_for(samples_per_interval, block_samples),
+        "generator": {
+            "kind_weights": list(block_params.get("kind_weights", DEFAULT_KIND_WEIGHTS)),
+            "click_probability": block_params.get("click_probability", DEFAULT_CLICK_PROBABILITY),
+            "clip_probability": block_params.get("clip_probability", DEFAULT_CLIP_PROBABILITY),
+        },
+        "kind_counts": dict(zip(SEGMENT_KINDS, kind_counts.tolist())),
+        "global_min": global_min,
+        "global_max": global_max,
+        "interval_mins": mins.tolist(),
+        "interval_maxs": maxs.tolist(),
+        # Intervals kept by the default 1-sigma filter, as the processors report them
+        "filtered_min_indices": np.flatnonzero(filter_mask(mins)).tolist(),
+        "filtered_max_indices": np.flatnonzero(filter_mask(maxs)).tolist(),
+        # Ground truth of the injected outliers
+        "click_intervals": np.concatenate(click_intervals).tolist() if click_intervals else [],
+        "clip_intervals": np.concatenate(clip_intervals).tolist() if clip_intervals else [],
+        "click_samples": np.concatenate(click_samples).tolist() if click_samples else [],
+    }
+    manifest_path = manifest_path or filename + ".manifest.json"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    total_time = time.time() - start_time
+    size_mb = os.path.getsize(filename) / 1e6
+    print(f"Generated '{filename}' with {num_samples} samples ({size_mb:.1f} MB) in {total_time:.2f} seconds "
+          f"({size_mb / max(total_time, 1e-9):.1f} MB/s); manifest '{manifest_path}'.")
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Streams a reproducible synthetic audio workload with a ground-truth manifest.")
+    parser.add_argument("output", help="Output file (.wav, .raw/.pcm/.bin or .txt)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Duration in seconds")
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--interval", type=float, default=1.0, help="Interval length in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--click-probability", type=float, default=DEFAULT_CLICK_PROBABILITY)
+    parser.add_argument("--clip-probability", type=float, default=DEFAULT_CLIP_PROBABILITY)
+    parser.add_argument("--text-format", choices=["int", "float"], default="int")
+    parser.add_argument("--manifest", default=None, help="Manifest path (default: <output>.manifest.json)")
+    args = parser.parse_args()
+
+    generate_workload(args.output, args.duration, args.sample_rate, args.interval, args.seed, args.text_format,
+                      args.manifest, click_probability=args.click_probability, clip_probability=args.clip_probability)